@@ -1,4 +1,7 @@
+import bisect
+import math
 import random
+import time
 from typing import List, Tuple
 import xml.etree.ElementTree as ET
 
@@ -22,89 +25,253 @@ def place_into_bin(bins: List[List[int]], d: int, item: int, idx: int):
         return True
     return False
 
+# Đơn hàng có tối đa bấy nhiêu chi tiết thì cut_optimize giải chính xác
+EXACT_MAX_PARTS = 24
+EXACT_NODE_LIMIT = 200000
+IMPROVE_TIME_LIMIT = 1.0
+# độ xáo trộn thứ tự của cut_ffd_random
+RANDOM_ORDER_NOISE = 0.1
+
+
+class FirstFitTree:
+    """
+    Max segment tree over the free space of each stick.
+
+    Sticks that are not opened yet have the full length d free, so the
+    leftmost stick with enough room is either the first fit among the
+    opened ones or the next new stick. Lookup and update are O(log n).
+    """
+
+    def __init__(self, d: float, size: int):
+        self.size = 1 << max(0, size - 1).bit_length()
+        self.tree = [d] * (2 * self.size)
+
+    def find(self, item: float) -> int:
+        tree = self.tree
+        if tree[1] < item:
+            return -1
+        i = 1
+        while i < self.size:
+            i *= 2
+            if tree[i] < item:
+                i += 1
+        return i - self.size
+
+    def update(self, idx: int, free: float):
+        tree = self.tree
+        i = idx + self.size
+        tree[i] = free
+        i //= 2
+        while i:
+            left, right = tree[2 * i], tree[2 * i + 1]
+            tree[i] = left if left > right else right
+            i //= 2
+
+
+def lower_bound(d: int, a: List[int]) -> int:
+    """Số que tối thiểu: mỗi chi tiết dài hơn d một que, phần còn lại ceil(tổng / d)."""
+    oversize = [x for x in a if x > d]
+    rest = sum(x for x in a if x <= d)
+    return len(oversize) + math.ceil(rest / d - 1e-9)
+
+
 def cut_ffd(d: int, a: List[int]) -> List[List[int]]:
-    """First Fit Decreasing. Very fast, near-optimal."""
-    pieces = sorted(a, reverse=True)
+    """First Fit Decreasing. Very fast, near-optimal. O(n log n)."""
+    return cut_ffd_ordered(d, sorted(a, reverse=True))
+
+
+def cut_ffd_ordered(d: int, pieces: List[int]) -> List[List[int]]:
+    """First Fit in the given order of pieces. O(n log n)."""
     bins = []
+    fills = []
+    tree = FirstFitTree(d, len(pieces))
 
     for item in pieces:
-        placed = False
-        for i in range(len(bins)):
-            if place_into_bin(bins, d, item, i):
-                placed = True
-                break
-        if not placed:
-            bins.append([item])
+        idx = tree.find(item)
+        if idx == -1:
+            # miếng dài hơn d: để riêng một que
+            idx = len(bins)
+        if idx == len(bins):
+            bins.append([])
+            fills.append(0)
+        bins[idx].append(item)
+        fills[idx] += item
+        tree.update(idx, d - fills[idx])
 
     return bins
 
+
+def cut_ffd_random(d: int, a: List[int], rng: random.Random,
+                   noise: float = RANDOM_ORDER_NOISE) -> List[List[int]]:
+    """
+    First Fit on a perturbed decreasing order: each length is scaled by a
+    random factor in [1 - noise, 1 + noise] before sorting. Restarting with
+    different seeds explores orders FFD never tries.
+    """
+    keys = [x * rng.uniform(1 - noise, 1 + noise) for x in a]
+    order = sorted(range(len(a)), key=keys.__getitem__, reverse=True)
+    return cut_ffd_ordered(d, [a[i] for i in order])
+
+
 def cut_bfd(d: int, a: List[int]) -> List[List[int]]:
-    """Best Fit Decreasing."""
+    """Best Fit Decreasing. O(n log n) on typical orders."""
     pieces = sorted(a, reverse=True)
     bins = []
+    if not pieces:
+        return bins
+    smallest = pieces[-1]
+    # (free space, bin index) of sticks that can still take the smallest piece
+    open_bins = []
 
     for item in pieces:
-        best_idx = -1
-        best_remain = d + 1
-
-        for i in range(len(bins)):
-            cur_sum = sum(bins[i])
-            if cur_sum + item <= d:
-                remain = d - (cur_sum + item)
-                if remain < best_remain:
-                    best_remain = remain
-                    best_idx = i
-
-        if best_idx == -1:
+        pos = bisect.bisect_left(open_bins, (item, -1))
+        if pos == len(open_bins):
+            idx = len(bins)
             bins.append([item])
+            free = d - item
         else:
-            bins[best_idx].append(item)
+            free, idx = open_bins.pop(pos)
+            bins[idx].append(item)
+            free -= item
+        if free >= smallest:
+            bisect.insort(open_bins, (free, idx))
 
     return bins
 
-def local_optimize_swap(bins: List[List[int]], d: int) -> List[List[int]]:
-    """Try simple 1-1 swaps to reduce number of bins."""
-    improved = True
-    count = 10000
 
-    while improved:
+def cut_exact(d: int, a: List[int], node_limit: int = EXACT_NODE_LIMIT) -> List[List[int]]:
+    """
+    Branch and bound for small orders. Returns a plan with the minimum number
+    of sticks, or the best one found after node_limit search nodes.
+    """
+    oversize = [[x] for x in a if x > d]
+    pieces = sorted((x for x in a if x <= d), reverse=True)
+    best = cut_bfd(d, pieces)
+    lower = lower_bound(d, pieces)
+    if len(best) <= lower:
+        return oversize + best
+
+    suffix = [0] * (len(pieces) + 1)
+    for k in range(len(pieces) - 1, -1, -1):
+        suffix[k] = suffix[k + 1] + pieces[k]
+    fills = []
+    assign = [0] * len(pieces)
+    nodes = 0
+
+    def search(k: int, used: float):
+        nonlocal best, nodes
+        if k == len(pieces):
+            bins = [[] for _ in fills]
+            for item, idx in zip(pieces, assign):
+                bins[idx].append(item)
+            best = bins
+            return
+        nodes += 1
+        if nodes > node_limit:
+            return
+        # số que tối thiểu nếu đổ phần còn lại vào chỗ trống hiện có
+        free = len(fills) * d - used
+        if len(fills) + max(0, math.ceil((suffix[k] - free) / d - 1e-9)) >= len(best):
+            return
+        item = pieces[k]
+        # hai miếng bằng nhau liên tiếp: không thử lại các que đứng trước
+        first = assign[k - 1] if k and pieces[k - 1] == item else 0
+        tried = set()
+        for i in range(first, len(fills)):
+            f = fills[i]
+            if f + item <= d and f not in tried:
+                tried.add(f)
+                fills[i] = f + item
+                assign[k] = i
+                search(k + 1, used + item)
+                fills[i] = f
+                if len(best) <= lower or nodes > node_limit:
+                    return
+        if len(fills) + 1 < len(best):
+            fills.append(item)
+            assign[k] = len(fills) - 1
+            search(k + 1, used + item)
+            fills.pop()
+
+    search(0, 0)
+    return oversize + best
+
+
+def local_optimize_swap(bins: List[List[int]], d: int,
+                        time_limit: float = IMPROVE_TIME_LIMIT) -> List[List[int]]:
+    """
+    Try to empty the least filled stick, moving its pieces into the free
+    space of the others or swapping them for smaller pieces of fuller
+    sticks. Each swap pushes length towards fuller sticks, so the loop
+    cannot cycle; it also stops after time_limit seconds.
+    """
+    deadline = time.perf_counter() + time_limit
+    bins = [list(b) for b in bins]
+    fills = [sum(b) for b in bins]
+
+    improved = True
+    while improved and len(bins) > 1 and time.perf_counter() < deadline:
         improved = False
-        count -= 1
-        if count % 10000 == 0:
-            print(count)
-        if count <= 0:
-            break
-        for i in range(len(bins)):
-            for j in range(i + 1, len(bins)):
-                A, B = bins[i], bins[j]
-
-                # Try swap each pair a in A, b in B
-                for ai in range(len(A)):
-                    for bi in range(len(B)):
-                        a_item = A[ai]
-                        b_item = B[bi]
-
-                        new_A_sum = sum(A) - a_item + b_item
-                        new_B_sum = sum(B) - b_item + a_item
-
-                        if new_A_sum <= d and new_B_sum <= d:
-                            # Accept swap
-                            A[ai], B[bi] = B[bi], A[ai]
-                            improved = True
-
-                # After swapping, if one bin becomes empty, remove it
-                if sum(bins[j]) == 0:
-                    bins.pop(j)
-                    return bins  # restructure => restart
-
-    # Finally sort bins by fill level (optional)
-    bins.sort(key=lambda x: sum(x), reverse=True)
-    return bins
+        target = min(range(len(bins)), key=fills.__getitem__)
+        others = sorted((i for i in range(len(bins)) if i != target),
+                        key=fills.__getitem__, reverse=True)
 
-def cut_optimize(d: int, a: List[int]) -> List[List[int]]:
-    """FFD + Local Optimization"""
-    bins = cut_ffd(d, a)
-    bins = local_optimize_swap(bins, d)
+        # 1) dời hết các miếng sang que khác (best fit) => bớt một que
+        trial = {}
+        moves = []
+        for item in sorted(bins[target], reverse=True):
+            best_idx = -1
+            best_fill = -1
+            for i in others:
+                f = trial.get(i, fills[i])
+                if best_fill < f and f + item <= d:
+                    best_fill = f
+                    best_idx = i
+            if best_idx == -1:
+                break
+            trial[best_idx] = best_fill + item
+            moves.append((best_idx, item))
+        else:
+            for i, item in moves:
+                bins[i].append(item)
+                fills[i] += item
+            bins.pop(target)
+            fills.pop(target)
+            improved = True
+            continue
+
+        # 2) đổi miếng lớn của que rỗng nhất lấy miếng nhỏ hơn của que đầy hơn
+        A = bins[target]
+        for j in others:
+            B = bins[j]
+            for ai in range(len(A)):
+                for bi in range(len(B)):
+                    delta = A[ai] - B[bi]
+                    if delta > 0 and fills[j] + delta <= d:
+                        A[ai], B[bi] = B[bi], A[ai]
+                        fills[target] -= delta
+                        fills[j] += delta
+                        improved = True
+            if time.perf_counter() >= deadline:
+                break
+
+    # Finally sort bins by fill level
+    order = sorted(range(len(bins)), key=fills.__getitem__, reverse=True)
+    return [bins[i] for i in order]
+
+def cut_optimize(d: int, a: List[int], exact_max_parts: int = EXACT_MAX_PARTS,
+                 time_limit: float = IMPROVE_TIME_LIMIT) -> List[List[int]]:
+    """
+    Exact branch and bound for small orders, otherwise
+    BFD + bounded local optimization.
+    """
+    if len(a) <= exact_max_parts:
+        bins = cut_exact(d, a)
+    else:
+        bins = cut_bfd(d, a)
+        if len(bins) > lower_bound(d, a):
+            bins = local_optimize_swap(bins, d, time_limit)
+    bins.sort(key=lambda x: sum(x), reverse=True)
     return bins
 
 def compute_cut_lines_fixed(bins: List[List[int]], d: int, r: int, c: int,
@@ -142,3 +309,24 @@ def compute_cut_lines_fixed(bins: List[List[int]], d: int, r: int, c: int,
             # nếu pos > d => input không hợp lệ (miếng > d), ta vẫn bỏ qua
 
     return cut_lines
+
+
+if __name__ == "__main__":
+    # Benchmark: số que và thời gian trên các đơn hàng sinh bởi generate()
+    import sys
+    d = 1000
+    sizes = [int(x) for x in sys.argv[1:]] or [100, 1000, 10000, 100000]
+    print(f"{'parts':>8} {'lower':>7} {'method':>9} {'sticks':>7} {'seconds':>9}")
+    for n in sizes:
+        random.seed(n)
+        a = generate(d, n)
+        lb = lower_bound(d, a)
+        methods = [("ffd", cut_ffd), ("bfd", cut_bfd), ("optimize", cut_optimize)]
+        if n <= EXACT_MAX_PARTS:
+            methods.append(("exact", cut_exact))
+        for name, method in methods:
+            t = time.perf_counter()
+            bins = method(d, a)
+            t = time.perf_counter() - t
+            assert sorted(x for b in bins for x in b) == sorted(a)
+            print(f"{n:>8} {lb:>7} {name:>9} {len(bins):>7} {t:>9.3f}")
@@ -1,11 +1,17 @@
 from dataclasses import dataclass
-from typing import List, Tuple
+from itertools import accumulate, chain
+from typing import List, Optional, Tuple
 import math
 
+import numpy as np
+
 # IMPORT cut_optimize từ module hiện có (cut_handler)
 # sửa import nếu tên module khác
 from cut_handler import cut_optimize
 
+# sai lệch cho phép khi ghép chiều dài miếng đã xếp với Part
+MATCH_TOLERANCE = 1e-3
+
 
 @dataclass
 class Part:
@@ -25,45 +31,103 @@ class Part:
 @dataclass
 class CutPlan:
     """
-    Kết quả kế hoạch cắt:
+    Kết quả kế hoạch cắt, lưu theo cột (mảng NumPy) để exporter xử lý cả
+    khối mà không phải duyệt từng tuple:
     - stick_width: chiều rộng que
-    - cuts: list các đoạn cắt ngang, tuple (start_x, y, length_of_cut)
-    - holes: list các tâm lỗ, tuple (center_x, center_y)
+    - cuts: mảng (n, 3) các đoạn cắt ngang, mỗi dòng (start_x, y, length_of_cut)
+    - holes: mảng (n, 2) các tâm lỗ, mỗi dòng (center_x, center_y)
     - radius: bán kính lỗ (dùng chung cho tất cả lỗ)
-    - arches: list các arch (center_x, center_y, is_up)
-        is_up = True => cung 180° mở lên (arch hướng lên)
-        is_up = False => cung 180° mở xuống (arch hướng xuống)
+    - arches: mảng (n, 3) các arch, mỗi dòng (center_x, center_y, is_up)
+        is_up = 1 => cung 180° mở lên (arch hướng lên)
+        is_up = 0 => cung 180° mở xuống (arch hướng xuống)
+    - stick_lengths: chiều dài thanh gốc của từng vị trí que (slot) từ trái
+      sang phải; None nếu không rõ
+
+    Vẫn nhận list tuple như trước; duyệt từng dòng cũng cho ra tuple cũ.
     """
     stick_width: float
-    cuts: List[Tuple[float, float, float]]
-    holes: List[Tuple[float, float]]
+    cuts: np.ndarray
+    holes: np.ndarray
     radius: float
-    arches: List[Tuple[float, float, bool]]
+    arches: np.ndarray
+    stick_lengths: Optional[np.ndarray] = None
+
+    def __post_init__(self):
+        self.cuts = np.asarray(self.cuts, dtype=float).reshape(-1, 3)
+        self.holes = np.asarray(self.holes, dtype=float).reshape(-1, 2)
+        self.arches = np.asarray(self.arches, dtype=float).reshape(-1, 3)
+        if self.stick_lengths is not None:
+            self.stick_lengths = np.asarray(self.stick_lengths, dtype=float).reshape(-1)
+
     # print cut plan
     def __str__(self):
         s = "CutPlan:\n"
         s += f"Stick Width: {self.stick_width:.3f}\n"
         s += "Cuts:\n"
-        for (sx, y, length) in self.cuts:
+        for (sx, y, length) in self.cuts.tolist():
             s += f"  StartX: {sx:.3f}, Y: {y:.3f}, Length: {length:.3f}\n"
         s += "Holes:\n"
-        for (cx, cy) in self.holes:
+        for (cx, cy) in self.holes.tolist():
             s += f"  CenterX: {cx:.3f}, CenterY: {cy:.3f}\n"
         s += f"Radius: {self.radius:.3f}\n"
         s += "Arches:\n"
-        for (cx, cy, is_up) in self.arches:
+        for (cx, cy, is_up) in self.arches.tolist():
             dir_str = "Up" if is_up else "Down"
             s += f"  CenterX: {cx:.3f}, CenterY: {cy:.3f}, Direction: {dir_str}\n"
+        if self.stick_lengths is not None:
+            s += f"Stock: {format_slots(self.stick_lengths)}\n"
         return s
 
 
+def stick_slots(stick_lengths) -> List[Tuple[int, int, float]]:
+    """Các dải vị trí que liên tiếp cùng chiều dài thanh: [(đầu, cuối, chiều dài)], đánh số từ 1."""
+    slots = []
+    for i, length in enumerate(np.asarray(stick_lengths, dtype=float).tolist(), 1):
+        if slots and slots[-1][2] == length:
+            slots[-1] = (slots[-1][0], i, length)
+        else:
+            slots.append((i, i, length))
+    return slots
+
+
+def format_slots(stick_lengths) -> str:
+    """VD. "slots 1-12: 1000 mm, 13-15: 600 mm"."""
+    ranges = [(f"{first}" if first == last else f"{first}-{last}") + f": {length:g} mm"
+              for first, last, length in stick_slots(stick_lengths)]
+    return "slots " + ", ".join(ranges) if ranges else "no sticks"
+
+
+def match_parts(lengths: np.ndarray, pieces: np.ndarray, tol: float = MATCH_TOLERANCE) -> np.ndarray:
+    """
+    Ghép mỗi miếng đã xếp (pieces) với một Part (lengths) cùng chiều dài,
+    trả về chỉ số Part cho từng miếng.
+
+    Sắp xếp ổn định cả hai phía rồi ghép theo thứ tự: các miếng cùng chiều
+    dài nhận Part theo thứ tự chỉ số tăng dần, giống cách quét tuần tự cũ,
+    nhưng O(n log n) thay vì O(n²).
+    """
+    if len(lengths) != len(pieces):
+        raise ValueError(f"Packed {len(pieces)} pieces for {len(lengths)} parts")
+    by_piece = np.argsort(pieces, kind="stable")
+    by_part = np.argsort(lengths, kind="stable")
+    diff = np.abs(pieces[by_piece] - lengths[by_part])
+    if len(diff) and diff.max() > tol:
+        bad = pieces[by_piece][np.argmax(diff)]
+        raise ValueError(f"Cannot match part length {bad} to any remaining part")
+    part_index = np.empty(len(pieces), dtype=np.intp)
+    part_index[by_piece] = by_part
+    return part_index
+
+
 def build_cut_plan(
     stock_length: float,
     parts: List[Part],
     width: float,
     gap: float,
     hole_radius: float,
-    include_end_cut: bool = True
+    include_end_cut: bool = True,
+    bins: Optional[List[List[float]]] = None,
+    bin_lengths: Optional[List[float]] = None,
 ) -> CutPlan:
     """
     Tạo CutPlan từ:
@@ -73,89 +137,86 @@ def build_cut_plan(
     - gap: khoảng cách giữa các thanh khi xếp (c)
     - hole_radius: bán kính các lỗ (chung)
     - include_end_cut: nếu True tạo cut tại y=0 và sau mỗi miếng (trừ khi pos >= stock_length)
+    - bins: kết quả xếp thanh có sẵn; None thì gọi cut_optimize
+    - bin_lengths: chiều dài thanh gốc của từng bin (xếp nhiều loại thanh);
+      None thì mọi bin dài stock_length
 
     Trả về CutPlan.
     """
 
-    requested_lengths = [p.length for p in parts]
-
-    bins = cut_optimize(stock_length, requested_lengths)
-
-    remaining = []
-    for idx, p in enumerate(parts):
-        remaining.append((p.length, idx))
-    
-    tol = 1e-6
-
-    # helper to pop index matching length
-    def pop_part_index_by_length(target_length):
-        for i, (ln, idx) in enumerate(remaining):
-            if abs(ln - target_length) <= tol:
-                return remaining.pop(i)[1]
-        # if not found exact, try nearest (fallback)
-        for i, (ln, idx) in enumerate(remaining):
-            if abs(ln - target_length) < 1e-3:
-                return remaining.pop(i)[1]
-        # if still not found raise
-        raise ValueError(f"Cannot match part length {target_length} to any remaining part")
-
-    cuts: List[Tuple[float, float, float]] = []
-    holes_out: List[Tuple[float, float]] = []
-    arches_out: List[Tuple[float, float, bool]] = []
+    if bins is None:
+        bins = cut_optimize(stock_length, [p.length for p in parts])
 
     cut_extra_margin = 1.0
     cut_length_overall = width + 2.0
 
-    for bin_index, bin_pieces in enumerate(bins):
-        start_x = bin_index * (width + gap) - cut_extra_margin
-        x_center = start_x + (width / 2.0) + cut_extra_margin
-        center_x_for_holes_and_arch = start_x + cut_extra_margin + (width / 2.0)
-
-        y_cursor = 0.0
-
-        if include_end_cut:
-            cuts.append((start_x, 0.0, cut_length_overall))
-
-        for piece_length in bin_pieces:
-            part_index = pop_part_index_by_length(piece_length)
-            part = parts[part_index]
+    # ---- mỗi miếng: thanh chứa nó, mép dưới, mép trên ----
+    bin_sizes = np.fromiter(map(len, bins), dtype=np.intp, count=len(bins))
+    n = int(bin_sizes.sum())
+    pieces = np.fromiter(chain.from_iterable(bins), dtype=float, count=n)
+    # cộng dồn trong từng thanh giống y_cursor cũ, tránh sai số khi trừ tổng toàn cục
+    tops = np.fromiter(chain.from_iterable(map(accumulate, bins)), dtype=float, count=n)
+    bottoms = tops - pieces
+    piece_bin = np.repeat(np.arange(len(bins)), bin_sizes)
+    if bin_lengths is None:
+        stick_lengths = np.full(len(bins), float(stock_length))
+    else:
+        stick_lengths = np.asarray(bin_lengths, dtype=float)
+        if len(stick_lengths) != len(bins):
+            raise ValueError("bin_lengths must give one stock length per bin")
 
-            y_cursor += piece_length
-            cut_y = y_cursor
+    lengths = np.fromiter((p.length for p in parts), dtype=float, count=len(parts))
+    part_index = match_parts(lengths, pieces)
 
-            if cut_y < stock_length - 1e-9 or include_end_cut:
-                cuts.append((start_x, cut_y, cut_length_overall))
+    start_x = np.arange(len(bins)) * (width + gap) - cut_extra_margin
+    center_x = start_x + cut_extra_margin + (width / 2.0)
 
-            for hole_center_rel in part.hole_centers:
-                previous_y_before_piece = cut_y - piece_length
-                abs_hole_y = previous_y_before_piece + hole_center_rel
-                abs_hole_x = center_x_for_holes_and_arch
-                holes_out.append((abs_hole_x, abs_hole_y))
+    # ---- đường cắt ngang: y=0 của mỗi thanh rồi mép trên mỗi miếng ----
+    keep = slice(None) if include_end_cut else tops < stick_lengths[piece_bin] - 1e-9
+    cut_bin = piece_bin[keep]
+    cut_y = tops[keep]
+    if include_end_cut:
+        cut_bin = np.concatenate((np.arange(len(bins)), cut_bin))
+        cut_y = np.concatenate((np.zeros(len(bins)), cut_y))
+    order = np.argsort(cut_bin, kind="stable")
+    cuts = np.empty((len(order), 3))
+    cuts[:, 0] = start_x[cut_bin[order]]
+    cuts[:, 1] = cut_y[order]
+    cuts[:, 2] = cut_length_overall
 
-            if part.is_cut_down:
-                previous_y_before_piece = cut_y - piece_length
-                arch_center_x = center_x_for_holes_and_arch
-                arch_center_y = previous_y_before_piece + (width / 2.0)
-                # lower arch points up -> is_up = True
-                arches_out.append((arch_center_x, arch_center_y, True))
+    # ---- lỗ: vị trí tương đối của Part cộng mép dưới miếng ----
+    hole_counts = np.fromiter((len(p.hole_centers) for p in parts), dtype=np.intp, count=len(parts))
+    hole_rel = np.fromiter(chain.from_iterable(p.hole_centers for p in parts), dtype=float,
+                           count=int(hole_counts.sum()))
+    hole_first = np.cumsum(hole_counts) - hole_counts
+    counts = hole_counts[part_index]
+    hole_piece = np.repeat(np.arange(n), counts)
+    within = np.arange(len(hole_piece)) - np.repeat(np.cumsum(counts) - counts, counts)
+    holes = np.empty((len(hole_piece), 2))
+    holes[:, 0] = center_x[piece_bin[hole_piece]]
+    holes[:, 1] = bottoms[hole_piece] + hole_rel[hole_first[part_index[hole_piece]] + within]
 
-            if part.is_cut_up:
-                arch_center_x = center_x_for_holes_and_arch
-                arch_center_y = cut_y - (width / 2.0)
-                # upper arch points down -> is_up = False
-                arches_out.append((arch_center_x, arch_center_y, False))
+    # ---- cung bo: đầu dưới hướng lên, đầu trên hướng xuống ----
+    is_down = np.fromiter((p.is_cut_down for p in parts), dtype=bool, count=len(parts))[part_index]
+    is_up = np.fromiter((p.is_cut_up for p in parts), dtype=bool, count=len(parts))[part_index]
+    down, = np.nonzero(is_down)
+    up, = np.nonzero(is_up)
+    arch_piece = np.concatenate((down, up))
+    order = np.argsort(arch_piece, kind="stable")
+    arches = np.empty((len(arch_piece), 3))
+    arches[:, 0] = center_x[piece_bin[arch_piece]]
+    arches[:, 1] = np.concatenate((bottoms[down] + width / 2.0, tops[up] - width / 2.0))
+    arches[:, 2] = np.concatenate((np.ones(len(down)), np.zeros(len(up))))
+    arches = arches[order]
 
-
-    cut_plan = CutPlan(
+    return CutPlan(
         cuts=cuts,
-        holes=holes_out,
+        holes=holes,
         radius=hole_radius,
-        arches=arches_out,
-        stick_width=width
+        arches=arches,
+        stick_width=width,
+        stick_lengths=stick_lengths
     )
-    print(cut_plan)
-
-    return cut_plan
 
 if __name__ == "__main__":
     # Example usage
@@ -179,5 +240,29 @@ if __name__ == "__main__":
         hole_radius=hole_radius,
         include_end_cut=True
     )
-    
-    print(cut_plan)
\ No newline at end of file
+
+    print(cut_plan)
+
+    # Benchmark: dựng plan và G-code từ bins có sẵn (không tính thời gian xếp thanh)
+    import random
+    import sys
+    import time
+    from cut_handler import generate, cut_bfd
+    from extended_cut_export import plan_gcode
+
+    sizes = [int(x) for x in sys.argv[1:]] or [1000, 10000, 100000]
+    print(f"{'parts':>7} {'cuts':>7} {'holes':>7} {'arches':>7} {'build ms':>9} {'gcode ms':>9}")
+    for n in sizes:
+        random.seed(n)
+        parts = [Part(length=float(x), is_cut_down=random.random() < 0.3, is_cut_up=random.random() < 0.3,
+                      hole_centers=[x / 2.0] if x > 20 else [])
+                 for x in generate(1000, n)]
+        bins = cut_bfd(1000.0, [p.length for p in parts])
+        t = time.perf_counter()
+        plan = build_cut_plan(1000.0, parts, 10.0, 5.0, 1.5, bins=bins)
+        build = time.perf_counter() - t
+        t = time.perf_counter()
+        plan_gcode(plan)
+        gcode = time.perf_counter() - t
+        print(f"{n:>7} {len(plan.cuts):>7} {len(plan.holes):>7} {len(plan.arches):>7} "
+              f"{build * 1000:>9.1f} {gcode * 1000:>9.1f}")
\ No newline at end of file
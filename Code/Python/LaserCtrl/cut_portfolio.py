@@ -0,0 +1,166 @@
+import multiprocessing
+import os
+import random
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import List, Optional, Tuple
+
+from cut_handler import (cut_bfd, cut_ffd, cut_ffd_random, cut_optimize, lower_bound,
+                         EXACT_MAX_PARTS)
+
+# thời gian tối đa cho cả portfolio (giây)
+PORTFOLIO_TIME_LIMIT = 2.0
+# số hạt giống cho FFD xáo trộn, mỗi hạt giống một tiến trình
+RANDOM_SEEDS = 4
+# phần thời gian chừa lại để gửi kết quả về và đóng pool
+DEADLINE_MARGIN = 0.1
+
+
+def plan_score(bins: List[List[int]], d: int) -> Tuple[int, float]:
+    """
+    Nhỏ hơn là tốt hơn: ít que trước, sau đó phần thừa dồn vào ít que
+    (tổng bình phương độ đầy lớn) để mẩu thừa còn dùng được.
+    """
+    return len(bins), -sum((sum(b) / d) ** 2 for b in bins)
+
+
+def portfolio_strategies(n: int, seeds: int = RANDOM_SEEDS) -> List[str]:
+    """Tên các chiến lược chạy cho một đơn hàng n chi tiết."""
+    names = ["ffd", "bfd", "improve"]
+    if n > EXACT_MAX_PARTS:
+        # đơn nhỏ thì "improve" đã giải chính xác
+        names += [f"random:{seed}" for seed in range(1, seeds + 1)]
+    return names
+
+
+def run_strategy(name: str, d: int, a: List[int], deadline: float, budget: float, target: int) -> dict:
+    """
+    Chạy một chiến lược trong tiến trình con cho tới deadline (time.time()),
+    tối đa budget giây kể từ lúc bắt đầu, hoặc khi đạt target que. Trả về
+    bins tốt nhất và số liệu.
+    """
+    start = time.perf_counter()
+    deadline = min(deadline, time.time() + budget)
+    runs = 1
+    if name == "ffd":
+        bins = cut_ffd(d, a)
+    elif name == "bfd":
+        bins = cut_bfd(d, a)
+    elif name == "improve":
+        bins = cut_optimize(d, a, time_limit=max(0.0, deadline - time.time()))
+    elif name.startswith("random:"):
+        rng = random.Random(int(name.split(":", 1)[1]))
+        bins = cut_ffd_random(d, a, rng)
+        score = plan_score(bins, d)
+        # mỗi vòng xấp xỉ thời gian vòng đầu; không bắt đầu vòng sẽ vượt deadline
+        lap = time.perf_counter() - start
+        while len(bins) > target and time.time() + lap < deadline:
+            trial = cut_ffd_random(d, a, rng)
+            runs += 1
+            trial_score = plan_score(trial, d)
+            if trial_score < score:
+                bins, score = trial, trial_score
+    else:
+        raise ValueError(f"Unknown strategy {name}")
+    return {"bins": bins, "seconds": time.perf_counter() - start, "runs": runs}
+
+
+def solve_portfolio(
+    d: int,
+    a: List[int],
+    time_limit: float = PORTFOLIO_TIME_LIMIT,
+    workers: Optional[int] = None,
+    seeds: int = RANDOM_SEEDS,
+) -> Tuple[List[List[int]], dict]:
+    """
+    Chạy song song BFD, cut_optimize (tìm kiếm cải tiến) và các FFD xáo
+    trộn trên nhiều tiến trình, dừng khi hết time_limit giây hoặc khi một
+    chiến lược đạt cận dưới. Trả về (bins, report) với bins tốt nhất tìm
+    được; chiến lược chưa xong khi hết giờ bị bỏ qua.
+
+    FFD chạy ngay trong tiến trình gọi trong lúc pool khởi động, nên luôn
+    có kết quả kể cả khi các tiến trình con không kịp deadline.
+    """
+    started = time.perf_counter()
+    deadline = time.time() + time_limit
+    target = lower_bound(d, a)
+    names = portfolio_strategies(len(a), seeds)[1:]
+    workers = max(1, min(workers or os.cpu_count() or 1, len(names)))
+    # FFD xáo trộn chỉ lặp trong phần thời gian của mình khi ít worker
+    share = time_limit * workers / len(names)
+
+    # spawn: không fork tiến trình đang giữ Tk
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    try:
+        futures = {}
+        for name in names:
+            budget = share if name.startswith("random:") else time_limit
+            futures[pool.submit(run_strategy, name, d, a, deadline - DEADLINE_MARGIN, budget, target)] = name
+
+        result = run_strategy("ffd", d, a, deadline, time_limit, target)
+        best, best_name = result.pop("bins"), "ffd"
+        results = {"ffd": dict(result, status="done", sticks=len(best))}
+
+        pending = set(futures)
+        while pending and len(best) > target:
+            done, pending = wait(pending, timeout=max(0.0, deadline - time.time()),
+                                 return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                name = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    results[name] = {"status": "error", "error": str(e)}
+                    continue
+                bins = result.pop("bins")
+                results[name] = dict(result, status="done", sticks=len(bins))
+                if plan_score(bins, d) < plan_score(best, d):
+                    best, best_name = bins, name
+        for future in pending:
+            # đã đạt cận dưới thì các chiến lược còn lại không cần chạy
+            results[futures[future]] = {"status": "timeout" if len(best) > target else "skipped"}
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    best = sorted(best, key=sum, reverse=True)
+    report = {
+        "parts": len(a),
+        "lower_bound": target,
+        "sticks": len(best),
+        "strategy": best_name,
+        "workers": workers,
+        "seconds": time.perf_counter() - started,
+        "strategies": {name: results[name] for name in ["ffd"] + names},
+    }
+    return best, report
+
+
+def format_report(report: dict) -> str:
+    lines = [f"Sticks: {report['sticks']} (lower bound {report['lower_bound']}), "
+             f"best: {report['strategy']}",
+             f"{report['parts']} parts solved in {report['seconds']:.2f} s on {report['workers']} workers"]
+    for name, result in report["strategies"].items():
+        if result["status"] == "done":
+            lines.append(f"  {name}: {result['sticks']} sticks, {result['seconds']:.2f} s"
+                         + (f", {result['runs']} runs" if result["runs"] > 1 else ""))
+        else:
+            lines.append(f"  {name}: {result['status']}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    # Benchmark: portfolio so với từng chiến lược chạy riêng
+    import sys
+    from cut_handler import generate
+
+    d = 1000
+    sizes = [int(x) for x in sys.argv[1:]] or [20, 1000, 10000, 100000]
+    for n in sizes:
+        random.seed(n)
+        a = generate(d, n)
+        bins, report = solve_portfolio(d, a)
+        assert sorted(x for b in bins for x in b) == sorted(a)
+        print(format_report(report))
+        print()
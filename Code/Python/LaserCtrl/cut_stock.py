@@ -0,0 +1,415 @@
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from cut_handler import FirstFitTree
+
+# chiều dài được làm tròn lên lưới này (mm) để giải knapsack bằng quy hoạch động
+RESOLUTION = 0.1
+STOCK_TIME_LIMIT = 2.0
+# số bộ mẫu cắt (pattern) được giữ lại giữa các lần giải
+PATTERN_CACHE_SIZE = 16
+# tính lại B^-1 sau bấy nhiêu phép xoay để tránh dồn sai số
+REFACTOR_EVERY = 64
+TOLERANCE = 1e-9
+# dừng column generation khi LP cách cận dưới ít hơn bấy nhiêu thanh rẻ nhất
+LP_GAP = 0.5
+
+
+@dataclass(frozen=True)
+class StockType:
+    """
+    Một loại thanh gốc:
+    - name: tên hiển thị
+    - length: chiều dài dùng được để xếp chi tiết (mm)
+    - cost: giá một thanh; None => bằng length (tối thiểu vật liệu)
+    """
+    name: str
+    length: float
+    cost: Optional[float] = None
+
+    @property
+    def price(self) -> float:
+        return self.length if self.cost is None else self.cost
+
+
+def to_units(values, resolution: float = RESOLUTION, up: bool = True) -> np.ndarray:
+    """Chiều dài -> số ô lưới; chi tiết làm tròn lên, thanh làm tròn xuống."""
+    scaled = np.asarray(values, dtype=float) / resolution
+    return (np.ceil(scaled - 1e-6) if up else np.floor(scaled + 1e-6)).astype(np.int64)
+
+
+def knapsack(values: np.ndarray, weights: np.ndarray, bounds: np.ndarray,
+             capacities: np.ndarray) -> List[Tuple[float, np.ndarray]]:
+    """
+    Knapsack có giới hạn số lượng: max sum(values * counts) với
+    sum(weights * counts) <= capacity, 0 <= counts <= bounds, cho mọi
+    capacity trong capacities.
+
+    Mỗi chi tiết được tách nhị phân thành các gói 1, 2, 4, ... rồi giải như
+    knapsack 0/1, mỗi gói là một phép toán trên cả mảng dung lượng. Bảng
+    quy hoạch động theo dung lượng lớn nhất dùng chung cho mọi loại thanh.
+    """
+    capacity = int(capacities.max())
+    dp = np.zeros(capacity + 1)
+    chunks = []
+    for i in np.nonzero((values > TOLERANCE) & (weights <= capacity))[0]:
+        left = min(int(bounds[i]), capacity // int(weights[i]))
+        size = 1
+        while left > 0:
+            take = min(size, left)
+            w, v = take * int(weights[i]), take * values[i]
+            candidate = dp[:-w] + v
+            better = candidate > dp[w:] + TOLERANCE
+            dp[w:] = np.where(better, candidate, dp[w:])
+            chunks.append((i, take, w, better))
+            left -= take
+            size *= 2
+
+    results = []
+    for room in capacities.tolist():
+        value = float(dp[room])
+        counts = np.zeros(len(values), dtype=np.int64)
+        for i, take, w, better in reversed(chunks):
+            if room >= w and better[room - w]:
+                counts[i] += take
+                room -= w
+        results.append((value, counts))
+    return results
+
+
+class MasterLP:
+    """
+    LP chính của column generation: min c.x với A.x >= b, x >= 0, giải bằng
+    simplex đơn hình hiệu chỉnh trên B^-1 đặc (số dòng = số chiều dài khác
+    nhau, thường vài trăm).
+
+    Cột 0..m-1 của A là biến dư (-I), cột m..2m-1 là các mẫu cắt đồng nhất
+    (chỉ một loại chi tiết), dùng làm cơ sở khả thi ban đầu.
+    """
+
+    def __init__(self, patterns: np.ndarray, costs: np.ndarray, demand: np.ndarray):
+        m = len(demand)
+        self.m = m
+        self.A = np.hstack((-np.eye(m), patterns.astype(float)))
+        self.c = np.concatenate((np.zeros(m), costs))
+        self.b = demand.astype(float)
+        self.basis = np.arange(m, 2 * m)
+        self.refactor()
+        self.pivots = 0
+
+    def refactor(self):
+        self.Binv = np.linalg.inv(self.A[:, self.basis])
+        self.xB = self.Binv @ self.b
+
+    def add_columns(self, patterns: np.ndarray, costs: np.ndarray):
+        # cơ sở hiện tại vẫn khả thi: chỉ cần thêm cột rồi giải tiếp
+        self.A = np.hstack((self.A, patterns.astype(float)))
+        self.c = np.concatenate((self.c, costs))
+
+    def duals(self) -> np.ndarray:
+        return self.c[self.basis] @ self.Binv
+
+    def objective(self) -> float:
+        return float(self.c[self.basis] @ self.xB)
+
+    def solution(self) -> np.ndarray:
+        """Số lần dùng mỗi mẫu cắt (không gồm biến dư)."""
+        x = np.zeros(len(self.c))
+        x[self.basis] = self.xB
+        return np.maximum(x[self.m:], 0.0)
+
+    def solve(self, deadline: float):
+        degenerate = 0
+        while time.perf_counter() < deadline:
+            reduced = self.c - self.duals() @ self.A
+            reduced[self.basis] = 0.0
+            if degenerate > 2 * self.m:
+                # nhiều phép xoay suy biến liên tiếp: quy tắc Bland để không lặp vòng
+                candidates = np.nonzero(reduced < -TOLERANCE)[0]
+                if not len(candidates):
+                    return
+                j = candidates[0]
+            else:
+                j = int(np.argmin(reduced))
+                if reduced[j] >= -TOLERANCE:
+                    return
+            u = self.Binv @ self.A[:, j]
+            rows = np.nonzero(u > TOLERANCE)[0]
+            if not len(rows):
+                raise ValueError("Cutting stock LP is unbounded")
+            ratios = self.xB[rows] / u[rows]
+            best = ratios.min()
+            tied = rows[ratios <= best + TOLERANCE]
+            r = tied[np.argmin(self.basis[tied])]
+            theta = max(self.xB[r] / u[r], 0.0)
+            degenerate = degenerate + 1 if theta <= TOLERANCE else 0
+
+            self.xB -= theta * u
+            self.xB[r] = theta
+            pivot_row = self.Binv[r] / u[r]
+            self.Binv -= np.outer(u, pivot_row)
+            self.Binv[r] = pivot_row
+            self.basis[r] = j
+
+            self.pivots += 1
+            if self.pivots % REFACTOR_EVERY == 0:
+                self.refactor()
+
+
+_pattern_cache: "OrderedDict[tuple, List[Tuple[int, np.ndarray]]]" = OrderedDict()
+
+
+def homogeneous_patterns(weights: np.ndarray, demand: np.ndarray, capacities: np.ndarray,
+                         costs: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Với mỗi chi tiết, mẫu cắt chỉ gồm chi tiết đó trên loại thanh rẻ nhất
+    tính theo mỗi chiếc. Trả về (stock, counts) với counts là ma trận chéo.
+    """
+    fit = np.minimum(capacities[None, :] // weights[:, None], demand[:, None])
+    with np.errstate(divide="ignore"):
+        unit_cost = np.where(fit > 0, costs[None, :] / np.maximum(fit, 1), np.inf)
+    stock = np.argmin(unit_cost, axis=1)
+    if np.isinf(unit_cost[np.arange(len(weights)), stock]).any():
+        i = int(np.argmax(np.isinf(unit_cost[np.arange(len(weights)), stock])))
+        raise ValueError(f"Part #{i} is longer than every stock type")
+    return stock, np.diag(fit[np.arange(len(weights)), stock])
+
+
+def generate_columns(weights: np.ndarray, demand: np.ndarray, capacities: np.ndarray,
+                     costs: np.ndarray, pool: List[Tuple[int, np.ndarray]],
+                     deadline: float, gap: float = LP_GAP) -> Tuple[MasterLP, np.ndarray, dict]:
+    """
+    Column generation: giải LP trên các mẫu cắt đang có, rồi với giá đối
+    ngẫu của từng chi tiết tìm trên mỗi loại thanh mẫu cắt có giá trị lớn
+    hơn giá thanh (knapsack). Dừng khi không còn mẫu nào cải thiện, khi LP
+    cách cận dưới chưa tới gap thanh rẻ nhất, hoặc hết giờ. Các mẫu mới
+    được thêm vào pool.
+    """
+    stock, diagonal = homogeneous_patterns(weights, demand, capacities, costs)
+    seen = {(s, counts.tobytes()) for s, counts in pool}
+    columns = [(s, np.minimum(counts, demand)) for s, counts in pool]
+    patterns = np.column_stack([diagonal] + [c for _, c in columns]) if columns else diagonal
+    lp = MasterLP(patterns, np.concatenate((costs[stock], [costs[s] for s, _ in columns])), demand)
+    stocks = list(stock) + [s for s, _ in columns]
+
+    rounds = 0
+    converged = False
+    bound = 0.0
+    while time.perf_counter() < deadline:
+        lp.solve(deadline)
+        rounds += 1
+        y = np.maximum(lp.duals(), 0.0)
+        priced = knapsack(y, weights, demand, capacities)
+        # cận dưới Farley: LP tối ưu >= z / max(giá trị mẫu / giá thanh)
+        ratio = max(1.0, max(value / cost for (value, _), cost in zip(priced, costs)))
+        bound = max(bound, lp.objective() / ratio)
+        if lp.objective() - bound < costs.min() * gap:
+            # còn chênh dưới một phần thanh rẻ nhất: làm tròn không khác đi
+            converged = True
+            break
+        new_stock, new_patterns = [], []
+        for s, (value, counts) in enumerate(priced):
+            key = (s, counts.tobytes())
+            if value > costs[s] * (1 + 1e-9) + TOLERANCE and key not in seen:
+                seen.add(key)
+                pool.append((s, counts))
+                new_stock.append(s)
+                new_patterns.append(counts)
+        if not new_patterns:
+            converged = True
+            break
+        lp.add_columns(np.column_stack(new_patterns), costs[new_stock])
+        stocks += new_stock
+
+    info = {"rounds": rounds, "converged": converged, "lp_bound": lp.objective() if converged else bound,
+            "pivots": lp.pivots}
+    return lp, np.array(stocks), info
+
+
+def ffd_patterns(weights: np.ndarray, demand: np.ndarray, capacity: int) -> List[np.ndarray]:
+    """First Fit Decreasing trên đơn hàng đã gom; trả về số chi tiết mỗi loại trong từng thanh."""
+    order = np.repeat(np.argsort(-weights, kind="stable"), demand[np.argsort(-weights, kind="stable")])
+    tree = FirstFitTree(capacity, len(order))
+    patterns: List[np.ndarray] = []
+    fills: List[int] = []
+    for i in order.tolist():
+        w = int(weights[i])
+        idx = tree.find(w)
+        if idx == len(patterns):
+            patterns.append(np.zeros(len(weights), dtype=np.int64))
+            fills.append(0)
+        patterns[idx][i] += 1
+        fills[idx] += w
+        tree.update(idx, capacity - fills[idx])
+    return patterns
+
+
+def downsize(chosen: List[Tuple[int, np.ndarray]], weights: np.ndarray, capacities: np.ndarray,
+             costs: np.ndarray) -> List[Tuple[int, np.ndarray]]:
+    """Đổi mỗi thanh sang loại rẻ nhất còn chứa được phần đã dùng."""
+    by_price = np.argsort(costs, kind="stable").tolist()
+    result = []
+    for s, counts in chosen:
+        used = int(counts @ weights)
+        result.append((next(t for t in by_price if capacities[t] >= used), counts))
+    return result
+
+
+def plan_cost(chosen: List[Tuple[int, np.ndarray]], costs: np.ndarray) -> float:
+    return float(sum(costs[s] for s, _ in chosen))
+
+
+def solve_stock(
+    a: List[float],
+    stocks: List[StockType],
+    time_limit: float = STOCK_TIME_LIMIT,
+    resolution: float = RESOLUTION,
+) -> Tuple[List[Tuple[StockType, List[float]]], dict]:
+    """
+    Cutting stock nhiều loại thanh: chọn loại và số thanh để cắt đủ các chi
+    tiết a với tổng giá nhỏ nhất.
+
+    Gom các chiều dài trùng nhau, giải LP bằng column generation, rồi làm
+    tròn: dùng phần nguyên của nghiệm, phần còn thiếu xếp bằng FFD. Mỗi
+    thanh được đổi sang loại rẻ nhất còn chứa được. Nếu FFD trên một loại
+    thanh rẻ hơn thì dùng FFD. Mẫu cắt được cache theo bộ chiều dài và loại
+    thanh nên giải lại cùng đơn hàng nhanh hơn.
+
+    Trả về (bins, report), bins là list (StockType, các chiều dài cắt).
+    """
+    started = time.perf_counter()
+    deadline = started + time_limit
+    if not stocks:
+        raise ValueError("No stock types given")
+
+    lengths, demand = np.unique(np.asarray(a, dtype=float), return_counts=True)
+    lengths, demand = lengths[::-1], demand[::-1]
+    weights = to_units(lengths, resolution)
+    capacities = to_units([s.length for s in stocks], resolution, up=False)
+    costs = np.array([s.price for s in stocks], dtype=float)
+    if len(weights) and weights.max() > capacities.max():
+        raise ValueError(f"Part length {lengths[np.argmax(weights)]:g} is longer than every stock type")
+    # thu nhỏ lưới theo ước chung lớn nhất của các chiều dài chi tiết
+    g = int(np.gcd.reduce(weights)) if len(weights) else 1
+    if g > 1:
+        weights, capacities = weights // g, capacities // g
+
+    key = (tuple(lengths.tolist()), tuple((s.length, s.price) for s in stocks), resolution)
+    pool = _pattern_cache.pop(key, [])
+    cached = len(pool)
+    _pattern_cache[key] = pool
+    while len(_pattern_cache) > PATTERN_CACHE_SIZE:
+        _pattern_cache.popitem(last=False)
+
+    # phương án dự phòng: FFD trên từng loại thanh, sau đó đổi thanh cho rẻ
+    chosen, strategy = [], "ffd"
+    longest = int(weights.max()) if len(weights) else 0
+    for s, capacity in enumerate(capacities):
+        if capacity < longest:
+            continue
+        trial = downsize([(s, c) for c in ffd_patterns(weights, demand, int(capacity))],
+                         weights, capacities, costs)
+        if not chosen or plan_cost(trial, costs) < plan_cost(chosen, costs):
+            chosen, strategy = trial, f"ffd {stocks[s].name}"
+
+    info = {"rounds": 0, "converged": True, "lp_bound": 0.0, "pivots": 0}
+    if len(lengths):
+        lp, column_stock, info = generate_columns(weights, demand, capacities, costs, pool, deadline)
+        x = lp.solution()
+        patterns = lp.A[:, lp.m:].astype(np.int64)
+        # phần nguyên của nghiệm LP, phần còn thiếu xếp FFD lên loại thanh tốt nhất
+        rounded = []
+        residual = demand.copy()
+        for j in np.nonzero(x >= 1 - 1e-9)[0]:
+            for _ in range(int(x[j] + 1e-9)):
+                take = np.minimum(patterns[:, j], residual)
+                if not take.any():
+                    break
+                rounded.append((int(column_stock[j]), take))
+                residual -= take
+        best_rest = None
+        longest = int(weights[residual > 0].max()) if residual.any() else 0
+        for s, capacity in enumerate(capacities):
+            if capacity < longest:
+                continue
+            rest = downsize([(s, c) for c in ffd_patterns(weights, residual, int(capacity))],
+                            weights, capacities, costs)
+            if best_rest is None or plan_cost(rest, costs) < plan_cost(best_rest, costs):
+                best_rest = rest
+        rounded = downsize(rounded, weights, capacities, costs) + best_rest
+        if plan_cost(rounded, costs) < plan_cost(chosen, costs) - TOLERANCE:
+            chosen, strategy = rounded, "column generation"
+
+    bins = [(stocks[s], np.repeat(lengths, counts).tolist()) for s, counts in chosen]
+    bins.sort(key=lambda b: (b[0].length, sum(b[1])), reverse=True)
+
+    report = stock_report(a, bins, time.perf_counter() - started)
+    report.update(strategy=strategy, lp_bound=info["lp_bound"], converged=info["converged"], rounds=info["rounds"],
+                  columns=len(pool), cached_columns=cached, distinct_lengths=len(lengths))
+    return bins, report
+
+
+def stock_report(a: List[float], bins: List[Tuple[StockType, List[float]]], seconds: float) -> dict:
+    """Giá, vật liệu và phần thừa của một kế hoạch cắt nhiều loại thanh."""
+    material = sum(stock.length for stock, _ in bins)
+    used = float(sum(a))
+    counts: Dict[str, int] = {}
+    for stock, _ in bins:
+        counts[stock.name] = counts.get(stock.name, 0) + 1
+    return {
+        "parts": len(a),
+        "sticks": len(bins),
+        "stocks": counts,
+        "cost": sum(stock.price for stock, _ in bins),
+        "material": material,
+        "used": used,
+        "waste": material - used,
+        "waste_pct": 100.0 * (material - used) / material if material else 0.0,
+        "seconds": seconds,
+    }
+
+
+def format_report(report: dict) -> str:
+    stocks = ", ".join(f"{name} x{count}" for name, count in report["stocks"].items())
+    text = (f"{report['parts']} parts on {report['sticks']} sticks ({stocks})\n"
+            f"Cost: {report['cost']:.2f}, waste {report['waste']:.1f} mm ({report['waste_pct']:.2f}%)")
+    if "lp_bound" in report:
+        text += (f"\nLP bound: {report['lp_bound']:.2f}"
+                 f"{'' if report['converged'] else ' (not converged)'}, "
+                 f"{report['columns']} patterns, {report['seconds']:.2f} s")
+    return text
+
+
+if __name__ == "__main__":
+    # Benchmark: nhiều loại thanh so với FFD trên từng chiều dài thanh riêng lẻ
+    import random
+    import sys
+    from cut_handler import cut_ffd, generate
+
+    stocks = [StockType("600", 600.0), StockType("800", 800.0), StockType("1000", 1000.0),
+              StockType("1200", 1200.0, 1100.0)]
+    sizes = [int(x) for x in sys.argv[1:]] or [100, 1000, 5000]
+    print(f"{'parts':>6} {'lengths':>8} {'method':>10} {'sticks':>7} {'cost':>10} {'waste %':>8} {'seconds':>8}")
+    for n in sizes:
+        random.seed(n)
+        # đơn hàng thực tế lặp lại nhiều chiều dài
+        kinds = generate(600, max(5, n // 20))
+        a = [float(random.choice(kinds)) for _ in range(n)]
+        distinct = len(set(a))
+        for stock in stocks:
+            t = time.perf_counter()
+            ffd = [(stock, b) for b in cut_ffd(stock.length, a)]
+            r = stock_report(a, ffd, time.perf_counter() - t)
+            print(f"{n:>6} {distinct:>8} {'ffd ' + stock.name:>10} {r['sticks']:>7} {r['cost']:>10.0f} "
+                  f"{r['waste_pct']:>8.2f} {r['seconds']:>8.3f}")
+        for attempt in ("cg", "cg cached"):
+            bins, r = solve_stock(a, stocks)
+            assert sorted(x for _, b in bins for x in b) == sorted(a)
+            assert all(sum(b) <= stock.length + 1e-6 for stock, b in bins)
+            print(f"{n:>6} {distinct:>8} {attempt:>10} {r['sticks']:>7} {r['cost']:>10.0f} "
+                  f"{r['waste_pct']:>8.2f} {r['seconds']:>8.3f}   LP bound {r['lp_bound']:.0f}"
+                  f"{'' if r['converged'] else '*'}")
@@ -1,67 +1,157 @@
 from cut_plan_builder import *
+from toolpath_order import (PathItem, optimize_order, order_report, travel_distance,
+                            ORDER_TIME_LIMIT, RAPID_RATE)
 import math
 
-def export_gcode_extended(
-    plan: CutPlan,
-    filename: str,
-    feedrate: int = 280,
-    power: int = 1000,
-):
-    with open(filename, "w", encoding="utf-8") as f:
-        f.write("; GCODE generated from CutPlan\n")
-        f.write("G21 ; set mm mode\n")
-        f.write("G90 ; absolute positioning\n")
-        f.write("G0 X0 Y0\n\n")
 
-        # ---- CẮT ĐƯỜNG THẲNG ----
-        for (start_x, y, length_of_cut) in plan.cuts:
-            end_x = start_x + length_of_cut
+# loại đường cắt, cũng là chỉ số mẫu G-code trong path_templates
+PATH_CUT = 0
+PATH_HOLE = 1
+PATH_ARCH_CW = 2
+PATH_ARCH_CCW = 3
 
-            f.write(f"G0 X{start_x:.3f} Y{y:.3f}\n")
-            f.write(f"M3 S{power}\n")
-            f.write(f"G1 X{end_x:.3f} Y{y:.3f} F{feedrate}\n")
-            f.write("M5\n\n")
+# số giá trị %.3f mỗi mẫu cần
+PATH_VALUES = np.array([4, 6, 5, 5])
 
-        # ---- KHOAN LỖ ----
-        for (center_x, center_y) in plan.holes:
-            # bắt đầu ở điểm bên phải (cx + R, cy)
-            x_start = center_x + plan.radius
-            y_start = center_y
+GCODE_HEADER = ("; GCODE generated from CutPlan\n"
+                "G21 ; set mm mode\n"
+                "G90 ; absolute positioning\n"
+                "G0 X0 Y0\n\n")
+GCODE_FOOTER = "G0 X0 Y0\n; END\n"
 
-            # move to start on circle perimeter
-            f.write(f"G0 X{x_start:.3f} Y{y_start:.3f}\n")
-            f.write(f"M3 S{power}\n")
 
-            # 1st half-circle: từ (cx+R, cy) -> (cx-R, cy)
-            # I = center_x - x_start = -plan.radius
-            f.write(f"G2 X{center_x - plan.radius:.3f} Y{center_y:.3f} I{-plan.radius:.3f} J0.000 F{feedrate}\n")
+def plan_paths(plan: CutPlan) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Các đường cắt của plan dạng cột, theo thứ tự cũ: cắt thẳng, khoan lỗ rồi
+    bo góc. Trả về (kind, start, end, length); với cung bo, kind là
+    PATH_ARCH_CCW nếu cung hướng lên (đi từ trái sang phải).
+    """
+    cuts, holes, arches = plan.cuts, plan.holes, plan.arches
+    half = plan.stick_width / 2
+    kind = np.concatenate((np.full(len(cuts), PATH_CUT), np.full(len(holes), PATH_HOLE),
+                           np.where(arches[:, 2] != 0, PATH_ARCH_CCW, PATH_ARCH_CW)))
+    # lỗ bắt đầu và kết thúc ở điểm bên phải (cx + R, cy)
+    hole_start = holes + [plan.radius, 0.0]
+    start = np.concatenate((cuts[:, :2], hole_start, arches[:, :2] - [half, 0.0]))
+    end = np.concatenate((cuts[:, :2] + np.column_stack((cuts[:, 2], np.zeros(len(cuts)))),
+                          hole_start, arches[:, :2] + [half, 0.0]))
+    length = np.concatenate((cuts[:, 2], np.full(len(holes), 2 * math.pi * plan.radius),
+                             np.full(len(arches), math.pi * half)))
+    return kind, start, end, length
 
-            # 2nd half-circle: từ (cx-R, cy) -> (cx+R, cy)
-            # Now start is (cx-R,cy), so I = center_x - (cx-R) = +plan.radius
-            f.write(f"G2 X{x_start:.3f} Y{y_start:.3f} I{plan.radius:.3f} J0.000 F{feedrate}\n")
 
-            f.write("M5\n\n")
+def plan_path_items(plan: CutPlan) -> List[PathItem]:
+    """
+    Mỗi đường cắt, lỗ và cung bo của plan thành một PathItem; payload là chỉ
+    số của nó trong plan_paths.
+    """
+    kind, start, end, length = plan_paths(plan)
+    return [PathItem(tuple(s), tuple(e), l, i)
+            for i, (s, e, l) in enumerate(zip(start.tolist(), end.tolist(), length.tolist()))]
 
+
+def path_templates(plan: CutPlan, feedrate, power) -> List[str]:
+    """Mẫu G-code cho từng loại đường, các toạ độ để dạng %.3f."""
+    radius = plan.radius
+    head = f"G0 X%.3f Y%.3f\nM3 S{power}\n"
+    return [
+        # ---- CẮT ĐƯỜNG THẲNG ----
+        head + f"G1 X%.3f Y%.3f F{feedrate}\nM5\n\n",
+        # ---- KHOAN LỖ ----
+        # 1st half-circle: (cx+R, cy) -> (cx-R, cy), I = -R
+        # 2nd half-circle: (cx-R, cy) -> (cx+R, cy), I = +R
+        head + f"G2 X%.3f Y%.3f I{-radius:.3f} J0.000 F{feedrate}\n"
+               f"G2 X%.3f Y%.3f I{radius:.3f} J0.000 F{feedrate}\nM5\n\n",
         # ---- CẮT CUNG BO GÓC ----
-        for (center_x, center_y, is_up) in plan.arches:
-            # giả sử dùng cung 180° với bán kính = radius
-            # điểm bắt đầu là bên trái: center_x - radius
-            start_x = center_x - plan.stick_width / 2
-            end_x = center_x + plan.stick_width / 2
-            y = center_y
-
-            f.write(f"G0 X{start_x:.3f} Y{y:.3f}\n")
-            f.write(f"M3 S{power}\n")
-
-            # G2 CW hoặc G3 CCW dựa theo hướng
-            if is_up:
-                # cung hướng lên: CCW (G3)
-                f.write(f"G3 X{end_x:.3f} Y{y:.3f} I{plan.stick_width / 2:.3f} J0.000 F{feedrate}\n")
-            else:
-                # cung hướng xuống: CW (G2)
-                f.write(f"G2 X{end_x:.3f} Y{y:.3f} I{plan.stick_width / 2:.3f} J0.000 F{feedrate}\n")
-
-            f.write("M5\n\n")
-
-        f.write("G0 X0 Y0\n")
-        f.write("; END\n")
+        # cung 180°, tâm ở giữa điểm đầu và điểm cuối
+        head + f"G2 X%.3f Y%.3f I%.3f J0.000 F{feedrate}\nM5\n\n",
+        head + f"G3 X%.3f Y%.3f I%.3f J0.000 F{feedrate}\nM5\n\n",
+    ]
+
+
+def plan_gcode(plan: CutPlan, order=None, flips=None, feedrate=280, power=1000) -> str:
+    """
+    G-code của các đường cắt trong plan theo thứ tự order (chỉ số trong
+    plan_paths, mặc định thứ tự cũ), flips[i] = True nếu đi ngược chiều.
+
+    Toàn bộ toạ độ được gom thành một mảng rồi định dạng một lần bằng %,
+    không ghi từng dòng.
+    """
+    kind, start, end, _ = plan_paths(plan)
+    if order is not None:
+        order = np.asarray(order, dtype=np.intp)
+        kind, start, end = kind[order], start[order], end[order]
+    flips = np.zeros(len(kind), dtype=bool) if flips is None else np.asarray(flips, dtype=bool)
+    flipped = flips[:, None]
+    start, end = np.where(flipped, end, start), np.where(flipped, start, end)
+
+    # cung hướng lên: CCW (G3) khi đi từ trái sang phải; đi ngược lại thì đổi chiều
+    is_arch = kind >= PATH_ARCH_CW
+    kind = np.where(is_arch & flips, PATH_ARCH_CW + PATH_ARCH_CCW - kind, kind)
+
+    values = np.zeros((len(kind), 6))
+    values[:, 0:2] = start
+    values[:, 2:4] = end
+    hole = kind == PATH_HOLE
+    values[hole, 2] = start[hole, 0] - 2 * plan.radius
+    values[hole, 4:6] = start[hole]
+    values[is_arch, 4] = (end[is_arch, 0] - start[is_arch, 0]) / 2
+
+    used = np.arange(values.shape[1]) < PATH_VALUES[kind][:, None]
+    templates = path_templates(plan, feedrate, power)
+    return "".join([templates[k] for k in kind.tolist()]) % tuple(values[used].tolist())
+
+
+def order_plan(
+    plan: CutPlan,
+    optimize_travel: bool = True,
+    time_limit: float = ORDER_TIME_LIMIT,
+    feedrate: int = 280,
+    rapid_rate: float = RAPID_RATE,
+) -> Tuple[List[int], List[bool], dict]:
+    """
+    Thứ tự cắt của plan: (order, flips, report) với order là chỉ số trong
+    plan_paths, flips[i] = True nếu đi ngược chiều. Với optimize_travel, thứ
+    tự và chiều cắt được sắp lại để đầu laser chạy G0 ít nhất (xem
+    toolpath_order.optimize_order). Thứ tự không phụ thuộc feedrate/power.
+    """
+    items = plan_path_items(plan)
+    if optimize_travel:
+        ordered, report = optimize_order(items, time_limit=time_limit, feedrate=feedrate,
+                                         rapid_rate=rapid_rate)
+    else:
+        ordered = [(item, False) for item in items]
+        travel = travel_distance(items)
+        report = order_report(items, travel, travel, feedrate, rapid_rate)
+    return [item.payload for item, _ in ordered], [reversed_ for _, reversed_ in ordered], report
+
+
+def gcode_document(plan: CutPlan, order=None, flips=None, feedrate=280, power=1000) -> str:
+    """
+    Toàn bộ file G-code: phần đầu, plan_gcode rồi phần kết. Khi plan dùng
+    nhiều loại thanh, phần đầu ghi thêm chiều dài thanh của từng vị trí que.
+    """
+    header = GCODE_HEADER
+    if plan.stick_lengths is not None and len(np.unique(plan.stick_lengths)) > 1:
+        header = GCODE_HEADER.replace("\n", f"\n; stock {format_slots(plan.stick_lengths)}\n", 1)
+    return header + plan_gcode(plan, order, flips, feedrate, power) + GCODE_FOOTER
+
+
+def export_gcode_extended(
+    plan: CutPlan,
+    filename: str,
+    feedrate: int = 280,
+    power: int = 1000,
+    optimize_travel: bool = True,
+    time_limit: float = ORDER_TIME_LIMIT,
+    rapid_rate: float = RAPID_RATE,
+) -> dict:
+    """
+    Ghi plan ra G-code. Với optimize_travel, thứ tự và chiều cắt được sắp
+    lại để đầu laser chạy G0 ít nhất (xem toolpath_order.optimize_order);
+    trả về báo cáo quãng đường và thời gian ước lượng trước/sau.
+    """
+    order, flips, report = order_plan(plan, optimize_travel, time_limit, feedrate, rapid_rate)
+    with open(filename, "w", encoding="utf-8") as f:
+        f.write(gcode_document(plan, order, flips, feedrate, power))
+    return report
@@ -0,0 +1,333 @@
+import math
+from typing import List, Optional, Tuple
+
+from toolpath_order import (PathItem, Point, dist, estimate_time, optimize_order, travel_distance,
+                            ORDER_TIME_LIMIT, RAPID_RATE)
+
+# Hai điểm cách nhau dưới mức này (mm) coi như trùng: nối liền, không tắt laser
+CHAIN_TOLERANCE = 1e-3
+# Sai lệch (mm) dưới mức này coi như thẳng hàng khi gộp đoạn G1
+COLLINEAR_TOLERANCE = 1e-6
+# Số đoạn G1 cho một vòng tròn khi không dùng G2/G3
+CIRCLE_SEGMENTS = 60
+
+
+class ToolPath:
+    """
+    One continuous burn: a start point and a list of moves, each
+    ("G1", x, y) or ("G2"/"G3", x, y, center_x, center_y). Arc centres
+    are absolute, so a path can be reversed or joined to another without
+    recomputing them; I/J are worked out when the G-code is written.
+    """
+
+    def __init__(self, start: Point, moves: Optional[list] = None):
+        self.start = start
+        self.moves = moves if moves is not None else []
+
+    @property
+    def end(self) -> Point:
+        if not self.moves:
+            return self.start
+        return self.moves[-1][1], self.moves[-1][2]
+
+    def points(self) -> List[Point]:
+        return [self.start] + [(m[1], m[2]) for m in self.moves]
+
+    def length(self) -> float:
+        total = 0.0
+        pos = self.start
+        for move in self.moves:
+            end = (move[1], move[2])
+            if move[0] == "G1":
+                total += dist(pos, end)
+            else:
+                total += arc_length(move[0], pos, end, (move[3], move[4]))
+            pos = end
+        return total
+
+    def reversed(self) -> "ToolPath":
+        points = self.points()
+        moves = []
+        for k in range(len(self.moves) - 1, -1, -1):
+            move = self.moves[k]
+            x, y = points[k]
+            if move[0] == "G1":
+                moves.append(("G1", x, y))
+            else:
+                moves.append(("G3" if move[0] == "G2" else "G2", x, y, move[3], move[4]))
+        return ToolPath(self.end, moves)
+
+
+def arc_length(command: str, start: Point, end: Point, center: Point) -> float:
+    radius = dist(start, center)
+    a0 = math.atan2(start[1] - center[1], start[0] - center[0])
+    a1 = math.atan2(end[1] - center[1], end[0] - center[0])
+    sweep = (a1 - a0) if command == "G3" else (a0 - a1)
+    sweep %= 2 * math.pi
+    if sweep < 1e-12:
+        # điểm đầu trùng điểm cuối: trọn một vòng
+        sweep = 2 * math.pi
+    return radius * sweep
+
+
+def circle_path(cx: float, cy: float, r: float, arcs: bool = True) -> ToolPath:
+    """Full circle, counter-clockwise from (cx + r, cy)."""
+    if not arcs:
+        return arc_segments(cx, cy, r, 0.0, 360.0)
+    return ToolPath((cx + r, cy), [("G3", cx - r, cy, cx, cy), ("G3", cx + r, cy, cx, cy)])
+
+
+def arc_path(cx: float, cy: float, r: float, a0: float, a1: float, arcs: bool = True) -> ToolPath:
+    """Counter-clockwise arc from angle a0 to a1 (degrees)."""
+    sweep = (a1 - a0) % 360.0 or 360.0
+    if sweep >= 360.0:
+        a1 = a0 + 360.0
+    else:
+        a1 = a0 + sweep
+    if not arcs:
+        return arc_segments(cx, cy, r, a0, a1)
+    start = (cx + r * math.cos(math.radians(a0)), cy + r * math.sin(math.radians(a0)))
+    if sweep >= 360.0:
+        # vòng trọn: hai nửa cung, như khi khoan lỗ
+        mid = a0 + 180.0
+        return ToolPath(start, [("G3", cx + r * math.cos(math.radians(mid)), cy + r * math.sin(math.radians(mid)),
+                                 cx, cy), ("G3", start[0], start[1], cx, cy)])
+    return ToolPath(start, [("G3", cx + r * math.cos(math.radians(a1)), cy + r * math.sin(math.radians(a1)),
+                             cx, cy)])
+
+
+def arc_segments(cx: float, cy: float, r: float, a0: float, a1: float) -> ToolPath:
+    segments = max(1, int(math.ceil(CIRCLE_SEGMENTS * (a1 - a0) / 360.0)))
+    start = (cx + r * math.cos(math.radians(a0)), cy + r * math.sin(math.radians(a0)))
+    moves = []
+    for i in range(1, segments + 1):
+        angle = math.radians(a0 + (a1 - a0) * i / segments)
+        moves.append(("G1", cx + r * math.cos(angle), cy + r * math.sin(angle)))
+    return ToolPath(start, moves)
+
+
+def shape_toolpath(cmd: str, nums: List[float], arcs: bool = True) -> Optional[ToolPath]:
+    """ToolPath of one DesignerTab shape line, None for unknown commands."""
+    if cmd == "L":
+        x1, y1, x2, y2 = nums
+        return ToolPath((x1, y1), [("G1", x2, y2)])
+    elif cmd == "LV":
+        x, y, length = nums
+        return ToolPath((x, y), [("G1", x + length, y)])
+    elif cmd == "LH":
+        x, y, length = nums
+        return ToolPath((x, y), [("G1", x, y + length)])
+    elif cmd in ["R", "RC"]:
+        if cmd == "R":
+            x, y, w, h = nums
+        else:
+            cx, cy, w, h = nums
+            x = cx - w / 2
+            y = cy - h / 2
+        return ToolPath((x, y), [("G1", x + w, y), ("G1", x + w, y + h), ("G1", x, y + h), ("G1", x, y)])
+    elif cmd == "C":
+        cx, cy, r = nums
+        return circle_path(cx, cy, r, arcs)
+    elif cmd == "A":
+        cx, cy, r, a0, a1 = nums
+        return arc_path(cx, cy, r, a0, a1, arcs)
+    elif cmd == "P":
+        if len(nums) < 4 or len(nums) % 2:
+            raise ValueError("P needs pairs of coordinates: P x1 y1 x2 y2 ...")
+        return ToolPath((nums[0], nums[1]), [("G1", nums[i], nums[i + 1]) for i in range(2, len(nums), 2)])
+    return None
+
+
+def segment_distance(p: Point, a: Point, b: Point) -> float:
+    """Distance from p to the segment a-b."""
+    dx, dy = b[0] - a[0], b[1] - a[1]
+    length2 = dx * dx + dy * dy
+    if length2 == 0.0:
+        return dist(p, a)
+    t = ((p[0] - a[0]) * dx + (p[1] - a[1]) * dy) / length2
+    t = max(0.0, min(1.0, t))
+    return math.hypot(p[0] - (a[0] + t * dx), p[1] - (a[1] + t * dy))
+
+
+def simplify_polyline(points: List[Point], tolerance: float) -> List[Point]:
+    """
+    Ramer-Douglas-Peucker: drop the points that lie within tolerance of
+    the simplified line. Distances are to segments, not infinite lines,
+    so a line that doubles back on itself keeps its turning point.
+    """
+    n = len(points)
+    if n < 3:
+        return list(points)
+    keep = [False] * n
+    keep[0] = keep[-1] = True
+    # ngăn xếp thay cho đệ quy: polyline dài không bị tràn stack
+    stack = [(0, n - 1)]
+    while stack:
+        first, last = stack.pop()
+        a, b = points[first], points[last]
+        worst, index = -1.0, -1
+        for i in range(first + 1, last):
+            d = segment_distance(points[i], a, b)
+            if d > worst:
+                worst, index = d, i
+        if index != -1 and worst > tolerance:
+            keep[index] = True
+            stack.append((first, index))
+            stack.append((index, last))
+    return [p for p, k in zip(points, keep) if k]
+
+
+def merge_collinear(points: List[Point]) -> List[Point]:
+    """Join consecutive segments running in the same direction."""
+    return simplify_polyline(points, COLLINEAR_TOLERANCE)
+
+
+def compact_path(path: ToolPath, tolerance: float = 0.0) -> ToolPath:
+    """
+    Merge collinear G1 runs and, with tolerance > 0, simplify them;
+    arcs and their endpoints are left alone.
+    """
+    tolerance = max(tolerance, COLLINEAR_TOLERANCE)
+    moves = []
+    run = [path.start]
+    for move in path.moves + [None]:
+        if move is not None and move[0] == "G1":
+            run.append((move[1], move[2]))
+            continue
+        if len(run) > 1:
+            moves.extend(("G1", x, y) for x, y in simplify_polyline(run, tolerance)[1:])
+        if move is not None:
+            moves.append(move)
+            run = [(move[1], move[2])]
+    return ToolPath(path.start, moves)
+
+
+def chain_paths(paths: List[ToolPath], tolerance: float = CHAIN_TOLERANCE) -> List[ToolPath]:
+    """Join paths that start where the previous one ends into one burn."""
+    chains = []
+    for path in paths:
+        if chains and dist(chains[-1].end, path.start) <= tolerance:
+            chains[-1].moves.extend(path.moves)
+        else:
+            chains.append(ToolPath(path.start, list(path.moves)))
+    return chains
+
+
+def path_gcode(path: ToolPath, speed: float, power: float) -> List[str]:
+    lines = [f"G0 X{path.start[0]:.3f} Y{path.start[1]:.3f}", f"M3 S{power}"]
+    pos = path.start
+    feed = f" F{speed}"
+    for move in path.moves:
+        if move[0] == "G1":
+            lines.append(f"G1 X{move[1]:.3f} Y{move[2]:.3f}{feed}")
+        else:
+            lines.append(f"{move[0]} X{move[1]:.3f} Y{move[2]:.3f} "
+                         f"I{move[3] - pos[0]:.3f} J{move[4] - pos[1]:.3f}{feed}")
+        # F là modal, chỉ cần ghi một lần cho mỗi lần bật laser
+        feed = ""
+        pos = (move[1], move[2])
+    lines.append("M5")
+    return lines
+
+
+def design_gcode(shapes: List[Tuple[str, List[float]]], speed: float, power: float,
+                 optimize: bool = True, arcs: bool = True, chain: bool = True,
+                 tolerance: Optional[float] = 0.0, time_limit: float = ORDER_TIME_LIMIT,
+                 rapid_rate: float = RAPID_RATE) -> Tuple[List[str], dict]:
+    """
+    G-code for DesignerTab shapes: optionally reordered for least travel,
+    circles and arcs as G2/G3, touching paths chained into one burn and
+    G1 runs merged/simplified within tolerance (None leaves them as they
+    are). Returns the lines and a report of their size and estimated time.
+    """
+    paths = [p for p in (shape_toolpath(cmd, nums, arcs) for cmd, nums in shapes) if p is not None]
+    items = [PathItem(p.start, p.end, p.length(), p) for p in paths]
+    order_report = None
+    if optimize and items:
+        ordered, order_report = optimize_order(items, time_limit=time_limit, feedrate=speed,
+                                               rapid_rate=rapid_rate)
+        paths = [item.payload.reversed() if reversed_ else item.payload for item, reversed_ in ordered]
+    if chain:
+        paths = chain_paths(paths)
+    if tolerance is not None:
+        paths = [compact_path(p, tolerance) for p in paths]
+
+    lines = ["G21", "G90"]
+    for path in paths:
+        lines.extend(path_gcode(path, speed, power))
+
+    travel = travel_distance([PathItem(p.start, p.end, 0.0) for p in paths])
+    cut_length = sum(p.length() for p in paths)
+    report = {
+        "lines": len(lines),
+        "bytes": len("\n".join(lines).encode()),
+        "burns": len(paths),
+        "moves": sum(len(p.moves) for p in paths),
+        "travel": travel,
+        "cut_length": cut_length,
+        "time": estimate_time(travel, cut_length, speed, rapid_rate),
+        "order": order_report,
+    }
+    return lines, report
+
+
+def format_report(report: dict) -> str:
+    return (f"{report['lines']} lines, {report['bytes'] / 1024:.1f} KB, {report['burns']} laser on/off, "
+            f"{report['moves']} moves\n"
+            f"Travel {report['travel']:.0f} mm, estimated time {report['time'] / 60:.1f} min")
+
+
+if __name__ == "__main__":
+    # Benchmark: kích thước file và thời gian ước lượng, cách cũ so với cách mới
+    import random
+    import sys
+    import time
+    from gcode_sim import simulate_gcode
+
+    def random_design(n: int) -> List[Tuple[str, List[float]]]:
+        shapes = []
+        for _ in range(n):
+            x, y = random.uniform(0, 600), random.uniform(0, 400)
+            kind = random.random()
+            if kind < 0.3:
+                shapes.append(("C", [x, y, random.uniform(2, 20)]))
+            elif kind < 0.5:
+                shapes.append(("RC", [x, y, random.uniform(5, 40), random.uniform(5, 40)]))
+            elif kind < 0.8:
+                # đa giác khép kín bằng các đoạn L nối đầu nhau, nhiều đoạn thẳng hàng
+                r = random.uniform(5, 30)
+                points = []
+                for i in range(24):
+                    angle = 2 * math.pi * (i // 4) / 6
+                    t = (i % 4) / 4.0
+                    a, b = angle, 2 * math.pi * (i // 4 + 1) / 6
+                    points.append((x + r * ((1 - t) * math.cos(a) + t * math.cos(b)),
+                                   y + r * ((1 - t) * math.sin(a) + t * math.sin(b))))
+                points.append(points[0])
+                for p, q in zip(points, points[1:]):
+                    shapes.append(("L", [p[0], p[1], q[0], q[1]]))
+            else:
+                # đường cong số hoá: nhiều điểm rất sát nhau
+                nums = []
+                for i in range(200):
+                    nums += [x + i * 0.5, y + 10 * math.sin(i / 20.0) + random.uniform(-0.005, 0.005)]
+                shapes.append(("P", nums))
+        return shapes
+
+    sizes = [int(x) for x in sys.argv[1:]] or [100, 1000]
+    print(f"{'shapes':>7} {'output':>10} {'lines':>8} {'KB':>8} {'burns':>7} {'moves':>8} {'min':>7} "
+          f"{'sim min':>8} {'seconds':>8}")
+    for n in sizes:
+        random.seed(n)
+        shapes = random_design(n)
+        for name, kwargs in [("legacy", dict(optimize=False, arcs=False, chain=False, tolerance=None)),
+                             ("ordered", dict(arcs=False, chain=False, tolerance=None)),
+                             ("compact", dict(tolerance=0.0)),
+                             ("simplify", dict(tolerance=0.02))]:
+            t = time.perf_counter()
+            lines, report = design_gcode(shapes, 280, 1000, **kwargs)
+            t = time.perf_counter() - t
+            # thời gian có tính gia tốc, theo planner của GRBL
+            simulated = simulate_gcode(lines)["total_time"]
+            print(f"{n:>7} {name:>10} {report['lines']:>8} {report['bytes'] / 1024:>8.1f} {report['burns']:>7} "
+                  f"{report['moves']:>8} {report['time'] / 60:>7.1f} {simulated / 60:>8.1f} {t:>8.2f}")
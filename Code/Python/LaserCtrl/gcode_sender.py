@@ -0,0 +1,339 @@
+import os
+import threading
+import time
+from collections import deque
+from typing import Iterable, Iterator, List, Optional, Union
+
+# GRBL 1.1 (Arduino Uno) nhận tối đa 128 byte trong RX buffer
+GRBL_RX_BUFFER_SIZE = 128
+GRBL_PLANNER_BLOCKS = 15
+
+FEED_HOLD = b"!"
+CYCLE_START = b"~"
+SOFT_RESET = b"\x18"
+
+
+def clean_gcode_line(line: str) -> str:
+    """Bỏ comment (; và (...)) và khoảng trắng thừa, trả về "" nếu dòng rỗng."""
+    pos = line.find(";")
+    if pos != -1:
+        line = line[:pos]
+    while "(" in line:
+        start = line.index("(")
+        end = line.find(")", start)
+        if end == -1:
+            line = line[:start]
+            break
+        line = line[:start] + line[end + 1:]
+    return line.strip()
+
+
+class GcodeSender(threading.Thread):
+    """
+    Streams G-code to GRBL from a background thread using the character
+    counting protocol: lines are sent as long as the bytes still waiting
+    for an "ok"/"error" fit in the controller's RX buffer, so the planner
+    never starves between lines.
+
+    source is a file path (read lazily, line by line) or an iterable of
+    lines. The Tk thread should only call pause/resume/abort and poll
+    get_stats; nothing in here touches the UI.
+    """
+
+    def __init__(self, ser, source: Union[str, Iterable[str]],
+                 rx_buffer_size: int = GRBL_RX_BUFFER_SIZE):
+        super().__init__(daemon=True)
+        self.ser = ser
+        self.source = source
+        self.rx_buffer_size = rx_buffer_size
+        self.total_bytes = os.path.getsize(source) if isinstance(source, str) else 0
+
+        self.write_lock = threading.Lock()
+        self.resume_event = threading.Event()
+        self.resume_event.set()
+        self.abort_event = threading.Event()
+
+        self.pending = deque()      # độ dài các dòng đã gửi, chưa có ok
+        self.pending_bytes = 0
+        self.read_bytes = 0         # số byte đã đọc từ file (để tính %)
+        self.lines_sent = 0
+        self.lines_acked = 0
+        self.bytes_sent = 0
+        self.errors: List[str] = []
+        self.alarm: Optional[str] = None
+        self.exception: Optional[BaseException] = None
+        self.start_time = None
+        self.end_time = None
+        self.paused_time = 0.0
+        self.pause_start = None
+
+    # ---------------- control (any thread) ----------------
+
+    def pause(self):
+        if self.resume_event.is_set():
+            self.pause_start = time.monotonic()
+            self.resume_event.clear()
+            self.write_realtime(FEED_HOLD)
+
+    def resume(self):
+        if not self.resume_event.is_set():
+            self.paused_time += time.monotonic() - self.pause_start
+            self.pause_start = None
+            self.write_realtime(CYCLE_START)
+            self.resume_event.set()
+
+    def abort(self):
+        self.abort_event.set()
+        self.resume_event.set()
+        self.write_realtime(SOFT_RESET)
+
+    def is_paused(self) -> bool:
+        return not self.resume_event.is_set()
+
+    def write_realtime(self, command: bytes):
+        # lệnh realtime không đi qua RX buffer nên không tính vào pending
+        with self.write_lock:
+            self.ser.write(command)
+            self.ser.flush()
+
+    # ---------------- streaming (worker thread) ----------------
+
+    def iter_lines(self) -> Iterator[str]:
+        if isinstance(self.source, str):
+            # đọc nhị phân để read_bytes cùng đơn vị với total_bytes (getsize),
+            # kể cả với comment không phải ASCII hay xuống dòng CRLF
+            with open(self.source, "rb") as f:
+                for raw_line in f:
+                    self.read_bytes += len(raw_line)
+                    yield raw_line.decode("utf-8", errors="replace")
+        else:
+            for line in self.source:
+                yield line
+
+    def run(self):
+        self.start_time = time.monotonic()
+        try:
+            for raw_line in self.iter_lines():
+                line = clean_gcode_line(raw_line)
+                if not line:
+                    continue
+                data = (line + "\n").encode()
+                if len(data) > self.rx_buffer_size:
+                    raise ValueError(f"G-code line longer than GRBL RX buffer: {line}")
+                # chờ đến khi dòng mới vừa chỗ trống trong RX buffer
+                while self.pending_bytes + len(data) > self.rx_buffer_size:
+                    if self.stopped():
+                        return
+                    self.read_response()
+                self.resume_event.wait()
+                if self.stopped():
+                    return
+                with self.write_lock:
+                    self.ser.write(data)
+                self.pending.append(len(data))
+                self.pending_bytes += len(data)
+                self.lines_sent += 1
+                self.bytes_sent += len(data)
+            while self.pending and not self.stopped():
+                self.read_response()
+        except BaseException as e:
+            self.exception = e
+        finally:
+            self.end_time = time.monotonic()
+
+    def stopped(self) -> bool:
+        return self.abort_event.is_set() or self.alarm is not None
+
+    def read_response(self):
+        response = self.ser.readline().decode(errors="replace").strip()
+        if not response:
+            return
+        if response == "ok" or response.startswith("error"):
+            if response != "ok":
+                self.errors.append(f"line {self.lines_acked + 1}: {response}")
+            if self.pending:
+                self.pending_bytes -= self.pending.popleft()
+            self.lines_acked += 1
+        elif response.startswith("ALARM"):
+            self.alarm = response
+        # các dòng khác (banner, [MSG:...], <status>) bỏ qua
+
+    # ---------------- stats ----------------
+
+    def elapsed(self) -> float:
+        if self.start_time is None:
+            return 0.0
+        end = self.end_time or time.monotonic()
+        paused = self.paused_time
+        if self.pause_start is not None:
+            paused += end - self.pause_start
+        return max(0.0, end - self.start_time - paused)
+
+    def get_stats(self) -> dict:
+        elapsed = self.elapsed()
+        progress = None
+        eta = None
+        if self.total_bytes:
+            progress = min(1.0, self.read_bytes / self.total_bytes)
+            if progress > 0 and not self.end_time:
+                eta = elapsed * (1.0 - progress) / progress
+        return {
+            "lines_sent": self.lines_sent,
+            "lines_acked": self.lines_acked,
+            "bytes_sent": self.bytes_sent,
+            "pending_bytes": self.pending_bytes,
+            "lines_per_second": self.lines_acked / elapsed if elapsed else 0.0,
+            "elapsed": elapsed,
+            "progress": progress,
+            "eta": eta,
+            "paused": self.is_paused(),
+            "errors": list(self.errors),
+            "alarm": self.alarm,
+            "done": self.end_time is not None,
+        }
+
+
+class SimulatedGrbl:
+    """
+    Fake serial port modelling GRBL's flow control, for trying the sender
+    without a machine.
+
+    Bytes written land in an RX buffer of rx_buffer_size bytes. A line is
+    parsed as soon as the planner has a free block and its "ok" reaches
+    the host latency seconds later (USB round trip); each planner block
+    then takes block_time seconds to execute. Overflowing the RX buffer
+    is counted in overflows, and time the planner sits empty between two
+    lines in starved_time.
+    """
+
+    def __init__(self, block_time: float = 0.002, latency: float = 0.004,
+                 rx_buffer_size: int = GRBL_RX_BUFFER_SIZE,
+                 planner_blocks: int = GRBL_PLANNER_BLOCKS, timeout: float = 1.0):
+        self.block_time = block_time
+        self.latency = latency
+        self.rx_buffer_size = rx_buffer_size
+        self.planner_blocks = planner_blocks
+        self.timeout = timeout
+        self.lock = threading.Condition()
+        self.rx = bytearray()
+        self.planner = deque()      # thời điểm hoàn thành của từng block
+        self.responses = deque()    # (thời điểm host nhận được, dòng trả lời)
+        self.hold = False
+        self.hold_start = None
+        self.idle_since = None
+        self.max_rx_used = 0
+        self.overflows = 0
+        self.lines_done = 0
+        self.starved_time = 0.0
+        self.responses.append((0.0, b"Grbl 1.1h ['$' for help]\r\n"))
+
+    def advance(self, now: float):
+        if self.hold:
+            return
+        # chạy các block đã xong, nạp dòng mới từ RX vào planner
+        while True:
+            if self.planner and self.planner[0] <= now:
+                self.idle_since = self.planner.popleft()
+                self.lines_done += 1
+                continue
+            if len(self.planner) < self.planner_blocks and b"\n" in self.rx:
+                end = self.rx.index(b"\n") + 1
+                del self.rx[:end]
+                if self.planner:
+                    start = self.planner[-1]
+                else:
+                    start = now
+                    if self.idle_since is not None:
+                        self.starved_time += now - self.idle_since
+                self.planner.append(start + self.block_time)
+                self.responses.append((now + self.latency, b"ok\r\n"))
+                continue
+            break
+
+    def write(self, data: bytes) -> int:
+        with self.lock:
+            now = time.monotonic()
+            self.advance(now)
+            for byte in data:
+                char = bytes((byte,))
+                if char == FEED_HOLD:
+                    self.hold, self.hold_start = True, now
+                elif char == CYCLE_START and self.hold:
+                    self.hold = False
+                    shift = now - self.hold_start
+                    self.planner = deque(t + shift for t in self.planner)
+                    if self.idle_since is not None:
+                        self.idle_since += shift
+                elif char == SOFT_RESET:
+                    self.rx.clear()
+                    self.planner.clear()
+                    self.hold = False
+                    self.idle_since = None
+                    self.responses.append((now, b"Grbl 1.1h ['$' for help]\r\n"))
+                elif len(self.rx) < self.rx_buffer_size:
+                    self.rx.append(byte)
+                else:
+                    self.overflows += 1
+            self.max_rx_used = max(self.max_rx_used, len(self.rx))
+            self.advance(now)
+            self.lock.notify_all()
+        return len(data)
+
+    def flush(self):
+        return
+
+    def readline(self) -> bytes:
+        deadline = time.monotonic() + self.timeout
+        with self.lock:
+            while True:
+                now = time.monotonic()
+                self.advance(now)
+                if self.responses and self.responses[0][0] <= now:
+                    return self.responses.popleft()[1]
+                if now >= deadline:
+                    return b""
+                wait = deadline - now
+                if self.responses:
+                    wait = min(wait, self.responses[0][0] - now)
+                if self.planner and not self.hold:
+                    wait = min(wait, max(0.0, self.planner[0] - now))
+                self.lock.wait(wait)
+
+    def close(self):
+        return
+
+
+def send_line_by_line(ser, lines: Iterable[str]):
+    """Cách gửi cũ: gửi một dòng rồi chờ ok, dùng để so sánh."""
+    for raw_line in lines:
+        line = clean_gcode_line(raw_line)
+        if not line:
+            continue
+        ser.write((line + "\n").encode())
+        while ser.readline().strip() != b"ok":
+            pass
+
+
+if __name__ == "__main__":
+    # So sánh gửi từng dòng với character counting trên máy giả lập
+    import sys
+    path = sys.argv[1] if len(sys.argv) > 1 else "cut_plan.gcode"
+    with open(path) as f:
+        lines = f.readlines()
+    block_time = 0.002
+
+    sim = SimulatedGrbl(block_time)
+    sim.readline()  # banner
+    t = time.monotonic()
+    send_line_by_line(sim, lines)
+    t = time.monotonic() - t
+    print(f"line by line      {t:7.3f} s  starved {sim.starved_time:7.3f} s  max RX {sim.max_rx_used:4d} B")
+
+    sim = SimulatedGrbl(block_time)
+    sender = GcodeSender(sim, path)
+    sender.start()
+    sender.join()
+    stats = sender.get_stats()
+    print(f"char counting     {stats['elapsed']:7.3f} s  starved {sim.starved_time:7.3f} s  "
+          f"max RX {sim.max_rx_used:4d} B  overflows {sim.overflows}  "
+          f"{stats['lines_per_second']:.0f} lines/s  {stats['lines_acked']} lines")
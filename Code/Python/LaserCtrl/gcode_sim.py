@@ -0,0 +1,487 @@
+import time
+from dataclasses import dataclass
+from typing import Iterable, Iterator, Optional, Tuple, Union
+
+import numpy as np
+
+from gcode_sender import GRBL_PLANNER_BLOCKS
+
+# Mặc định của một máy laser GRBL 1.1 nhỏ ($110/$111, $120/$121, $11, $12)
+MAX_RATE = (3000.0, 3000.0)         # mm/min
+ACCELERATION = (500.0, 500.0)       # mm/s^2
+JUNCTION_DEVIATION = 0.01           # mm
+ARC_TOLERANCE = 0.002               # mm
+
+# Số byte đọc mỗi lần khi phân tích file
+CHUNK_BYTES = 8 << 20
+
+# loại chuyển động
+RAPID, LINEAR, ARC_CW, ARC_CCW = 0, 1, 2, 3
+
+NEWLINE, SPACE = ord("\n"), ord(" ")
+
+
+@dataclass
+class MachineSettings:
+    """
+    The GRBL settings the planner works from: per-axis max rate (mm/min)
+    and acceleration (mm/s^2), junction deviation and arc tolerance (mm),
+    and how many blocks the planner looks ahead.
+    """
+    max_rate: Tuple[float, float] = MAX_RATE
+    acceleration: Tuple[float, float] = ACCELERATION
+    junction_deviation: float = JUNCTION_DEVIATION
+    arc_tolerance: float = ARC_TOLERANCE
+    planner_blocks: int = GRBL_PLANNER_BLOCKS
+
+
+class ModalState:
+    """What carries over from one chunk of G-code to the next."""
+
+    def __init__(self):
+        self.x = 0.0
+        self.y = 0.0
+        self.motion = RAPID
+        self.feed = 0.0
+        self.scale = 1.0
+        self.absolute = 1.0
+        self.spindle = 0.0          # 0 tắt, 3 hoặc 4 bật
+        self.power = 0.0
+        self.sync = True            # có lệnh dừng đang chờ chuyển động kế tiếp
+        self.lines = 0
+        self.dwell = 0.0
+
+
+class MoveList:
+    """
+    Moves parsed from G-code, one entry per motion line, as NumPy arrays:
+    start/end points, arc centre (NaN for straight moves), motion kind,
+    feed (mm/min), laser on, sync (a full stop comes first: M3/M5, G4,
+    M0/M2/M30) and source line number.
+    """
+    fields = ("x0", "y0", "x1", "y1", "cx", "cy", "kind", "feed", "laser", "sync", "line")
+    # kiểu của cột khi không có chuyển động nào (các cột khác là float)
+    dtypes = {"kind": np.int8, "laser": bool, "sync": bool, "line": np.intp}
+
+    def __init__(self, chunks: list, state: ModalState):
+        for name in self.fields:
+            if chunks:
+                column = np.concatenate([c[name] for c in chunks])
+            else:
+                column = np.zeros(0, dtype=self.dtypes.get(name, float))
+            setattr(self, name, column)
+        self.lines = state.lines
+        self.dwell = state.dwell
+
+    def __len__(self):
+        return len(self.kind)
+
+
+def iter_chunks(source: Union[str, Iterable[str]]) -> Iterator[bytes]:
+    """Blocks of whole lines from a file path or any iterable of lines."""
+    if isinstance(source, str):
+        rest = b""
+        with open(source, "rb") as f:
+            while True:
+                data = f.read(CHUNK_BYTES)
+                if not data:
+                    break
+                data = rest + data
+                end = data.rfind(b"\n") + 1
+                if end == 0:
+                    rest = data
+                    continue
+                rest = data[end:]
+                yield data[:end]
+        if rest:
+            yield rest + b"\n"
+    else:
+        chunk, size = [], 0
+        for line in source:
+            chunk.append(line if line.endswith("\n") else line + "\n")
+            size += len(line)
+            if size >= CHUNK_BYTES:
+                yield "".join(chunk).encode()
+                chunk, size = [], 0
+        if chunk:
+            yield "".join(chunk).encode()
+
+
+def ffill(values: np.ndarray, initial: float) -> np.ndarray:
+    """Replace each NaN with the last value before it, initial at the start."""
+    idx = np.where(np.isnan(values), 0, np.arange(1, len(values) + 1))
+    np.maximum.accumulate(idx, out=idx)
+    return np.concatenate(([initial], values))[idx]
+
+
+def since_line_start(marks: np.ndarray, newline: np.ndarray) -> np.ndarray:
+    """How many marks come at or before each byte on its own line."""
+    count = np.cumsum(marks)
+    start = np.maximum.accumulate(np.where(newline, count, 0))
+    return count - start
+
+
+def tokenize(data: bytes):
+    """
+    Split a block of G-code into words without a Python loop: returns
+    the number of lines, and for every word its letter, value and line.
+    """
+    buf = np.frombuffer(data, dtype=np.uint8)
+    newline = buf == NEWLINE
+    lines = data.count(b"\n")
+    keep = buf > SPACE
+    # comment ; tới cuối dòng và (...); phần lớn file không có nên bỏ qua cho nhanh
+    if b";" in data or b"(" in data:
+        comment = since_line_start(buf == ord(";"), newline) > 0
+        comment |= (since_line_start(buf == ord("("), newline) - since_line_start(buf == ord(")"), newline)) > 0
+        comment |= buf == ord(")")
+        keep &= ~comment
+    # dòng lệnh hệ thống ($H, $$) và dấu % không phải G-code chuyển động
+    if b"$" in data or b"%" in data:
+        line_of_byte = np.cumsum(newline) - newline
+        system = np.zeros(lines + 1, dtype=bool)
+        system[line_of_byte[((buf == ord("$")) | (buf == ord("%"))) & keep]] = True
+        keep &= ~system[line_of_byte]
+    keep |= newline
+    buf = buf[keep]
+    newline = newline[keep]
+    upper = np.where((buf >= ord("a")) & (buf <= ord("z")), buf - 32, buf).astype(np.uint8)
+    letter = (upper >= ord("A")) & (upper <= ord("Z"))
+    positions = np.flatnonzero(letter)
+    letters = upper[positions]
+    word_line = (np.cumsum(newline) - newline)[positions]
+    # chữ cái và xuống dòng thành khoảng trắng, phần còn lại chỉ là các số
+    text = np.where(letter | newline, SPACE, upper).astype(np.uint8).tobytes()
+    values = np.fromstring(text, sep=" ") if positions.size else np.zeros(0)
+    if values.size != positions.size:
+        raise ValueError("malformed G-code: every word needs a letter and a number")
+    return lines, letters, values, word_line
+
+
+def parse_chunk(data: bytes, state: ModalState) -> Optional[dict]:
+    """Moves of one block of lines, picking up the modal state from the block before."""
+    n, letters, values, word_line = tokenize(data)
+    first_line = state.lines
+    state.lines += n
+
+    def word(letter: str) -> Tuple[np.ndarray, np.ndarray]:
+        mask = letters == ord(letter)
+        return word_line[mask], values[mask]
+
+    def per_line(letter: str) -> np.ndarray:
+        out = np.full(n, np.nan)
+        lines, vals = word(letter)
+        out[lines] = vals
+        return out
+
+    def modal(lines: np.ndarray, vals: np.ndarray, table: dict) -> np.ndarray:
+        out = np.full(n, np.nan)
+        for code, value in table.items():
+            out[lines[vals == code]] = value
+        return out
+
+    g_lines, g_vals = word("G")
+    m_lines, m_vals = word("M")
+    motion = ffill(modal(g_lines, g_vals, {0: RAPID, 1: LINEAR, 2: ARC_CW, 3: ARC_CCW}), state.motion)
+    scale = ffill(modal(g_lines, g_vals, {20: 25.4, 21: 1.0}), state.scale)
+    absolute = ffill(modal(g_lines, g_vals, {90: 1.0, 91: 0.0}), state.absolute)
+    spindle = ffill(modal(m_lines, m_vals, {3: 3.0, 4: 4.0, 5: 0.0}), state.spindle)
+    power = ffill(per_line("S"), state.power)
+    feed = ffill(per_line("F") * scale, state.feed)
+    dwell = np.zeros(n, dtype=bool)
+    dwell[g_lines[g_vals == 4]] = True
+    stop = np.zeros(n, dtype=bool)
+    stop[m_lines[np.isin(m_vals, (0, 1, 2, 30))]] = True
+
+    # M3/M5 luôn làm GRBL chạy hết planner rồi mới đổi, kể cả ở chế độ laser
+    previous_spindle = np.concatenate(([state.spindle], spindle[:-1]))
+    events = (spindle != previous_spindle) | dwell | stop
+    if dwell.any():
+        state.dwell += float(np.nansum(per_line("P")[dwell]))
+
+    x, y = per_line("X") * scale, per_line("Y") * scale
+    move = (~np.isnan(x) | ~np.isnan(y)) & ~dwell
+    rows = np.flatnonzero(move)
+
+    event_count = np.cumsum(events)
+    if rows.size == 0:
+        state.sync = state.sync or bool(events.any())
+        state.motion, state.scale, state.absolute = motion[-1], scale[-1], absolute[-1]
+        state.spindle, state.power, state.feed = spindle[-1], power[-1], feed[-1]
+        return None
+    at_move = event_count[rows]
+    sync = np.diff(at_move, prepend=0) > 0
+    sync[0] = sync[0] or state.sync
+    state.sync = bool(event_count[-1] > at_move[-1])
+
+    def position(values: np.ndarray, start: float) -> np.ndarray:
+        # G90 đặt lại vị trí, G91 cộng dồn
+        values, absolute_move = values[rows], absolute[rows] > 0
+        given = ~np.isnan(values)
+        offset = np.cumsum(np.where(given & ~absolute_move, values, 0.0))
+        base = ffill(np.where(given & absolute_move, values - offset, np.nan), start)
+        return base + offset
+
+    x1 = position(x, state.x)
+    y1 = position(y, state.y)
+    x0 = np.concatenate(([state.x], x1[:-1]))
+    y0 = np.concatenate(([state.y], y1[:-1]))
+    kind = motion[rows].astype(np.int8)
+
+    i = np.nan_to_num(per_line("I")[rows] * scale[rows])
+    j = np.nan_to_num(per_line("J")[rows] * scale[rows])
+    r = per_line("R")[rows] * scale[rows]
+    cx, cy = x0 + i, y0 + j
+    radius_format = (kind >= ARC_CW) & ~np.isnan(r)
+    if radius_format.any():
+        rcx, rcy = radius_center(x0, y0, x1, y1, r, kind == ARC_CW)
+        cx, cy = np.where(radius_format, rcx, cx), np.where(radius_format, rcy, cy)
+    straight = kind < ARC_CW
+    cx[straight] = np.nan
+    cy[straight] = np.nan
+
+    state.x, state.y = float(x1[-1]), float(y1[-1])
+    state.motion, state.scale, state.absolute = motion[-1], scale[-1], absolute[-1]
+    state.spindle, state.power, state.feed = spindle[-1], power[-1], feed[-1]
+    return {
+        "x0": x0, "y0": y0, "x1": x1, "y1": y1, "cx": cx, "cy": cy,
+        "kind": kind,
+        "feed": feed[rows],
+        "laser": (spindle[rows] > 0) & (power[rows] > 0) & (kind != RAPID),
+        "sync": sync,
+        "line": rows + first_line + 1,
+    }
+
+
+def parse_gcode(source: Union[str, Iterable[str]]) -> MoveList:
+    """
+    Read G-code a block at a time and keep only the motion: G0-G3 with
+    X/Y/I/J/R, F, G20/G21, G90/G91, M3/M4/M5 with S, G4 P and program
+    stops. Z and anything else GRBL would accept is ignored.
+    """
+    state = ModalState()
+    chunks = []
+    for data in iter_chunks(source):
+        chunk = parse_chunk(data, state)
+        if chunk is not None:
+            chunks.append(chunk)
+    return MoveList(chunks, state)
+
+
+def radius_center(x0, y0, x1, y1, r, clockwise):
+    """Centre of R-format arcs, as GRBL works it out (negative R: the long way round)."""
+    dx, dy = x1 - x0, y1 - y0
+    chord2 = dx * dx + dy * dy
+    with np.errstate(divide="ignore", invalid="ignore"):
+        h = np.sqrt(np.maximum(0.0, 4.0 * r * r - chord2)) / np.sqrt(chord2)
+    h = np.where(clockwise, -h, h)
+    h = np.where(r < 0, -h, h)
+    return x0 + 0.5 * (dx - dy * h), y0 + 0.5 * (dy + dx * h)
+
+
+def axis_limit(limits: Tuple[float, float], ux: np.ndarray, uy: np.ndarray) -> np.ndarray:
+    """GRBL limit_value_by_axis_maximum: the largest value along u no axis exceeds."""
+    with np.errstate(divide="ignore"):
+        lx = np.where(ux != 0, limits[0] / np.abs(ux), np.inf)
+        ly = np.where(uy != 0, limits[1] / np.abs(uy), np.inf)
+    return np.minimum(lx, ly)
+
+
+def expand_blocks(moves: MoveList, settings: MachineSettings):
+    """
+    Planner blocks: one per straight move, arcs cut into chords the way
+    GRBL's mc_arc does. Returns the block end points and, per block, the
+    index of the move it comes from.
+    """
+    x0, y0, x1, y1 = moves.x0, moves.y0, moves.x1, moves.y1
+    cx, cy, kind = moves.cx, moves.cy, moves.kind
+
+    arc = kind >= ARC_CW
+    radius = np.hypot(x0 - cx, y0 - cy)
+    a0 = np.arctan2(y0 - cy, x0 - cx)
+    travel = np.arctan2(y1 - cy, x1 - cx) - a0
+    cw = kind == ARC_CW
+    # như mc_arc: CW luôn quay âm, CCW luôn quay dương, trùng điểm là trọn vòng
+    travel = np.where(cw & (travel >= -5e-7), travel - 2 * np.pi, travel)
+    travel = np.where(arc & ~cw & (travel <= 5e-7), travel + 2 * np.pi, travel)
+    tol = settings.arc_tolerance
+    with np.errstate(invalid="ignore"):
+        segments = np.floor(np.abs(0.5 * travel * radius) / np.sqrt(tol * (2 * radius - tol)))
+    segments = np.where(arc, np.nan_to_num(segments, nan=1.0), 1.0)
+    segments = np.maximum(segments, 1).astype(np.int64)
+
+    move_of_block = np.repeat(np.arange(len(kind)), segments)
+    first = np.cumsum(segments) - segments
+    k = np.arange(len(move_of_block)) - first[move_of_block] + 1
+    last = k == segments[move_of_block]
+
+    angle = a0[move_of_block] + travel[move_of_block] * (k / segments[move_of_block])
+    r = radius[move_of_block]
+    ex = np.where(last, x1[move_of_block], cx[move_of_block] + r * np.cos(angle))
+    ey = np.where(last, y1[move_of_block], cy[move_of_block] + r * np.sin(angle))
+    sx = np.where(k == 1, x0[move_of_block], np.roll(ex, 1))
+    sy = np.where(k == 1, y0[move_of_block], np.roll(ey, 1))
+    return sx, sy, ex, ey, move_of_block, k == 1
+
+
+def plan_speeds(length, ux, uy, nominal2, accel, sync, settings: MachineSettings):
+    """
+    Squared entry speeds of every block, as GRBL's planner would settle
+    them: junction deviation limits, a stop at each sync and at the end,
+    and no block entered faster than it can stop within the look-ahead
+    window. Both planner passes are min-plus scans done with cumsum and
+    minimum.accumulate instead of a loop.
+    """
+    n = len(length)
+    d = 2.0 * accel * length                    # v^2 có thể thay đổi trong block
+    # góc giữa hai block liên tiếp
+    px, py = np.roll(ux, 1), np.roll(uy, 1)
+    cos_theta = -(px * ux + py * uy)
+    jx, jy = ux - px, uy - py
+    jnorm = np.hypot(jx, jy)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        junction_accel = axis_limit(settings.acceleration, jx / jnorm, jy / jnorm)
+        sin_theta_d2 = np.sqrt(np.clip(0.5 * (1.0 - cos_theta), 0.0, 1.0))
+        junction2 = junction_accel * settings.junction_deviation * sin_theta_d2 / (1.0 - sin_theta_d2)
+    junction2 = np.where(cos_theta > 0.999999, 0.0, junction2)
+    junction2 = np.where(cos_theta < -0.999999, np.inf, junction2)
+    entry_max = np.minimum(junction2, np.minimum(nominal2, np.roll(nominal2, 1)))
+    entry_max[sync] = 0.0
+    if n:
+        entry_max[0] = 0.0
+
+    # D[i] = tổng d của các block trước i; thêm một "block" cuối với tốc độ 0
+    D = np.concatenate(([0.0], np.cumsum(d)))
+    cap = np.concatenate((entry_max, [0.0]))
+
+    # planner chỉ thấy planner_blocks block: phải dừng kịp ở cuối cửa sổ
+    window = min(settings.planner_blocks, n)
+    if window:
+        ahead = D[np.minimum(np.arange(n + 1) + window, n)] - D
+        cap[:-1] = np.minimum(cap[:-1], ahead[:-1])
+
+    # ngược: w[i] = min_{j>=i} (cap[j] + D[j]) - D[i]
+    backward = np.minimum.accumulate((cap + D)[::-1])[::-1] - D
+    # xuôi: w[i] = D[i] + min_{j<=i} (backward[j] - D[j])
+    forward = D + np.minimum.accumulate(backward - D)
+    return np.maximum(forward[:-1], 0.0)
+
+
+def trapezoid_time(length, entry2, exit2, nominal2, accel):
+    """Time of each block accelerating from entry to nominal, cruising and slowing to exit."""
+    v0, v1, vn = np.sqrt(entry2), np.sqrt(exit2), np.sqrt(nominal2)
+    accel_dist = (nominal2 - entry2) / (2.0 * accel)
+    decel_dist = (nominal2 - exit2) / (2.0 * accel)
+    cruise = length - accel_dist - decel_dist
+    with np.errstate(divide="ignore", invalid="ignore"):
+        trapezoid = (vn - v0) / accel + (vn - v1) / accel + np.where(cruise > 0, cruise, 0.0) / vn
+        peak = np.sqrt(np.maximum((2.0 * accel * length + entry2 + exit2) / 2.0, 0.0))
+        triangle = (peak - v0) / accel + (peak - v1) / accel
+    return np.where(cruise >= 0, trapezoid, triangle)
+
+
+def simulate_gcode(source: Union[str, Iterable[str]], settings: Optional[MachineSettings] = None,
+                   per_move: bool = False) -> dict:
+    """
+    Estimate how long GRBL takes to run source (a file path or lines).
+
+    Returns total, rapid, cutting and laser-on time (s) and distance (mm),
+    and with per_move the source line and time of every motion command
+    as NumPy arrays.
+    """
+    settings = settings or MachineSettings()
+    t = time.perf_counter()
+    moves = parse_gcode(source)
+    parse_seconds = time.perf_counter() - t
+
+    sx, sy, ex, ey, move_of_block, first = expand_blocks(moves, settings)
+    dx, dy = ex - sx, ey - sy
+    length = np.hypot(dx, dy)
+    # GRBL bỏ qua block có độ dài 0
+    keep = length > 1e-9
+    sync = first & moves.sync[move_of_block]
+    # dừng của block bị bỏ chuyển sang block kế tiếp
+    stops = np.cumsum(sync)[keep]
+    sync = np.diff(stops, prepend=0) > 0
+    length, dx, dy, move_of_block = length[keep], dx[keep], dy[keep], move_of_block[keep]
+    ux, uy = dx / length, dy / length
+
+    kind = moves.kind[move_of_block]
+    feed = moves.feed[move_of_block]
+    laser = moves.laser[move_of_block]
+    rapid = kind == RAPID
+    max_speed = axis_limit(settings.max_rate, ux, uy) / 60.0
+    nominal = np.where(rapid, max_speed, np.minimum(feed / 60.0, max_speed))
+    if (nominal[~rapid] <= 0).any():
+        raise ValueError("feed move without a feed rate (F)")
+    nominal2 = nominal * nominal
+    accel = axis_limit(settings.acceleration, ux, uy)
+
+    entry2 = plan_speeds(length, ux, uy, nominal2, accel, sync, settings)
+    exit2 = np.append(entry2[1:], 0.0)
+    block_time = trapezoid_time(length, entry2, exit2, nominal2, accel)
+
+    report = {
+        "lines": moves.lines,
+        "moves": len(moves),
+        "blocks": len(length),
+        "total_time": float(block_time.sum()) + moves.dwell,
+        "rapid_time": float(block_time[rapid].sum()),
+        "cut_time": float(block_time[~rapid].sum()),
+        "laser_on_time": float(block_time[laser].sum()),
+        "dwell_time": moves.dwell,
+        "rapid_distance": float(length[rapid].sum()),
+        "cut_distance": float(length[~rapid].sum()),
+        "laser_distance": float(length[laser].sum()),
+        "stops": int(sync.sum()),
+        "parse_seconds": parse_seconds,
+        "seconds": time.perf_counter() - t,
+    }
+    if per_move:
+        report["move_line"] = moves.line
+        # bincount trả về int khi không có block nào
+        report["move_time"] = np.bincount(move_of_block, weights=block_time,
+                                          minlength=len(moves)).astype(float, copy=False)
+    return report
+
+
+def format_report(report: dict) -> str:
+    def hms(seconds):
+        seconds = int(round(seconds))
+        return f"{seconds // 3600}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+    return (f"Job time {hms(report['total_time'])} (laser on {hms(report['laser_on_time'])}, "
+            f"rapids {hms(report['rapid_time'])})\n"
+            f"Cutting {report['cut_distance'] / 1000:.2f} m, rapids {report['rapid_distance'] / 1000:.2f} m, "
+            f"{report['stops']} full stops\n"
+            f"{report['lines']} lines, {report['blocks']} planner blocks, simulated in {report['seconds']:.2f} s")
+
+
+if __name__ == "__main__":
+    # Ước lượng thời gian các file G-code, hoặc đo tốc độ mô phỏng trên file sinh ngẫu nhiên
+    import os
+    import random
+    import sys
+    import tempfile
+
+    paths = sys.argv[1:]
+    if not paths:
+        path = os.path.join(tempfile.gettempdir(), "gcode_sim_bench.gcode")
+        random.seed(1)
+        with open(path, "w") as f:
+            f.write("G21\nG90\n")
+            n = 0
+            while n < 1000000:
+                x, y = random.uniform(0, 600), random.uniform(0, 400)
+                f.write(f"G0 X{x:.3f} Y{y:.3f}\nM3 S1000\n")
+                for i in range(20):
+                    x += random.uniform(-5, 5)
+                    y += random.uniform(-5, 5)
+                    f.write(f"G1 X{x:.3f} Y{y:.3f} F280\n")
+                f.write(f"G2 X{x + 3:.3f} Y{y:.3f} I1.500 J0.000\nM5\n")
+                n += 25
+        paths = [path]
+    for path in paths:
+        report = simulate_gcode(path)
+        print(path)
+        print(format_report(report))
+        print(f"parse {report['parse_seconds']:.2f} s, plan {report['seconds'] - report['parse_seconds']:.2f} s")
@@ -0,0 +1,321 @@
+import hashlib
+import io
+import json
+import os
+import time
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from cut_plan_builder import Part, CutPlan, build_cut_plan, format_slots
+from cut_portfolio import solve_portfolio, format_report as format_solver_report, PORTFOLIO_TIME_LIMIT
+from cut_stock import StockType, solve_stock, format_report as format_stock_report
+from extended_cut_export import order_plan, gcode_document
+from toolpath_order import estimate_time, format_report as format_order_report, RAPID_RATE
+
+# thư mục cache, tương đối như cut_plan.gcode
+CACHE_DIR = "plan_cache"
+# giới hạn dung lượng và số file; vượt thì xoá file dùng lâu nhất trước
+CACHE_MAX_BYTES = 64 * 1024 * 1024
+CACHE_MAX_ENTRIES = 256
+# đổi khi cách xếp thanh / dựng plan / sắp thứ tự thay đổi để bỏ cache cũ
+CACHE_VERSION = 2
+
+
+def canonical_parts(parts: List[Part]) -> List[Part]:
+    """
+    Các chi tiết theo thứ tự chuẩn (và lỗ theo thứ tự tăng dần), để cùng
+    một đơn hàng nhập theo thứ tự khác vẫn cho cùng khoá và cùng plan.
+    """
+    rows = sorted((float(p.length), bool(p.is_cut_down), bool(p.is_cut_up),
+                   tuple(sorted(float(h) for h in p.hole_centers))) for p in parts)
+    return [Part(length, down, up, list(holes)) for length, down, up, holes in rows]
+
+
+def digest(payload) -> str:
+    text = json.dumps(payload, separators=(",", ":"))
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def geometry_key(parts: List[Part], stock_lengths: List[float], width: float, gap: float,
+                 hole_radius: float, optimize_travel: bool) -> str:
+    """
+    Khoá của phần hình học: bins, CutPlan và thứ tự cắt. Không gồm
+    feedrate/power (chỉ đổi chữ G-code) và thời gian giải (plan đầu tiên
+    tìm được được dùng lại).
+    """
+    return digest({
+        "version": CACHE_VERSION,
+        "parts": [[p.length, p.is_cut_down, p.is_cut_up, p.hole_centers] for p in canonical_parts(parts)],
+        "stock_lengths": sorted(float(x) for x in stock_lengths),
+        "width": float(width),
+        "gap": float(gap),
+        "hole_radius": float(hole_radius),
+        "optimize_travel": bool(optimize_travel),
+    })
+
+
+def gcode_key(geometry: str, feedrate, power) -> str:
+    # giữ nguyên kiểu số: 280 và 280.0 cho ra chữ "F280" khác "F280.0"
+    return digest({"geometry": geometry, "feedrate": feedrate, "power": power})
+
+
+class PlanCache:
+    """
+    Cache trên đĩa theo nội dung: mỗi khoá hình học một file .npz (bins,
+    mảng CutPlan, thứ tự cắt và báo cáo), mỗi khoá G-code một file .gcode.
+    Đọc trúng thì chạm mtime; khi ghi mà vượt max_bytes/max_entries thì
+    xoá file có mtime cũ nhất trước (LRU).
+    """
+
+    def __init__(self, folder: str = CACHE_DIR, max_bytes: int = CACHE_MAX_BYTES,
+                 max_entries: int = CACHE_MAX_ENTRIES):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+
+    def path(self, key: str, suffix: str) -> str:
+        return os.path.join(self.folder, key + suffix)
+
+    def touch(self, path: str):
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    def write(self, path: str, data: bytes):
+        # ghi file tạm rồi đổi tên để không bao giờ đọc phải file ghi dở
+        os.makedirs(self.folder, exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+        self.evict()
+
+    def discard(self, path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def load_geometry(self, key: str) -> Optional[dict]:
+        """{"bins", "plan", "order", "flips", "meta"} hoặc None nếu chưa có."""
+        path = self.path(key, ".npz")
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                sizes = data["bin_sizes"]
+                pieces = data["pieces"].tolist()
+                bounds = np.concatenate(([0], np.cumsum(sizes))).tolist()
+                entry = {
+                    "bins": [pieces[i:j] for i, j in zip(bounds, bounds[1:])],
+                    "plan": CutPlan(float(data["stick_width"]), data["cuts"], data["holes"],
+                                    float(data["radius"]), data["arches"], data["stick_lengths"]),
+                    "order": data["order"].tolist(),
+                    "flips": data["flips"].tolist(),
+                    "meta": json.loads(str(data["meta"])),
+                }
+        except FileNotFoundError:
+            return None
+        except Exception:
+            # file hỏng hoặc định dạng cũ: coi như chưa có
+            self.discard(path)
+            return None
+        self.touch(path)
+        return entry
+
+    def store_geometry(self, key: str, bins: List[List[float]], plan: CutPlan,
+                       order: List[int], flips: List[bool], meta: dict):
+        buffer = io.BytesIO()
+        np.savez(
+            buffer,
+            pieces=np.array([x for b in bins for x in b], dtype=float),
+            bin_sizes=np.array([len(b) for b in bins], dtype=np.int64),
+            stick_width=plan.stick_width,
+            cuts=plan.cuts,
+            holes=plan.holes,
+            radius=plan.radius,
+            arches=plan.arches,
+            stick_lengths=plan.stick_lengths,
+            order=np.array(order, dtype=np.int64),
+            flips=np.array(flips, dtype=bool),
+            meta=np.array(json.dumps(meta)),
+        )
+        self.write(self.path(key, ".npz"), buffer.getvalue())
+
+    def load_gcode(self, key: str) -> Optional[str]:
+        path = self.path(key, ".gcode")
+        try:
+            with open(path, encoding="utf-8") as f:
+                text = f.read()
+        except OSError:
+            return None
+        self.touch(path)
+        return text
+
+    def store_gcode(self, key: str, text: str):
+        self.write(self.path(key, ".gcode"), text.encode("utf-8"))
+
+    def entries(self) -> List[Tuple[float, int, str]]:
+        """[(mtime, size, path), ...] của các file cache, cũ nhất trước."""
+        if not os.path.isdir(self.folder):
+            return []
+        found = []
+        with os.scandir(self.folder) as it:
+            for entry in it:
+                if entry.name.endswith((".npz", ".gcode")):
+                    try:
+                        st = entry.stat()
+                    except OSError:
+                        continue
+                    found.append((st.st_mtime, st.st_size, entry.path))
+        found.sort()
+        return found
+
+    def evict(self):
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        count = len(entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes and count <= self.max_entries:
+                break
+            self.discard(path)
+            total -= size
+            count -= 1
+
+    def clear(self):
+        for _, _, path in self.entries():
+            self.discard(path)
+
+
+def pack_parts(lengths: List[float], stock_lengths: List[float],
+               time_limit: float = PORTFOLIO_TIME_LIMIT) -> Tuple[List[List[float]], List[float], str]:
+    """
+    Xếp chi tiết lên thanh: nhiều chiều dài thanh thì chọn loại thanh bằng
+    cut_stock, một chiều dài thì chạy portfolio. Trả về (bins, chiều dài
+    thanh của từng bin, báo cáo); bins cùng loại thanh nằm liền nhau.
+    """
+    if len(stock_lengths) > 1:
+        stocks = [StockType(f"{x:g} mm", x) for x in stock_lengths]
+        stock_bins, stock_report = solve_stock(lengths, stocks, time_limit=time_limit)
+        return ([pieces for _, pieces in stock_bins], [stock.length for stock, _ in stock_bins],
+                format_stock_report(stock_report))
+    bins, solver_report = solve_portfolio(stock_lengths[0], lengths, time_limit=time_limit)
+    return bins, [stock_lengths[0]] * len(bins), format_solver_report(solver_report)
+
+
+def generate_plan_gcode(
+    parts: List[Part],
+    stock_lengths: List[float],
+    width: float,
+    gap: float,
+    hole_radius: float,
+    filename: str,
+    feedrate=280,
+    power=1000,
+    optimize_travel: bool = True,
+    time_limit: float = PORTFOLIO_TIME_LIMIT,
+    cache: Optional[PlanCache] = None,
+) -> dict:
+    """
+    Xếp thanh, dựng CutPlan, sắp thứ tự cắt và ghi G-code ra filename, dùng
+    lại kết quả trong cache nếu có:
+    - "gcode": cùng đơn hàng và cùng feedrate/power, chép lại chữ G-code
+    - "geometry": chỉ đổi feedrate/power, dùng lại bins/plan/thứ tự, chỉ
+      sinh lại chữ G-code
+    - "miss": chạy lại toàn bộ rồi ghi vào cache
+    cache=None thì không dùng cache ("off").
+    """
+    started = time.perf_counter()
+    parts = canonical_parts(parts)
+    key = geometry_key(parts, stock_lengths, width, gap, hole_radius, optimize_travel)
+    text_key = gcode_key(key, feedrate, power)
+
+    entry = cache.load_geometry(key) if cache is not None else None
+    if entry is None:
+        bins, bin_lengths, solver_text = pack_parts([p.length for p in parts], stock_lengths, time_limit)
+        plan = build_cut_plan(
+            stock_length=max(stock_lengths),
+            parts=parts,
+            width=width,
+            gap=gap,
+            hole_radius=hole_radius,
+            bins=bins,
+            bin_lengths=bin_lengths
+        )
+        order, flips, order_report = order_plan(plan, optimize_travel, feedrate=feedrate)
+        meta = {"solver": solver_text, "order": order_report}
+        if cache is not None:
+            cache.store_geometry(key, bins, plan, order, flips, meta)
+        status = "off" if cache is None else "miss"
+        text = None
+    else:
+        bins, plan, order, flips, meta = (entry["bins"], entry["plan"], entry["order"],
+                                          entry["flips"], entry["meta"])
+        text = cache.load_gcode(text_key)
+        status = "geometry" if text is None else "gcode"
+
+    if text is None:
+        text = gcode_document(plan, order, flips, feedrate, power)
+        if cache is not None:
+            cache.store_gcode(text_key, text)
+    with open(filename, "w", encoding="utf-8") as f:
+        f.write(text)
+
+    # thời gian ước lượng tính lại theo feedrate hiện tại
+    order_report = dict(meta["order"])
+    for name in ("before", "after"):
+        order_report[f"time_{name}"] = estimate_time(order_report[f"travel_{name}"],
+                                                     order_report["cut_length"], feedrate, RAPID_RATE)
+    return {
+        "cache": status,
+        "key": key,
+        "sticks": len(bins),
+        "stock": format_slots(plan.stick_lengths),
+        "solver": meta["solver"],
+        "order": order_report,
+        "seconds": time.perf_counter() - started,
+    }
+
+
+def format_report(report: dict) -> str:
+    labels = {
+        "gcode": "hit, G-code reused",
+        "geometry": "hit, geometry reused, G-code regenerated",
+        "miss": "miss, plan stored",
+        "off": "off",
+    }
+    return (report["solver"] + "\n" + f"Stock: {report['stock']}" + "\n\n"
+            + format_order_report(report["order"]) + "\n\n"
+            f"Plan cache: {labels[report['cache']]} ({report['key'][:12]}, {report['seconds']:.2f} s)")
+
+
+if __name__ == "__main__":
+    # Benchmark: lần đầu (miss), đổi feedrate (geometry), lặp lại (gcode)
+    import random
+    import sys
+    import tempfile
+
+    sizes = [int(x) for x in sys.argv[1:]] or [100, 1000, 10000]
+    with tempfile.TemporaryDirectory() as folder:
+        cache = PlanCache(os.path.join(folder, "cache"))
+        out = os.path.join(folder, "cut_plan.gcode")
+        for n in sizes:
+            random.seed(n)
+            parts = [Part(float(random.randint(10, 90)), random.random() < 0.3, random.random() < 0.3,
+                          [5.0] if random.random() < 0.5 else []) for _ in range(n)]
+            runs = [(280, 1000), (350, 1000), (350, 1000)]
+            texts = []
+            for feedrate, power in runs:
+                report = generate_plan_gcode(parts, [1000.0], 10.0, 5.0, 1.5, out, feedrate, power,
+                                             time_limit=1.0, cache=cache)
+                with open(out, encoding="utf-8") as f:
+                    texts.append(f.read())
+                print(f"n={n} F{feedrate}: {report['cache']:8s} {report['seconds']:.3f} s, "
+                      f"{report['sticks']} sticks")
+            # đầu vào xáo trộn vẫn trúng cache; geometry dùng lại phải cho cùng chữ như sinh mới
+            random.shuffle(parts)
+            assert generate_plan_gcode(parts, [1000.0], 10.0, 5.0, 1.5, out, 350, 1000,
+                                       cache=cache)["cache"] == "gcode"
+            assert texts[1] == texts[2] and texts[0] != texts[1]
+            print()
+        print(f"{len(cache.entries())} files, {sum(s for _, s, _ in cache.entries()) / 1024:.0f} KiB")
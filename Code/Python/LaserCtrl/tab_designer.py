@@ -2,6 +2,9 @@ import tkinter as tk
 from tkinter import ttk, messagebox
 import math
 
+from gcode_path import design_gcode, format_report
+from toolpath_order import format_report as format_order_report
+
 
 class DesignerTab(ttk.Frame):
 
@@ -149,6 +152,25 @@ L 10 10 100 100
             width=10
         ).grid(row=1, column=1)
 
+        tk.Label(gcode_frame, text="Tolerance").grid(row=2, column=0)
+
+        # sai lệch cho phép (mm) khi rút gọn polyline, 0 = chỉ gộp đoạn thẳng hàng
+        self.tolerance_var = tk.StringVar(value="0.02")
+
+        tk.Entry(
+            gcode_frame,
+            textvariable=self.tolerance_var,
+            width=10
+        ).grid(row=2, column=1)
+
+        self.optimize_var = tk.BooleanVar(value=True)
+
+        tk.Checkbutton(
+            gcode_frame,
+            text="Optimize travel",
+            variable=self.optimize_var
+        ).grid(row=3, column=0, columnspan=2, sticky="w")
+
         # =====================================================
         # BUTTONS
         # =====================================================
@@ -210,6 +232,12 @@ Vertical line
 L x1 y1 x2 y2
 Any line
 
+A cx cy r a1 a2
+Arc, counter-clockwise from a1 to a2 (degrees)
+
+P x1 y1 x2 y2 ...
+Polyline
+
 Examples:
 
 C 50 50 30
@@ -218,6 +246,8 @@ RC 100 100 80 40
 LV 10 20 50
 LH 30 40 80
 L 0 0 100 100
+A 50 50 20 0 90
+P 0 0 10 5 20 0 30 5
 """
 
         messagebox.showinfo(
@@ -450,104 +480,70 @@ L 0 0 100 100
                 width=2
             )
 
-    # =========================================================
-    # GCODE
-    # =========================================================
-
-    def generate_gcode(self):
-
-        self.preview()
-
-        speed = float(self.speed_var.get())
-        power = float(self.power_var.get())
-
-        lines = []
-
-        lines.append("G21")
-        lines.append("G90")
-
-        for cmd, nums in self.shapes:
-
-            if cmd == "L":
-
-                x1, y1, x2, y2 = nums
-
-                lines.append(f"G0 X{x1:.3f} Y{y1:.3f}")
-                lines.append(f"M3 S{power}")
-                lines.append(f"G1 X{x2:.3f} Y{y2:.3f} F{speed}")
-                lines.append("M5")
+        elif cmd == "A":
 
-            elif cmd == "LV":
+            cx, cy, r, a1, a2 = nums
 
-                x, y, length = nums
-
-                lines.append(f"G0 X{x:.3f} Y{y:.3f}")
-                lines.append(f"M3 S{power}")
-                lines.append(f"G1 X{x+length:.3f} Y{y:.3f} F{speed}")
-                lines.append("M5")
-
-            elif cmd == "LH":
-
-                x, y, length = nums
-
-                lines.append(f"G0 X{x:.3f} Y{y:.3f}")
-                lines.append(f"M3 S{power}")
-                lines.append(f"G1 X{x:.3f} Y{y+length:.3f} F{speed}")
-                lines.append("M5")
-
-            elif cmd in ["R", "RC"]:
-
-                if cmd == "R":
-
-                    x, y, w, h = nums
-
-                else:
+            x1, y1 = self.to_canvas(cx - r, cy - r)
+            x2, y2 = self.to_canvas(cx + r, cy + r)
 
-                    cx, cy, w, h = nums
+            extent = (a2 - a1) % 360 or 359.999
 
-                    x = cx - w/2
-                    y = cy - h/2
+            self.canvas.create_arc(
+                x1, y2, x2, y1,
+                start=a1,
+                extent=extent,
+                style="arc",
+                outline="black",
+                width=2
+            )
 
-                lines.append(f"G0 X{x:.3f} Y{y:.3f}")
-                lines.append(f"M3 S{power}")
+        elif cmd == "P":
 
-                lines.append(f"G1 X{x+w:.3f} Y{y:.3f} F{speed}")
-                lines.append(f"G1 X{x+w:.3f} Y{y+h:.3f}")
-                lines.append(f"G1 X{x:.3f} Y{y+h:.3f}")
-                lines.append(f"G1 X{x:.3f} Y{y:.3f}")
+            points = []
 
-                lines.append("M5")
+            for i in range(0, len(nums) - 1, 2):
 
-            elif cmd == "C":
+                points.extend(self.to_canvas(nums[i], nums[i + 1]))
 
-                cx, cy, r = nums
+            if len(points) >= 4:
 
-                segments = 60
+                self.canvas.create_line(
+                    *points,
+                    width=2
+                )
 
-                sx = cx + r
-                sy = cy
+    # =========================================================
+    # GCODE
+    # =========================================================
 
-                lines.append(f"G0 X{sx:.3f} Y{sy:.3f}")
-                lines.append(f"M3 S{power}")
+    def generate_gcode(self):
 
-                for i in range(1, segments + 1):
+        self.preview()
 
-                    angle = math.radians(i * 360 / segments)
+        speed = float(self.speed_var.get())
+        power = float(self.power_var.get())
+        tolerance = float(self.tolerance_var.get())
+
+        lines, report = design_gcode(
+            self.shapes,
+            speed,
+            power,
+            optimize=self.optimize_var.get(),
+            tolerance=tolerance
+        )
 
-                    x = cx + r * math.cos(angle)
-                    y = cy + r * math.sin(angle)
+        with open("cut_plan.gcode", "w") as f:
 
-                    lines.append(
-                        f"G1 X{x:.3f} Y{y:.3f} F{speed}"
-                    )
+            f.write("\n".join(lines))
 
-                lines.append("M5")
+        message = "Generated cut_plan.gcode\n\n" + format_report(report)
 
-        with open("cut_plan.gcode", "w") as f:
+        if report["order"] is not None:
 
-            f.write("\n".join(lines))
+            message += "\n\n" + format_order_report(report["order"])
 
         messagebox.showinfo(
             "Done",
-            "Generated cut_plan.gcode"
-        )
\ No newline at end of file
+            message
+        )
@@ -3,14 +3,22 @@ from tkinter import ttk, messagebox
 import serial
 import serial.tools.list_ports
 import subprocess
+import threading
 import os
 
+from gcode_sender import GcodeSender, SimulatedGrbl
+from gcode_sim import simulate_gcode, format_report
+
+SIMULATED_PORT = "SIMULATOR"
+
 
 class MachineTab(tk.Frame):
     def __init__(self, parent, app):
         super().__init__(parent)
         self.app = app
         self.font = app.font
+        self.sender = None
+        self.estimate = None
         self.build_ui()
         self.lasergrbl_process = None
 
@@ -39,6 +47,13 @@ class MachineTab(tk.Frame):
                   command=self.run_gcode).grid(row=row, column=1, pady=10)
         row += 1
 
+        self.btn_pause = tk.Button(self, text="Pause", font=self.font,
+                                   command=self.toggle_pause)
+        self.btn_pause.grid(row=row, column=0)
+        tk.Button(self, text="Abort", font=self.font,
+                  command=self.abort_gcode).grid(row=row, column=1)
+        row += 1
+
         self.progress = tk.Label(self, text="Progress: 0%", font=self.font)
         self.progress.grid(row=row, column=1)
 
@@ -50,11 +65,21 @@ class MachineTab(tk.Frame):
             command=self.preview_gcode
         ).grid(row=row, column=1, pady=5)
 
+        row += 1
+        self.btn_estimate = tk.Button(
+            self,
+            text="Estimate Time",
+            font=self.font,
+            command=self.estimate_gcode
+        )
+        self.btn_estimate.grid(row=row, column=1, pady=5)
+
 
     # ---------------- SERIAL ----------------
 
     def refresh_com(self):
         ports = [p.device for p in serial.tools.list_ports.comports()]
+        ports.append(SIMULATED_PORT)
         self.combo_com["values"] = ports
         if ports:
             self.combo_com.current(0)
@@ -62,7 +87,10 @@ class MachineTab(tk.Frame):
     def connect_serial(self):
         port = self.combo_com.get()
         try:
-            self.app.ser = serial.Serial(port, 115200, timeout=1)
+            if port == SIMULATED_PORT:
+                self.app.ser = SimulatedGrbl()
+            else:
+                self.app.ser = serial.Serial(port, 115200, timeout=1)
             messagebox.showinfo("Connected", f"Connected to {port}")
         except Exception as e:
             messagebox.showerror("Error", str(e))
@@ -79,26 +107,93 @@ class MachineTab(tk.Frame):
         if not self.app.ser:
             messagebox.showerror("Error", "Not connected.")
             return
+        if self.sender and self.sender.is_alive():
+            messagebox.showerror("Error", "GCODE is already running.")
+            return
 
         try:
-            with open("cut_plan.gcode", "r") as f:
-                lines = f.readlines()
-
-            total = len(lines)
-            for i, line in enumerate(lines):
-                self.app.ser.write(line.encode())
-                self.app.ser.flush()
-                while not self.app.ser.readline():
-                    pass
+            self.sender = GcodeSender(self.app.ser, "cut_plan.gcode")
+        except Exception as e:
+            messagebox.showerror("Error", str(e))
+            return
+        self.btn_pause.config(text="Pause")
+        self.sender.start()
+        self.poll_sender()
 
-                percent = int((i + 1) / total * 100)
-                self.progress.config(text=f"Progress: {percent}%")
-                self.update_idletasks()
+    def toggle_pause(self):
+        if not self.sender or not self.sender.is_alive():
+            return
+        if self.sender.is_paused():
+            self.sender.resume()
+            self.btn_pause.config(text="Pause")
+        else:
+            self.sender.pause()
+            self.btn_pause.config(text="Resume")
+
+    def abort_gcode(self):
+        if self.sender and self.sender.is_alive():
+            self.sender.abort()
+
+    def poll_sender(self):
+        # chạy trên Tk thread, sender chỉ cập nhật số liệu
+        stats = self.sender.get_stats()
+        text = f"Progress: {int((stats['progress'] or 0) * 100)}%"
+        text += f"  {stats['lines_per_second']:.0f} lines/s"
+        if stats["eta"] is not None:
+            text += f"  ETA {int(stats['eta'] // 60)}:{int(stats['eta'] % 60):02d}"
+        if stats["paused"]:
+            text += "  (paused)"
+        self.progress.config(text=text)
+
+        if not stats["done"]:
+            self.after(200, self.poll_sender)
+            return
 
+        self.btn_pause.config(text="Pause")
+        if self.sender.exception:
+            messagebox.showerror("Error", str(self.sender.exception))
+        elif stats["alarm"]:
+            messagebox.showerror("Error", f"GRBL {stats['alarm']}")
+        elif self.sender.abort_event.is_set():
+            messagebox.showinfo("Aborted", "GCODE execution aborted.")
+        elif stats["errors"]:
+            messagebox.showwarning("Done", "GCODE finished with errors:\n" + "\n".join(stats["errors"][:10]))
+        else:
             messagebox.showinfo("Done", "GCODE execution completed.")
-        except Exception as e:
-            messagebox.showerror("Error", str(e))
-    
+
+    # ---------------- ESTIMATE ----------------
+
+    def estimate_gcode(self):
+        # mô phỏng chạy trên thread riêng, file lớn mất vài giây
+        if self.estimate and self.estimate["thread"].is_alive():
+            return
+        if not os.path.exists("cut_plan.gcode"):
+            messagebox.showerror("Error", "GCODE file not found.")
+            return
+        estimate = {"report": None, "error": None}
+
+        def work():
+            try:
+                estimate["report"] = simulate_gcode("cut_plan.gcode")
+            except Exception as e:
+                estimate["error"] = e
+
+        estimate["thread"] = threading.Thread(target=work, daemon=True)
+        self.estimate = estimate
+        self.btn_estimate.config(state="disabled")
+        estimate["thread"].start()
+        self.poll_estimate()
+
+    def poll_estimate(self):
+        if self.estimate["thread"].is_alive():
+            self.after(100, self.poll_estimate)
+            return
+        self.btn_estimate.config(state="normal")
+        if self.estimate["error"] is not None:
+            messagebox.showerror("Error", str(self.estimate["error"]))
+        else:
+            messagebox.showinfo("Estimated job time", format_report(self.estimate["report"]))
+
     def preview_gcode(self):
         lasergrbl_path = r"C:\Program Files (x86)\LaserGRBL\LaserGRBL.exe"
         gcode_path = r"C:\Users\LaptopKhanhTran\Desktop\Workspace\LearnOrDie\Code\Python\LaserCtrl\cut_plan.gcode"
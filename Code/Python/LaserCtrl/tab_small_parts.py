@@ -1,9 +1,11 @@
+import threading
 import tkinter as tk
 from tkinter import messagebox
 from typing import List
 
 from cut_plan_builder import *
-from extended_cut_export import *
+from cut_portfolio import PORTFOLIO_TIME_LIMIT
+from plan_cache import PlanCache, generate_plan_gcode, format_report
 
 
 class SmallPartsTab(tk.Frame):
@@ -11,6 +13,8 @@ class SmallPartsTab(tk.Frame):
         super().__init__(parent)
         self.app = app
         self.font = app.font
+        self.job = None
+        self.plan_cache = PlanCache()
         self.build_ui()
 
     def build_ui(self):
@@ -21,7 +25,8 @@ class SmallPartsTab(tk.Frame):
             tk.Label(self, text=label, font=self.font).grid(row=row, column=0, sticky="e")
             row += 1
 
-        add("Stock Length (mm):")
+        # nhiều chiều dài cách nhau dấu phẩy => chọn loại thanh bằng cut_stock
+        add("Stock Length(s) (mm):")
         self.entry_stock_length = tk.Entry(self, width=40, font=self.font)
         self.entry_stock_length.insert(0, "100")
         self.entry_stock_length.grid(row=row-1, column=1)
@@ -51,40 +56,90 @@ class SmallPartsTab(tk.Frame):
         self.entry_power.insert(0, "1000")
         self.entry_power.grid(row=row-1, column=1)
 
+        add("Solver Time (s):")
+        self.entry_time_limit = tk.Entry(self, width=40, font=self.font)
+        self.entry_time_limit.insert(0, str(PORTFOLIO_TIME_LIMIT))
+        self.entry_time_limit.grid(row=row-1, column=1)
+
+        add("Optimize travel:")
+        self.optimize_var = tk.BooleanVar(value=True)
+        tk.Checkbutton(self, variable=self.optimize_var).grid(row=row-1, column=1, sticky="w")
+
+        # dùng lại plan đã giải cho cùng đơn hàng; tắt để giải lại từ đầu
+        add("Use plan cache:")
+        self.cache_var = tk.BooleanVar(value=True)
+        tk.Checkbutton(self, variable=self.cache_var).grid(row=row-1, column=1, sticky="w")
+
         add("Parts:")
         self.text_parts = tk.Text(self, width=40, height=8, font=self.font)
         self.text_parts.grid(row=row-1, column=1)
 
-        tk.Button(
+        self.btn_generate = tk.Button(
             self, text="Generate GCODE", font=self.font,
             command=self.on_generate
-        ).grid(row=row, column=1, pady=10)
+        )
+        self.btn_generate.grid(row=row, column=1, pady=10)
 
     def on_generate(self):
+        # xếp thanh chạy nhiều tiến trình tới vài giây: làm trên thread riêng
+        if self.job and self.job["thread"].is_alive():
+            return
         try:
             parts = self.convert_text_to_parts(
                 self.text_parts.get("1.0", tk.END)
             )
-
-            cut_plan = build_cut_plan(
-                stock_length=float(self.entry_stock_length.get()),
-                parts=parts,
-                width=float(self.entry_width.get()),
-                gap=float(self.entry_gap.get()),
-                hole_radius=float(self.entry_hole_radius.get())
-            )
-
-            export_gcode_extended(
-                cut_plan,
-                "cut_plan.gcode",
-                feedrate=float(self.entry_feedrate.get()),
-                power=float(self.entry_power.get())
-            )
-
-            messagebox.showinfo("OK", "GCODE generated successfully!")
-
+            stock_lengths = [float(x) for x in self.entry_stock_length.get().split(",") if x.strip()]
+            if not stock_lengths or min(stock_lengths) <= 0:
+                raise ValueError("Stock Length(s) must be one or more positive lengths")
+            width = float(self.entry_width.get())
+            gap = float(self.entry_gap.get())
+            hole_radius = float(self.entry_hole_radius.get())
+            time_limit = float(self.entry_time_limit.get())
+            feedrate = float(self.entry_feedrate.get())
+            power = float(self.entry_power.get())
+            optimize_travel = self.optimize_var.get()
+            use_cache = self.cache_var.get()
         except Exception as e:
             messagebox.showerror("Error", str(e))
+            return
+
+        job = {"message": None, "error": None}
+
+        def work():
+            try:
+                report = generate_plan_gcode(
+                    parts,
+                    stock_lengths,
+                    width,
+                    gap,
+                    hole_radius,
+                    "cut_plan.gcode",
+                    feedrate=feedrate,
+                    power=power,
+                    optimize_travel=optimize_travel,
+                    time_limit=time_limit,
+                    cache=self.plan_cache if use_cache else None
+                )
+
+                job["message"] = format_report(report)
+            except Exception as e:
+                job["error"] = e
+
+        job["thread"] = threading.Thread(target=work, daemon=True)
+        self.job = job
+        self.btn_generate.config(state="disabled")
+        job["thread"].start()
+        self.poll_generate()
+
+    def poll_generate(self):
+        if self.job["thread"].is_alive():
+            self.after(100, self.poll_generate)
+            return
+        self.btn_generate.config(state="normal")
+        if self.job["error"] is not None:
+            messagebox.showerror("Error", str(self.job["error"]))
+        else:
+            messagebox.showinfo("OK", "GCODE generated successfully!\n\n" + self.job["message"])
 
     def convert_text_to_parts(self, txt: str) -> List[Part]:
         parts = []
@@ -0,0 +1,46 @@
+import math
+import time
+import unittest
+
+from toolpath_order import PathItem, PointGrid, optimize_order
+
+# các trường hợp dưới đây từng treo hàng chục giây; chạy đúng thì chỉ vài ms
+MAX_SECONDS = 2.0
+
+
+class DegenerateLayoutTest(unittest.TestCase):
+    """Endpoints on one line or all at one point (DesignerTab's default paths)."""
+
+    def check(self, items, origin=(0.0, 0.0)):
+        t = time.perf_counter()
+        ordered, report = optimize_order(items, origin=origin)
+        self.assertLess(time.perf_counter() - t, MAX_SECONDS)
+        self.assertEqual(sorted(item.payload for item, _ in ordered), list(range(len(items))))
+        self.assertLessEqual(report["travel_after"], report["travel_before"] + 1e-9)
+        return ordered
+
+    def test_collinear_lines(self):
+        ordered = self.check([PathItem((10, 10), (100, 10), 90, 0), PathItem((200, 10), (300, 10), 100, 1)])
+        self.assertEqual([item.payload for item, _ in ordered], [0, 1])
+
+    def test_coincident_holes(self):
+        self.check([PathItem((50, 50), (50, 50), 2 * math.pi, i) for i in range(10)])
+
+    def test_row_of_circles(self):
+        self.check([PathItem((10 + 20 * i, 10), (10 + 20 * i, 10), 2 * math.pi, i) for i in range(2000)])
+
+    def test_vertical_line_far_from_origin(self):
+        self.check([PathItem((1e5, 3 * i), (1e5, 3 * i + 2), 2, i) for i in range(500)])
+
+    def test_nearest_from_outside_bounds(self):
+        items = [PathItem((50, 50), (50, 50), 0, i) for i in range(10)]
+        grid = PointGrid(items)
+        t = time.perf_counter()
+        best = grid.nearest((-1e4, 1e4), 3)
+        self.assertLess(time.perf_counter() - t, MAX_SECONDS)
+        self.assertEqual(len(best), 3)
+        self.assertAlmostEqual(best[0][0], math.hypot(1e4 + 50, 1e4 - 50))
+
+
+if __name__ == "__main__":
+    unittest.main()
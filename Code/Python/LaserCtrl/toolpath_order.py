@@ -0,0 +1,381 @@
+import heapq
+import math
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+# Thời gian tối đa cho 2-opt/Or-opt (giây)
+ORDER_TIME_LIMIT = 0.5
+# Số láng giềng gần nhất xét cho mỗi đường cắt
+NEIGHBOURS = 8
+# Tốc độ G0 của máy (GRBL $110/$111, mm/min) dùng để ước lượng thời gian
+RAPID_RATE = 3000.0
+
+Point = Tuple[float, float]
+
+
+@dataclass
+class PathItem:
+    """
+    One burn the laser makes between two rapid moves.
+    - start, end: where the burn begins and ends; equal for closed loops
+    - length: burned length (mm), for the time estimate
+    - payload: whatever the exporter needs to write the G-code back
+
+    Every item can be burned either way round; the exporter is told
+    which through the reversed flag of the ordered result.
+    """
+    start: Point
+    end: Point
+    length: float
+    payload: Any = None
+
+
+def dist(p: Point, q: Point) -> float:
+    return math.hypot(p[0] - q[0], p[1] - q[1])
+
+
+def travel_distance(items: List[PathItem], flips: Optional[List[bool]] = None,
+                    origin: Point = (0.0, 0.0)) -> float:
+    """Rapid travel from origin through items in order and back to origin."""
+    pos = origin
+    total = 0.0
+    for k, item in enumerate(items):
+        head, tail = (item.end, item.start) if flips and flips[k] else (item.start, item.end)
+        total += dist(pos, head)
+        pos = tail
+    return total + dist(pos, origin)
+
+
+def estimate_time(travel: float, cut_length: float, feedrate: float,
+                  rapid_rate: float = RAPID_RATE) -> float:
+    """Seconds for travel at rapid_rate plus cut_length at feedrate (mm/min), without acceleration."""
+    return 60.0 * (travel / rapid_rate + cut_length / feedrate)
+
+
+class PointGrid:
+    """
+    Uniform grid over the endpoints of the items, for nearest neighbour
+    queries that only look at the cells around a point.
+    """
+
+    def __init__(self, items: List[PathItem]):
+        xs = [p[0] for it in items for p in (it.start, it.end)]
+        ys = [p[1] for it in items for p in (it.start, it.end)]
+        span = max(max(xs) - min(xs), max(ys) - min(ys))
+        area = (max(xs) - min(xs)) * (max(ys) - min(ys))
+        # khoảng 2 điểm mỗi ô; các điểm thẳng hàng có diện tích 0, khi đó
+        # chia cạnh dài nhất thành khoảng n ô thay vì để ô co về 0
+        self.cell = max(1e-3, math.sqrt(2.0 * area / len(items)), span / len(items))
+        # ô -> [(x, y, item), ...]
+        self.cells: Dict[Tuple[int, int], List[Tuple[float, float, int]]] = {}
+        for k, item in enumerate(items):
+            for p in {item.start, item.end}:
+                self.cells.setdefault(self.key(p), []).append((p[0], p[1], k))
+        keys = list(self.cells)
+        self.bounds = (min(k[0] for k in keys), min(k[1] for k in keys),
+                       max(k[0] for k in keys), max(k[1] for k in keys))
+
+    def key(self, p: Point) -> Tuple[int, int]:
+        return int(math.floor(p[0] / self.cell)), int(math.floor(p[1] / self.cell))
+
+    def ring(self, center: Tuple[int, int], r: int):
+        """Cells at Chebyshev distance r from center, only those inside bounds."""
+        cx, cy = center
+        x0, y0, x1, y1 = self.bounds
+        if r == 0:
+            yield center
+            return
+        xs = range(max(cx - r, x0), min(cx + r, x1) + 1)
+        for y in (cy - r, cy + r):
+            if y0 <= y <= y1:
+                for x in xs:
+                    yield x, y
+        ys = range(max(cy - r + 1, y0), min(cy + r - 1, y1) + 1)
+        for x in (cx - r, cx + r):
+            if x0 <= x <= x1:
+                for y in ys:
+                    yield x, y
+
+    def min_ring(self, center: Tuple[int, int]) -> int:
+        # các vòng nhỏ hơn nằm hẳn ngoài bounds, không có ô nào
+        x0, y0, x1, y1 = self.bounds
+        return max(x0 - center[0], center[0] - x1, y0 - center[1], center[1] - y1, 0)
+
+    def max_ring(self, center: Tuple[int, int]) -> int:
+        x0, y0, x1, y1 = self.bounds
+        return max(abs(center[0] - x0), abs(center[0] - x1), abs(center[1] - y0), abs(center[1] - y1))
+
+    def nearest(self, p: Point, k: int, skip: Optional[List[bool]] = None) -> List[Tuple[float, int]]:
+        """
+        Up to k (distance, item) pairs closest to p by either endpoint.
+        Items marked in skip are dropped from the grid as they are met.
+        """
+        center = self.key(p)
+        px, py = p
+        hypot = math.hypot
+        cells = self.cells
+        found: Dict[int, float] = {}
+        last = self.max_ring(center)
+        r = self.min_ring(center)
+        while r <= last:
+            for key in self.ring(center, r):
+                cell = cells.get(key)
+                if not cell:
+                    continue
+                if skip is not None:
+                    cell[:] = [point for point in cell if not skip[point[2]]]
+                for x, y, i in cell:
+                    d = hypot(px - x, py - y)
+                    if d < found.get(i, math.inf):
+                        found[i] = d
+            # mọi điểm ở vòng sau cách p ít nhất r * cell
+            if len(found) >= k:
+                best = heapq.nsmallest(k, ((d, i) for i, d in found.items()))
+                if best[-1][0] <= r * self.cell:
+                    return best
+            r += 1
+        return heapq.nsmallest(k, ((d, i) for i, d in found.items()))
+
+
+def order_nearest_neighbour(items: List[PathItem], grid: PointGrid,
+                            origin: Point = (0.0, 0.0)) -> Tuple[List[int], List[bool]]:
+    """Greedy tour: always burn next the item with the closest endpoint, entering there."""
+    n = len(items)
+    used = [False] * n
+    flips = [False] * n
+    tour = []
+    pos = origin
+    for _ in range(n):
+        d, k = grid.nearest(pos, 1, used)[0]
+        item = items[k]
+        flips[k] = dist(pos, item.end) < dist(pos, item.start)
+        used[k] = True
+        tour.append(k)
+        pos = item.start if flips[k] else item.end
+    return tour, flips
+
+
+class TourImprover:
+    """
+    2-opt and Or-opt over a tour of reversible items, starting and ending
+    at origin. Moves only consider the neighbour lists of each item and
+    stop at the deadline, so large plans get as far as the budget allows.
+
+    Reversing a stretch of the tour also reverses each item in it, which
+    is what makes 2-opt work on segments rather than points. Neighbour
+    lists are looked up in grid the first time an item is visited, so
+    the time spent on them counts against the budget too.
+    """
+
+    def __init__(self, items: List[PathItem], tour: List[int], flips: List[bool],
+                 grid: PointGrid, origin: Point):
+        self.items = items
+        self.tour = tour
+        self.flips = flips
+        self.grid = grid
+        self.neighbour_lists: List[Optional[List[int]]] = [None] * len(items)
+        self.origin = origin
+        self.pos = [0] * len(items)
+        self.reindex(0, len(tour))
+        self.two_opt_moves = 0
+        self.or_opt_moves = 0
+
+    def neighbours(self, k: int) -> List[int]:
+        near = self.neighbour_lists[k]
+        if near is None:
+            item = self.items[k]
+            found = self.grid.nearest(item.start, NEIGHBOURS + 1)
+            if item.end != item.start:
+                found += self.grid.nearest(item.end, NEIGHBOURS + 1)
+            near = list(dict.fromkeys(i for d, i in sorted(found) if i != k))[:NEIGHBOURS]
+            self.neighbour_lists[k] = near
+        return near
+
+    def reindex(self, lo: int, hi: int):
+        tour, pos = self.tour, self.pos
+        for p in range(max(0, lo), min(hi, len(tour))):
+            pos[tour[p]] = p
+
+    def head(self, p: int) -> Point:
+        # điểm vào của vị trí p; sau vị trí cuối là quay về gốc
+        if p >= len(self.tour):
+            return self.origin
+        k = self.tour[p]
+        return self.items[k].end if self.flips[k] else self.items[k].start
+
+    def tail(self, p: int) -> Point:
+        if p < 0:
+            return self.origin
+        k = self.tour[p]
+        return self.items[k].start if self.flips[k] else self.items[k].end
+
+    def reverse(self, lo: int, hi: int):
+        """Reverse tour positions lo..hi inclusive, flipping every item."""
+        tour, flips = self.tour, self.flips
+        tour[lo:hi + 1] = tour[lo:hi + 1][::-1]
+        for p in range(lo, hi + 1):
+            flips[tour[p]] = not flips[tour[p]]
+        self.reindex(lo, hi + 1)
+
+    def two_opt(self, deadline: float) -> bool:
+        improved = False
+        n = len(self.tour)
+        for a in range(-1, n - 1):
+            if time.perf_counter() >= deadline:
+                break
+            for k in self.neighbours(self.tour[max(a, 0)]) + [self.tour[a + 1]]:
+                b = self.pos[k]
+                lo, hi = (a, b) if a < b else (b, a)
+                if hi == lo:
+                    continue
+                # cạnh (lo, lo+1) và (hi, hi+1) thành (lo, hi) và (lo+1, hi+1)
+                t_lo, h_lo1 = self.tail(lo), self.head(lo + 1)
+                t_hi, h_hi1 = self.tail(hi), self.head(hi + 1)
+                delta = dist(t_lo, t_hi) + dist(h_lo1, h_hi1) - dist(t_lo, h_lo1) - dist(t_hi, h_hi1)
+                if delta < -1e-9:
+                    self.reverse(lo + 1, hi)
+                    self.two_opt_moves += 1
+                    improved = True
+        return improved
+
+    def or_opt(self, deadline: float, max_len: int = 3) -> bool:
+        improved = False
+        tour = self.tour
+        n = len(tour)
+        s = 0
+        while s < n:
+            if time.perf_counter() >= deadline:
+                break
+            moved = False
+            for length in range(1, max_len + 1):
+                e = s + length - 1
+                if e >= n:
+                    break
+                h_s, t_e = self.head(s), self.tail(e)
+                before, after = self.tail(s - 1), self.head(e + 1)
+                removed = dist(before, h_s) + dist(t_e, after) - dist(before, after)
+                if removed <= 1e-9:
+                    continue
+                best = None
+                for k in self.neighbours(tour[s]) + self.neighbours(tour[e]):
+                    c = self.pos[k]
+                    for c in (c - 1, c):
+                        # chèn đoạn giữa vị trí c và c+1
+                        if s - 1 <= c <= e:
+                            continue
+                        t_c, h_c1 = self.tail(c), self.head(c + 1)
+                        base = dist(t_c, h_c1)
+                        forward = dist(t_c, h_s) + dist(t_e, h_c1) - base
+                        backward = dist(t_c, t_e) + dist(h_s, h_c1) - base
+                        add, rev = (forward, False) if forward <= backward else (backward, True)
+                        if add < removed - 1e-9 and (best is None or add < best[0]):
+                            best = (add, c, rev)
+                if best is None:
+                    continue
+                add, c, rev = best
+                segment = tour[s:e + 1]
+                if rev:
+                    segment.reverse()
+                    for k in segment:
+                        self.flips[k] = not self.flips[k]
+                if c < s:
+                    tour[c + 1:e + 1] = segment + tour[c + 1:s]
+                    self.reindex(c + 1, e + 1)
+                else:
+                    tour[s:c + 1] = tour[e + 1:c + 1] + segment
+                    self.reindex(s, c + 1)
+                self.or_opt_moves += 1
+                improved = moved = True
+                break
+            if not moved:
+                s += 1
+        return improved
+
+    def run(self, time_limit: float):
+        deadline = time.perf_counter() + time_limit
+        while time.perf_counter() < deadline:
+            improved = self.two_opt(deadline)
+            improved = self.or_opt(deadline) or improved
+            if not improved:
+                break
+
+
+def optimize_order(items: List[PathItem], origin: Point = (0.0, 0.0),
+                   time_limit: float = ORDER_TIME_LIMIT, feedrate: float = 280.0,
+                   rapid_rate: float = RAPID_RATE) -> Tuple[List[Tuple[PathItem, bool]], dict]:
+    """
+    Reorder and orient items to cut down rapid travel: nearest neighbour
+    seeding, then 2-opt and Or-opt until no move helps or time_limit
+    (seconds, on top of the seeding) runs out.
+
+    Returns [(item, reversed), ...] in burn order and a report with the
+    travel distance (mm) and estimated time (s) before and after.
+    """
+    t = time.perf_counter()
+    before = travel_distance(items, origin=origin)
+    if len(items) < 2:
+        ordered = [(item, dist(origin, item.end) < dist(origin, item.start)) for item in items]
+        after = travel_distance([i for i, _ in ordered], [r for _, r in ordered], origin)
+        two_opt_moves = or_opt_moves = 0
+    else:
+        # lưới của nearest neighbour bị rút dần, nên 2-opt dùng lưới riêng
+        tour, flips = order_nearest_neighbour(items, PointGrid(items), origin)
+        improver = TourImprover(items, tour, flips, PointGrid(items), origin)
+        improver.run(time_limit)
+        ordered = [(items[k], flips[k]) for k in improver.tour]
+        after = travel_distance([i for i, _ in ordered], [r for _, r in ordered], origin)
+        two_opt_moves, or_opt_moves = improver.two_opt_moves, improver.or_opt_moves
+    if after > before:
+        # thứ tự ban đầu đã tốt hơn (vd. rất ít đường cắt)
+        ordered = [(item, False) for item in items]
+        after = before
+    report = order_report(items, before, after, feedrate, rapid_rate)
+    report["two_opt_moves"] = two_opt_moves
+    report["or_opt_moves"] = or_opt_moves
+    report["seconds"] = time.perf_counter() - t
+    return ordered, report
+
+
+def order_report(items: List[PathItem], before: float, after: float, feedrate: float,
+                 rapid_rate: float = RAPID_RATE) -> dict:
+    cut_length = sum(item.length for item in items)
+    return {
+        "items": len(items),
+        "cut_length": cut_length,
+        "travel_before": before,
+        "travel_after": after,
+        "time_before": estimate_time(before, cut_length, feedrate, rapid_rate),
+        "time_after": estimate_time(after, cut_length, feedrate, rapid_rate),
+        "two_opt_moves": 0,
+        "or_opt_moves": 0,
+        "seconds": 0.0,
+    }
+
+
+def format_report(report: dict) -> str:
+    return (f"Travel: {report['travel_before']:.0f} mm -> {report['travel_after']:.0f} mm\n"
+            f"Estimated time: {report['time_before'] / 60:.1f} min -> {report['time_after'] / 60:.1f} min\n"
+            f"({report['items']} paths ordered in {report['seconds']:.2f} s)")
+
+
+if __name__ == "__main__":
+    # Benchmark: quãng đường G0 trước/sau trên các kế hoạch cắt ngẫu nhiên
+    import random
+    import sys
+    from cut_handler import generate
+    from cut_plan_builder import Part, build_cut_plan
+    from extended_cut_export import plan_path_items
+
+    sizes = [int(x) for x in sys.argv[1:]] or [50, 500, 5000]
+    print(f"{'parts':>7} {'paths':>7} {'before mm':>11} {'after mm':>10} {'before s':>9} {'after s':>8} {'seconds':>8}")
+    for n in sizes:
+        random.seed(n)
+        parts = [Part(length=float(x), is_cut_down=random.random() < 0.3, is_cut_up=random.random() < 0.3,
+                      hole_centers=[x / 2.0] if x > 20 else [])
+                 for x in generate(1000, n)]
+        plan = build_cut_plan(1000.0, parts, 10.0, 5.0, 1.5)
+        items = plan_path_items(plan)
+        ordered, report = optimize_order(items)
+        print(f"{n:>7} {len(items):>7} {report['travel_before']:>11.0f} {report['travel_after']:>10.0f} "
+              f"{report['time_before']:>9.0f} {report['time_after']:>8.0f} {report['seconds']:>8.2f}")
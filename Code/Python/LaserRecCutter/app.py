@@ -1,16 +1,25 @@
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 import os
+import sys
 import math
+import threading
+
+# cutting-stock engine shared with LaserCtrl
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "LaserCtrl"))
+from cut_stock import StockType, solve_stock, format_report as format_stock_report
+from nesting import nest_rectangles, export_sheets, parse_batch, format_report as format_nesting_report, SPACING
 
 STICKS_FILE = "sticks.txt"
+END_TRIM = 10.0  # mm trimmed from a stick (both rounded ends)
+BATCH_TIME_LIMIT = 2.0
 
 # --- Utility: read/write sticks file ---
 def ensure_sample_sticks_file(path=STICKS_FILE):
     if os.path.exists(path):
         return
     sample = [
-        "# Format: name,length_mm,width_mm",
+        "# Format: name,length_mm,width_mm[,cost]",
         "Classic,100,10",
         "Slim,90,8",
         "Long,150,12",
@@ -35,11 +44,40 @@ def load_sticks(path=STICKS_FILE):
             try:
                 length = float(parts[1])
                 width = float(parts[2])
+                cost = float(parts[3]) if len(parts) > 3 and parts[3] else None
             except:
                 continue
-            sticks.append({"name": name, "length": length, "width": width})
+            sticks.append({"name": name, "length": length, "width": width, "cost": cost})
     return sticks
 
+# --- Batch planning: which stick type and how many for qty rectangles ---
+def plan_rectangle_batch(sticks, rect_length, rect_width, qty, time_limit=BATCH_TIME_LIMIT):
+    """
+    A rectangle is built from ceil(W / stick_width) strips of length L laid
+    side by side, so all strips of a batch must share one stick width. For
+    each width, cut qty * ceil(W / width) strips out of the stick lengths of
+    that width with the cutting-stock engine (several strips per stick when
+    they fit). Stick price is the cost column, or length * width (material)
+    when it is missing.
+
+    Returns (best, plans): plans maps width -> (bins, report), best is the
+    cheapest width or None if no stick is long enough.
+    """
+    by_width = {}
+    for s in sticks:
+        if s["length"] - END_TRIM >= rect_length - 1e-9:
+            by_width.setdefault(s["width"], []).append(s)
+
+    plans = {}
+    for width, group in by_width.items():
+        stocks = [StockType(s["name"], s["length"] - END_TRIM,
+                            s["cost"] if s.get("cost") is not None else s["length"] * s["width"])
+                  for s in group]
+        strips = [rect_length] * (qty * math.ceil(rect_width / width - 1e-9))
+        plans[width] = solve_stock(strips, stocks, time_limit=time_limit / len(by_width))
+    best = min(plans, key=lambda w: plans[w][1]["cost"]) if plans else None
+    return best, plans
+
 # --- SVG writer ---
 def save_rectangle_svg(file_path, rect_length, rect_width):
     """
@@ -83,6 +121,8 @@ class PopsicleApp:
         self.sticks = load_sticks(STICKS_FILE)  # list of dicts
         # state for last computed results
         self.last_results = []  # list of dicts {stick, usable, count, total_width}
+        self.batch = None  # background batch plan: {"thread", "result", "error"}
+        self.nesting = None  # background nesting job: {"thread", "result", "error"}
 
         self._build_ui()
 
@@ -109,6 +149,10 @@ class PopsicleApp:
         self.width_var = tk.StringVar(value="60")
         ttk.Entry(frm, textvariable=self.width_var, width=12).grid(row=1, column=1, pady=4, padx=6)
 
+        ttk.Label(frm, text="Quantity:").grid(row=2, column=0, sticky=tk.W, pady=4)
+        self.qty_var = tk.StringVar(value="1")
+        ttk.Entry(frm, textvariable=self.qty_var, width=12).grid(row=2, column=1, pady=4, padx=6)
+
         ttk.Button(left, text="Compute for all sticks", command=self.on_compute_all).pack(pady=(8,4), fill=tk.X)
         ttk.Button(left, text="Refresh sticks list", command=self.reload_sticks).pack(pady=(0,8), fill=tk.X)
 
@@ -127,6 +171,7 @@ class PopsicleApp:
         notes = ("- Stick usable length = length - 10mm (trim both rounded ends).\n"
                  "- A stick is usable iff usable_length >= rectangle length.\n"
                  "- Count = ceil(rect_width / stick_width).\n"
+                 "- Batch = sticks of each type for Quantity rectangles, several strips per stick.\n"
                  "- SVG bottom-left is at (0,5), top-right at (L, 5+W).")
         ttk.Label(left, text=notes, wraplength=220).pack()
 
@@ -144,15 +189,128 @@ class PopsicleApp:
         self._refresh_sticks_tree()
 
         ttk.Label(right, text="Compute results (per stick type)", font=("Arial", 11, "bold")).pack(anchor=tk.W, pady=(8,0))
-        self.result_tree = ttk.Treeview(right, columns=("usable","count","totalw"), show="headings")
+        self.result_tree = ttk.Treeview(right, columns=("usable","count","totalw","batch"), show="headings")
         self.result_tree.heading("usable", text="Usable?")
         self.result_tree.heading("count", text="Count")
         self.result_tree.heading("totalw", text="Total width (mm)")
+        self.result_tree.heading("batch", text="Batch sticks")
         self.result_tree.column("usable", width=80, anchor=tk.CENTER)
         self.result_tree.column("count", width=80, anchor=tk.CENTER)
         self.result_tree.column("totalw", width=120, anchor=tk.CENTER)
+        self.result_tree.column("batch", width=100, anchor=tk.CENTER)
         self.result_tree.pack(fill=tk.BOTH, expand=True, pady=6)
 
+        tab2 = ttk.Frame(nb)
+        nb.add(tab2, text="Batch → Sheets")
+        self._build_nesting_tab(tab2)
+
+    def _build_nesting_tab(self, tab):
+        left = ttk.Frame(tab, padding=8)
+        left.pack(side=tk.LEFT, fill=tk.Y)
+
+        ttk.Label(left, text="Stock", font=("Arial", 11, "bold")).pack(pady=(0,6))
+        frm = ttk.Frame(left)
+        frm.pack()
+
+        ttk.Label(frm, text="Nest onto:").grid(row=0, column=0, sticky=tk.W, pady=4)
+        self.nest_stock_combo = ttk.Combobox(frm, state="readonly", width=24)
+        self.nest_stock_combo.grid(row=0, column=1, pady=4, padx=6)
+
+        ttk.Label(frm, text="Sheet length mm:").grid(row=1, column=0, sticky=tk.W, pady=4)
+        self.sheet_length_var = tk.StringVar(value="600")
+        ttk.Entry(frm, textvariable=self.sheet_length_var, width=12).grid(row=1, column=1, pady=4, padx=6)
+
+        ttk.Label(frm, text="Sheet width mm:").grid(row=2, column=0, sticky=tk.W, pady=4)
+        self.sheet_width_var = tk.StringVar(value="400")
+        ttk.Entry(frm, textvariable=self.sheet_width_var, width=12).grid(row=2, column=1, pady=4, padx=6)
+
+        ttk.Label(frm, text="Spacing mm:").grid(row=3, column=0, sticky=tk.W, pady=4)
+        self.spacing_var = tk.StringVar(value=f"{SPACING:g}")
+        ttk.Entry(frm, textvariable=self.spacing_var, width=12).grid(row=3, column=1, pady=4, padx=6)
+
+        self.rotate_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(frm, text="Allow rotation", variable=self.rotate_var).grid(row=4, column=0, columnspan=2, sticky=tk.W)
+
+        ttk.Label(left, text="Rectangles: length,width,qty per line", font=("Arial", 10)).pack(anchor=tk.W, pady=(8,2))
+        self.batch_text = tk.Text(left, width=30, height=12)
+        self.batch_text.insert("1.0", "63,60,20\n120,40,10\n")
+        self.batch_text.pack()
+
+        self.btn_nest = ttk.Button(left, text="Nest & export SVG/G-code...", command=self.on_nest)
+        self.btn_nest.pack(pady=8, fill=tk.X)
+
+        right = ttk.Frame(tab, padding=8)
+        right.pack(side=tk.RIGHT, fill=tk.BOTH, expand=True)
+        ttk.Label(right, text="Sheets", font=("Arial", 11, "bold")).pack(anchor=tk.W)
+        self.sheet_tree = ttk.Treeview(right, columns=("parts","util"), show="headings")
+        self.sheet_tree.heading("parts", text="Rectangles")
+        self.sheet_tree.heading("util", text="Utilization (%)")
+        self.sheet_tree.column("parts", width=100, anchor=tk.CENTER)
+        self.sheet_tree.column("util", width=120, anchor=tk.CENTER)
+        self.sheet_tree.pack(fill=tk.BOTH, expand=True, pady=6)
+        self._populate_nest_stock_combobox()
+
+    def _populate_nest_stock_combobox(self):
+        # first entry uses the sheet size fields, the others one stick (trimmed) as the stock
+        items = ["Sheet (size below)"] + [f"{s['name']} stick ({s['length'] - END_TRIM:g} x {s['width']:g})"
+                                          for s in self.sticks]
+        self.nest_stock_combo['values'] = items
+        self.nest_stock_combo.current(0)
+
+    def on_nest(self):
+        if self.nesting and self.nesting["thread"].is_alive():
+            return
+        try:
+            rects = parse_batch(self.batch_text.get("1.0", tk.END))
+            sel = self.nest_stock_combo.current()
+            if sel > 0:
+                stick = self.sticks[sel - 1]
+                sheet_l, sheet_w = stick['length'] - END_TRIM, stick['width']
+            else:
+                sheet_l, sheet_w = float(self.sheet_length_var.get()), float(self.sheet_width_var.get())
+            spacing = float(self.spacing_var.get())
+            if not rects or sheet_l <= 0 or sheet_w <= 0 or spacing < 0:
+                raise ValueError("Need rectangles and a positive sheet size.")
+        except Exception as e:
+            messagebox.showerror("Input error", f"Invalid batch: {e}")
+            return
+        folder = filedialog.askdirectory(title="Folder for sheet SVG/G-code")
+        if not folder:
+            return
+
+        nesting = {"result": None, "error": None}
+        allow_rotate = self.rotate_var.get()
+
+        def work():
+            try:
+                sheets, report = nest_rectangles(rects, sheet_l, sheet_w, spacing, allow_rotate)
+                export_sheets(folder, sheets)
+                nesting["result"] = (sheets, report)
+            except Exception as e:
+                nesting["error"] = e
+
+        nesting["thread"] = threading.Thread(target=work, daemon=True)
+        self.nesting = nesting
+        self.btn_nest.config(state="disabled")
+        nesting["thread"].start()
+        self._poll_nesting(folder)
+
+    def _poll_nesting(self, folder):
+        if self.nesting["thread"].is_alive():
+            self.root.after(100, self._poll_nesting, folder)
+            return
+        self.btn_nest.config(state="normal")
+        if self.nesting["error"] is not None:
+            messagebox.showerror("Nesting error", str(self.nesting["error"]))
+            return
+        sheets, report = self.nesting["result"]
+        for r in self.sheet_tree.get_children():
+            self.sheet_tree.delete(r)
+        for n, sheet in enumerate(sheets, 1):
+            self.sheet_tree.insert("", tk.END, values=(len(sheet.placements), f"{100 * sheet.utilization:.1f}"),
+                                   text=f"sheet {n}")
+        messagebox.showinfo("Nested", format_nesting_report(report, per_sheet=False) + f"\n\nSaved to:\n{folder}")
+
     def _populate_stick_combobox(self):
         items = [f"{s['name']} (L={s['length']} W={s['width']})" for s in self.sticks]
         self.stick_combo['values'] = items
@@ -169,14 +327,18 @@ class PopsicleApp:
         self.sticks = load_sticks(STICKS_FILE)
         self._refresh_sticks_tree()
         self._populate_stick_combobox()
+        self._populate_nest_stock_combobox()
         messagebox.showinfo("Reloaded", f"Loaded {len(self.sticks)} stick types from {STICKS_FILE}")
 
     def on_compute_all(self):
+        if self.batch and self.batch["thread"].is_alive():
+            return
         try:
             L = float(self.length_var.get())
             W = float(self.width_var.get())
-            if L <= 0 or W <= 0:
-                raise ValueError("Dimensions must be positive.")
+            qty = int(self.qty_var.get())
+            if L <= 0 or W <= 0 or qty <= 0:
+                raise ValueError("Dimensions and quantity must be positive.")
         except Exception as e:
             messagebox.showerror("Input error", f"Invalid rectangle size: {e}")
             return
@@ -191,9 +353,43 @@ class PopsicleApp:
             else:
                 count = None
                 totalw = None
-            self.last_results.append({"stick": s, "usable": usable, "count": count, "total_width": totalw})
+            self.last_results.append({"stick": s, "usable": usable, "count": count, "total_width": totalw,
+                                      "batch": None})
+        self._refresh_results_table()
+
+        # the batch plan can take a couple of seconds: run it off the Tk thread
+        batch = {"result": None, "error": None}
+
+        def work():
+            try:
+                batch["result"] = plan_rectangle_batch(self.sticks, L, W, qty)
+            except Exception as e:
+                batch["error"] = e
+
+        batch["thread"] = threading.Thread(target=work, daemon=True)
+        self.batch = batch
+        batch["thread"].start()
+        self._poll_batch()
+
+    def _poll_batch(self):
+        if self.batch["thread"].is_alive():
+            self.root.after(100, self._poll_batch)
+            return
+        if self.batch["error"] is not None:
+            messagebox.showerror("Batch error", str(self.batch["error"]))
+            return
+        best, plans = self.batch["result"]
+        for res in self.last_results:
+            plan = plans.get(res["stick"]["width"])
+            if plan is not None:
+                res["batch"] = plan[1]["stocks"].get(res["stick"]["name"], 0)
         self._refresh_results_table()
-        messagebox.showinfo("Done", f"Computed for {len(self.sticks)} stick types.")
+        text = f"Computed for {len(self.sticks)} stick types."
+        if best is None:
+            text += "\n\nNo stick is long enough for this rectangle."
+        else:
+            text += f"\n\nBest batch: width {best:g} mm\n" + format_stock_report(plans[best][1])
+        messagebox.showinfo("Done", text)
 
     def _refresh_results_table(self):
         for r in self.result_tree.get_children():
@@ -203,8 +399,9 @@ class PopsicleApp:
             usable = "Yes" if res['usable'] else "No"
             cnt = "-" if res['count'] is None else str(res['count'])
             tot = "-" if res['total_width'] is None else f"{res['total_width']:.2f}"
+            batch = "-" if res['batch'] is None else str(res['batch'])
             label = f"{s['name']} (L={s['length']} W={s['width']})"
-            self.result_tree.insert("", tk.END, values=(usable, cnt, tot), text=label)
+            self.result_tree.insert("", tk.END, values=(usable, cnt, tot, batch), text=label)
 
     def on_create_svg_selected(self):
         # create SVG using currently selected stick type (for naming or for reference)
@@ -0,0 +1,323 @@
+import os
+import time
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+SPACING = 1.0  # mm kept between nested rectangles (kerf + margin)
+EPS = 1e-9
+
+
+class FreeRects:
+    """
+    Free rectangles of every open sheet for MaxRects, in one index.
+
+    Rectangles live in growable numpy columns (sheet, x, y, w, h, alive), so
+    finding the first sheet with room for a part, best fit inside it, and
+    the overlap/containment checks after a placement are single vectorized
+    passes instead of Python loops over sheets and rectangles. Rectangles
+    of closed sheets are dropped, which keeps the index small.
+    """
+
+    def __init__(self):
+        self.sheet = np.zeros(16, dtype=np.intp)
+        self.x = np.zeros(16)
+        self.y = np.zeros(16)
+        self.w = np.zeros(16)
+        self.h = np.zeros(16)
+        self.alive = np.zeros(16, dtype=bool)
+        self.slots: List[int] = list(range(15, -1, -1))
+
+    def __len__(self):
+        return int(self.alive.sum())
+
+    def add(self, sheet: int, x: float, y: float, w: float, h: float) -> int:
+        if not self.slots:
+            size = len(self.x)
+            for name in ("sheet", "x", "y", "w", "h", "alive"):
+                column = getattr(self, name)
+                setattr(self, name, np.concatenate((column, np.zeros_like(column))))
+            self.slots = list(range(2 * size - 1, size - 1, -1))
+        k = self.slots.pop()
+        self.sheet[k], self.x[k], self.y[k], self.w[k], self.h[k] = sheet, x, y, w, h
+        self.alive[k] = True
+        return k
+
+    def remove(self, indices):
+        self.alive[indices] = False
+        self.slots.extend(np.atleast_1d(indices).tolist())
+
+    def close(self, sheet: int):
+        self.remove(np.nonzero(self.alive & (self.sheet == sheet))[0])
+
+    def largest(self, sheet: int) -> Tuple[float, float]:
+        """Largest free width and height on a sheet (not necessarily of one rectangle)."""
+        mask = self.alive & (self.sheet == sheet)
+        return (float(self.w[mask].max()), float(self.h[mask].max())) if mask.any() else (0.0, 0.0)
+
+    def overlapping(self, sheet: int, x: float, y: float, w: float, h: float) -> np.ndarray:
+        return np.nonzero(self.alive & (self.sheet == sheet) &
+                          (self.x < x + w - EPS) & (self.x + self.w > x + EPS) &
+                          (self.y < y + h - EPS) & (self.y + self.h > y + EPS))[0]
+
+    def containing(self, sheet: int, x: float, y: float, w: float, h: float) -> bool:
+        return bool((self.alive & (self.sheet == sheet) & (self.x <= x + EPS) & (self.y <= y + EPS) &
+                     (self.x + self.w >= x + w - EPS) & (self.y + self.h >= y + h - EPS)).any())
+
+    def inside(self, sheet: int, x: float, y: float, w: float, h: float) -> np.ndarray:
+        return np.nonzero(self.alive & (self.sheet == sheet) & (self.x >= x - EPS) & (self.y >= y - EPS) &
+                          (self.x + self.w <= x + w + EPS) & (self.y + self.h <= y + h + EPS))[0]
+
+    def best_fit(self, w: float, h: float, allow_rotate: bool) -> Optional[Tuple[int, float, float, bool]]:
+        """
+        First sheet (lowest number) with room for the part, and on it the
+        Best Short Side Fit: the free rectangle leaving the smallest leftover
+        on its shorter side, ties broken by the longer side. Returns
+        (sheet, x, y, rotated) or None when no open sheet can take it.
+        """
+        options = []
+        for rotated in ((False, True) if allow_rotate and abs(w - h) > EPS else (False,)):
+            pw, ph = (h, w) if rotated else (w, h)
+            dw, dh = self.w - pw, self.h - ph
+            fits = self.alive & (dw >= -EPS) & (dh >= -EPS)
+            if fits.any():
+                options.append((rotated, dw, dh, fits))
+        if not options:
+            return None
+        sheet = min(int(self.sheet[fits].min()) for _, _, _, fits in options)
+
+        best = None
+        for rotated, dw, dh, fits in options:
+            fits = fits & (self.sheet == sheet)
+            if not fits.any():
+                continue
+            short = np.where(fits, np.minimum(dw, dh), np.inf)
+            long = np.maximum(dw, dh)
+            candidates = np.nonzero(short == short.min())[0]
+            k = candidates[np.argmin(long[candidates])]
+            score = (short[k], long[k])
+            if best is None or score < best[0]:
+                best = (score, self.x[k], self.y[k], rotated)
+        return sheet, best[1], best[2], best[3]
+
+    def place(self, sheet: int, x: float, y: float, w: float, h: float):
+        """Split every free rectangle of the sheet overlapping the placed part, then prune."""
+        hit = self.overlapping(sheet, x, y, w, h)
+        created = []
+        for fx, fy, fw, fh in zip(self.x[hit].tolist(), self.y[hit].tolist(),
+                                  self.w[hit].tolist(), self.h[hit].tolist()):
+            if x > fx + EPS:
+                created.append((fx, fy, x - fx, fh))
+            if x + w < fx + fw - EPS:
+                created.append((x + w, fy, fx + fw - x - w, fh))
+            if y > fy + EPS:
+                created.append((fx, fy, fw, y - fy))
+            if y + h < fy + fh - EPS:
+                created.append((fx, y + h, fw, fy + fh - y - h))
+        self.remove(hit)
+
+        # only the new rectangles can contain or be contained by others
+        for n, (nx, ny, nw, nh) in enumerate(created):
+            if any(ox <= nx + EPS and oy <= ny + EPS and nx + nw <= ox + ow + EPS and ny + nh <= oy + oh + EPS
+                   for m, (ox, oy, ow, oh) in enumerate(created)
+                   if m != n and (m < n or (ox, oy, ow, oh) != (nx, ny, nw, nh))):
+                continue
+            if self.containing(sheet, nx, ny, nw, nh):
+                continue
+            self.remove(self.inside(sheet, nx, ny, nw, nh))
+            self.add(sheet, nx, ny, nw, nh)
+
+
+@dataclass
+class Placement:
+    index: int  # position of the part in the input list
+    x: float
+    y: float
+    width: float  # as placed, i.e. after rotation
+    height: float
+    rotated: bool
+
+
+@dataclass
+class Sheet:
+    width: float
+    height: float
+    placements: List[Placement] = field(default_factory=list)
+
+    @property
+    def used_area(self) -> float:
+        return sum(p.width * p.height for p in self.placements)
+
+    @property
+    def utilization(self) -> float:
+        return self.used_area / (self.width * self.height)
+
+
+def nest_rectangles(rects: List[Tuple[float, float]], sheet_width: float, sheet_height: float,
+                    spacing: float = SPACING, allow_rotate: bool = True) -> Tuple[List[Sheet], dict]:
+    """
+    Nest rectangles (length, width) onto as few sheet_width x sheet_height
+    sheets as possible with MaxRects (Best Short Side Fit), rotating parts
+    by 90 degrees when allowed.
+
+    Parts are placed longest side first; each goes on the first open sheet
+    it fits on, otherwise a new sheet is opened. All open sheets share one
+    FreeRects index, so finding that sheet is a single vectorized query;
+    sheets that can no longer take the smallest remaining part are
+    closed. spacing is added to every part and to the sheet size, so
+    neighbouring parts keep that gap while parts may still touch the
+    sheet edge.
+    """
+    started = time.perf_counter()
+    for i, (w, h) in enumerate(rects):
+        fits = (w <= sheet_width + EPS and h <= sheet_height + EPS) or \
+               (allow_rotate and h <= sheet_width + EPS and w <= sheet_height + EPS)
+        if w <= 0 or h <= 0 or not fits:
+            raise ValueError(f"Rectangle #{i} ({w:g} x {h:g}) does not fit a {sheet_width:g} x {sheet_height:g} sheet")
+
+    order = sorted(range(len(rects)), key=lambda i: (max(rects[i]), rects[i][0] * rects[i][1]), reverse=True)
+    # smallest side among the parts still to place, for closing full sheets
+    smallest = np.minimum.accumulate([min(rects[i]) for i in order][::-1])[::-1] if rects else []
+    sheets: List[Sheet] = []
+    free = FreeRects()
+    for step, i in enumerate(order):
+        w, h = rects[i]
+        fit = free.best_fit(w + spacing, h + spacing, allow_rotate)
+        if fit is None:
+            sheets.append(Sheet(sheet_width, sheet_height))
+            free.add(len(sheets) - 1, 0.0, 0.0, sheet_width + spacing, sheet_height + spacing)
+            fit = free.best_fit(w + spacing, h + spacing, allow_rotate)
+        s, x, y, rotated = fit
+        if rotated:
+            w, h = h, w
+        free.place(s, x, y, w + spacing, h + spacing)
+        sheets[s].placements.append(Placement(i, float(x), float(y), w, h, rotated))
+        if min(free.largest(s)) < smallest[step] + spacing - EPS:
+            free.close(s)
+
+    seconds = time.perf_counter() - started
+    return sheets, nesting_report(rects, sheets, seconds)
+
+
+def nesting_report(rects: List[Tuple[float, float]], sheets: List[Sheet], seconds: float) -> dict:
+    sheet_area = sum(s.width * s.height for s in sheets)
+    part_area = sum(w * h for w, h in rects)
+    return {
+        "parts": len(rects),
+        "sheets": len(sheets),
+        "utilization": part_area / sheet_area if sheet_area else 0.0,
+        "sheet_utilization": [s.utilization for s in sheets],
+        "rotated": sum(p.rotated for s in sheets for p in s.placements),
+        "seconds": seconds,
+    }
+
+
+def format_report(report: dict, per_sheet: bool = True) -> str:
+    lines = [f"{report['parts']} rectangles on {report['sheets']} sheets "
+             f"({report['rotated']} rotated) in {report['seconds']:.3f} s",
+             f"Utilization: {100 * report['utilization']:.1f}%"]
+    for k, u in enumerate(report["sheet_utilization"] if per_sheet else []):
+        lines.append(f"  sheet {k + 1}: {100 * u:.1f}%")
+    return "\n".join(lines)
+
+
+# --- Output: one SVG and one G-code file per sheet ---
+def save_sheet_svg(file_path, sheet: Sheet):
+    """
+    SVG in mm units with +y up, like save_rectangle_svg: the sheet origin is
+    at (0,0) with the tiny alignment line there, every part is a rect.
+    """
+    width_mm, height_mm = sheet.width, sheet.height
+    stroke = 0.1
+    svg = ['<?xml version="1.0" encoding="UTF-8" standalone="no"?>',
+           f'<svg width="{width_mm:.4f}mm" height="{height_mm:.4f}mm" viewBox="0 0 {width_mm:.6f} {height_mm:.6f}" xmlns="http://www.w3.org/2000/svg" version="1.1">',
+           f'  <g transform="translate(0,{height_mm:.6f}) scale(1,-1)">']
+    for p in sheet.placements:
+        svg.append(f'    <rect x="{p.x:.6f}" y="{p.y:.6f}" width="{p.width:.6f}" height="{p.height:.6f}" stroke="black" stroke-width="{stroke:.4f}" fill="none" />')
+    svg.append(f'    <line x1="0.000000" y1="0.000000" x2="0.000000" y2="0.100000" stroke="black" stroke-width="{stroke:.4f}" />')
+    svg.append("  </g>")
+    svg.append("</svg>")
+    with open(file_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(svg))
+
+
+def save_sheet_gcode(file_path, sheet: Sheet, feedrate: float = 280, power: float = 1000):
+    """
+    G-code cutting each part outline as one closed loop, entered at the
+    corner nearest the head; parts visited nearest-neighbour from the
+    origin. A closed loop ends where it starts, so that corner is also
+    where the next rapid begins.
+    """
+    lines = ["; GCODE generated from nested sheet", "G21 ; set mm mode", "G90 ; absolute positioning",
+             "G0 X0 Y0", ""]
+
+    def corners(p: Placement) -> List[Tuple[float, float]]:
+        return [(p.x, p.y), (p.x + p.width, p.y), (p.x + p.width, p.y + p.height), (p.x, p.y + p.height)]
+
+    def nearest(p: Placement) -> Tuple[float, int]:
+        return min(((cx - px) ** 2 + (cy - py) ** 2, i) for i, (cx, cy) in enumerate(corners(p)))
+
+    todo = list(sheet.placements)
+    px, py = 0.0, 0.0
+    while todo:
+        k = min(range(len(todo)), key=lambda k: nearest(todo[k])[0])
+        p = todo[k]
+        todo[k] = todo[-1]
+        todo.pop()
+        start = nearest(p)[1]
+        loop = corners(p)
+        loop = loop[start:] + loop[:start]
+        lines.append(f"G0 X{loop[0][0]:.3f} Y{loop[0][1]:.3f}")
+        lines.append(f"M3 S{power}")
+        lines.append(f"G1 X{loop[1][0]:.3f} Y{loop[1][1]:.3f} F{feedrate}")
+        for cx, cy in loop[2:] + loop[:1]:
+            lines.append(f"G1 X{cx:.3f} Y{cy:.3f}")
+        lines.append("M5")
+        lines.append("")
+        px, py = loop[0]
+    lines.append("G0 X0 Y0")
+    lines.append("; END")
+    with open(file_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+
+
+def export_sheets(folder, sheets: List[Sheet], prefix: str = "sheet",
+                  feedrate: float = 280, power: float = 1000) -> List[str]:
+    """Write <prefix>_<n>.svg and <prefix>_<n>.gcode for every sheet; returns the paths."""
+    paths = []
+    for n, sheet in enumerate(sheets, 1):
+        base = os.path.join(folder, f"{prefix}_{n:03d}")
+        save_sheet_svg(base + ".svg", sheet)
+        save_sheet_gcode(base + ".gcode", sheet, feedrate, power)
+        paths += [base + ".svg", base + ".gcode"]
+    return paths
+
+
+def parse_batch(text: str) -> List[Tuple[float, float]]:
+    """Lines of "length,width[,qty]" -> one (length, width) per rectangle."""
+    rects = []
+    for ln in text.splitlines():
+        ln = ln.strip()
+        if not ln or ln.startswith("#"):
+            continue
+        parts = [p.strip() for p in ln.split(",")]
+        qty = int(parts[2]) if len(parts) > 2 and parts[2] else 1
+        rects += [(float(parts[0]), float(parts[1]))] * qty
+    return rects
+
+
+if __name__ == "__main__":
+    # Benchmark: sheets, utilization and packing time on random batches
+    import random
+    import sys
+
+    sizes = [int(x) for x in sys.argv[1:]] or [100, 500, 2000, 10000]
+    print(f"{'parts':>6} {'sheets':>7} {'util %':>7} {'last %':>7} {'seconds':>8}")
+    for n in sizes:
+        random.seed(n)
+        rects = [(random.randint(20, 150), random.randint(10, 80)) for _ in range(n)]
+        sheets, report = nest_rectangles(rects, 600.0, 400.0)
+        assert sorted(p.index for s in sheets for p in s.placements) == list(range(n))
+        print(f"{n:>6} {report['sheets']:>7} {100 * report['utilization']:>7.1f} "
+              f"{100 * report['sheet_utilization'][-1]:>7.1f} {report['seconds']:>8.3f}")
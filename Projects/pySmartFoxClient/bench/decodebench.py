@@ -0,0 +1,66 @@
+# -*- coding:utf-8 -*-
+'''
+Created on 2026-10-18
+
+Feed a bot that only listens for extension responses a lobby style
+stream (mostly pubMsg chatter and uCount broadcasts, a few xtRes) with
+header-peek selective decoding off and on.
+
+    python bench/decodebench.py [frames]
+'''
+
+import sys
+import time
+import payloads
+from it.gotoandplay.smartfoxclient import SmartFoxClient
+from it.gotoandplay.smartfoxclient.sfsevent import SFSEvent
+
+class XtListener(object):
+
+    def __init__(self):
+        self.events = 0
+
+    def handleEvent(self, evt):
+        self.events += 1
+        return
+
+def build_stream(users = 20):
+    frames = []
+    for i in range(100):
+        frames.append(payloads.pub_msg(1, 1 + i % users, "chat line %d with some words in it" % i))
+        if i % 2 == 0:
+            frames.append(payloads.u_count(1 + i % 50, i % 7))
+        if i % 10 == 0:
+            frames.append(payloads.xt_res_xml())
+            frames.append(payloads.xt_res_json())
+    return frames
+
+def run(count = 200000):
+    stream = build_stream()
+    rounds, rest = divmod(count, len(stream))
+    print("%-10s %10s %12s %10s %10s %8s" % ("selective", "seconds", "frames/s", "parsed", "skipped", "events"))
+    for selective in (False, True):
+        sfc = SmartFoxClient()
+        sfc.handleMessage(payloads.rm_list(50))
+        sfc.handleMessage(payloads.join_ok(1, 20))
+        sfc.setSelectiveDecoding(selective)
+        listener = XtListener()
+        sfc.addEventListener(SFSEvent.onExtensionResponse, listener)
+        before = sfc.getDecodeStats()
+        handle = sfc.handleMessage
+        start = time.perf_counter()
+        for _ in range(rounds):
+            for frame in stream:
+                handle(frame)
+        for frame in stream[:rest]:
+            handle(frame)
+        elapsed = time.perf_counter() - start
+        stats = sfc.getDecodeStats()
+        parsed = stats["framesParsed"] - before["framesParsed"]
+        print("%-10s %10.3f %12.0f %10d %10d %8d" % ("on" if selective else "off", elapsed, count / elapsed,
+                                                   parsed, stats["framesSkipped"], listener.events))
+    print(stats["skippedActions"])
+    return
+
+if __name__ == "__main__":
+    run(*[int(arg) for arg in sys.argv[1:2]])
@@ -0,0 +1,82 @@
+# -*- coding:utf-8 -*-
+'''
+Created on 2026-10-18
+
+Dispatch a stream of synthetic uCount/pubMsg messages through SysHandler,
+comparing the old getattr based routing with the action table, with and
+without listeners. Frames are parsed once up front so only routing,
+handler work and event delivery are timed.
+
+    python bench/dispatchbench.py [messages]
+'''
+
+import sys
+import time
+import payloads
+from it.gotoandplay.smartfoxclient import SmartFoxClient
+from it.gotoandplay.smartfoxclient.sfsevent import SFSEvent
+from it.gotoandplay.smartfoxclient.handlers.syshandler import SysHandler
+
+class GetattrSysHandler(SysHandler):
+    """
+    SysHandler routing each action the way it used to, by method name.
+    """
+
+    def handleMessage(self, xml_obj, obj_type = None):
+        action = xml_obj.body.xml_attr.get("action")
+        if action and hasattr(self, "handle_"+action):
+            func = getattr(self, "handle_"+action)
+            return func(xml_obj)
+        return
+
+class CountingListener(object):
+
+    def __init__(self):
+        self.events = 0
+
+    def handleEvent(self, evt):
+        self.events += 1
+        return
+
+def build_client(rooms = 50, users = 20):
+    sfc = SmartFoxClient()
+    sfc.handleMessage(payloads.rm_list(rooms))
+    sfc.handleMessage(payloads.join_ok(1, users))
+    return sfc
+
+def build_stream(sfc, users = 20):
+    frames = []
+    for i in range(64):
+        frames.append(payloads.u_count(1 + i % 50, i % 7))
+        frames.append(payloads.pub_msg(1, 1 + i % users, "message %d" % i))
+    return [sfc.parseXml(frame) for frame in frames]
+
+def run(messages = 1000000):
+    print("%-10s %-10s %12s %12s %10s" % ("routing", "listeners", "seconds", "msg/s", "events"))
+    for routing in ("getattr", "table"):
+        for listening in (False, True):
+            sfc = build_client()
+            if routing == "getattr":
+                handler = GetattrSysHandler(sfc)
+            else:
+                handler = SysHandler(sfc)
+            listener = CountingListener()
+            if listening:
+                sfc.addEventListener(SFSEvent.onUserCountChange, listener)
+                sfc.addEventListener(SFSEvent.onPublicMessage, listener)
+            stream = build_stream(sfc)
+            handle = handler.handleMessage
+            rounds, rest = divmod(messages, len(stream))
+            start = time.perf_counter()
+            for _ in range(rounds):
+                for xml_obj in stream:
+                    handle(xml_obj)
+            for xml_obj in stream[:rest]:
+                handle(xml_obj)
+            elapsed = time.perf_counter() - start
+            print("%-10s %-10s %12.3f %12.0f %10d" % (routing, "yes" if listening else "no",
+                                                    elapsed, messages / elapsed, listener.events))
+    return
+
+if __name__ == "__main__":
+    run(*[int(arg) for arg in sys.argv[1:2]])
@@ -0,0 +1,109 @@
+# -*- coding:utf-8 -*-
+'''
+Created on 2026-10-18
+
+Run a fleet of bot sessions sharded over worker processes (see
+SFSFleet) and report throughput, memory per session and CPU per 1k
+messages, so a host can be sized before the real bots go on it.
+
+Without --port a ReplayServer from loadtest.py is started in this
+process; the default scenario is the loadtest login flow followed by an
+xt echo stream. Any Scenario subclass can be run with --scenario.
+
+    python bench/fleet.py --sessions 400 --workers 4
+    python bench/fleet.py --port 9339 --sessions 1000 --workers 8
+    python bench/fleet.py --scenario mybots:Lobby --port 9339
+'''
+
+import time
+import asyncio
+import argparse
+import threading
+import payloads
+from loadtest import ReplayServer, XT_MODES
+from it.gotoandplay.smartfoxclient import SmartFoxClient
+from it.gotoandplay.smartfoxclient.sfsevent import SFSEvent
+from it.gotoandplay.smartfoxclient.sfsfleet import Scenario, SFSFleet, printReport
+
+class LobbyScenario(Scenario):
+    """
+    login, getRoomList, joinRoom(1), some roundTripBench calls and then a
+    closed loop of xt echo requests cycling through xml, json and str.
+    """
+
+    def __init__(self, sfc, index, config):
+        Scenario.__init__(self, sfc, index, config)
+        self.rtts = []
+        self.xtLatency = []
+
+    async def run(self):
+        sfc = self.sfc
+        rooms = self.expect(SFSEvent.onRoomListUpdate)
+        await self.call(SFSEvent.onLogin, sfc.login, "bench", "bot%d" % self.index, "")
+        sfc.getRoomList()
+        await rooms
+        await self.call(SFSEvent.onJoinRoom, sfc.joinRoom, 1)
+        for i in range(self.config["rounds"]):
+            evt = await self.call(SFSEvent.onRoundTripResponse, sfc.roundTripBench)
+            self.rtts.append(evt.getParams()["elapsed"] * 1000)
+        for seq in range(self.config["messages"]):
+            mode = XT_MODES[seq % len(XT_MODES)]
+            params = [seq] if mode == SmartFoxClient.XTMSG_TYPE_STR else {"seq":seq}
+            start = time.perf_counter()
+            await self.call(SFSEvent.onExtensionResponse, sfc.sendXtMessage, "bench", "echo", params,
+                            sendType = mode)
+            self.xtLatency.append((time.perf_counter() - start) * 1000)
+        return
+
+    async def call(self, event_name, request, *args, **kwargs):
+        answer = self.expect(event_name)
+        request(*args, **kwargs)
+        return await answer
+
+    def getMetrics(self):
+        return {"rttMs":self.rtts, "xtMs":self.xtLatency, "xtMessages":len(self.xtLatency)}
+
+def start_server(host, rooms, users):
+    """
+    Run a ReplayServer on a thread of its own and return its port.
+    """
+    ready = threading.Event()
+    state = {}
+    def serve():
+        async def main():
+            server = await ReplayServer(rooms, users).start(host, 0)
+            state["port"] = server.sockets[0].getsockname()[1]
+            ready.set()
+            await server.serve_forever()
+        asyncio.run(main())
+    threading.Thread(target = serve, name = "replay-server", daemon = True).start()
+    ready.wait()
+    return state["port"]
+
+def run(sessions = 200, workers = 2, messages = 60, rounds = 5, host = "127.0.0.1", port = None,
+        scenario = LobbyScenario, rooms = 50, users = 20, timeout = 120.0, connectRate = None):
+    if port is None:
+        port = start_server(host, rooms, users)
+    fleet = SFSFleet(host, port, scenario, sessions, workers, config = {"messages":messages, "rounds":rounds},
+                     timeout = timeout, connectRate = connectRate)
+    report = fleet.run()
+    printReport(report)
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "SmartFoxClient fleet runner")
+    parser.add_argument("--host", default = "127.0.0.1")
+    parser.add_argument("--port", type = int, default = None, help = "server to hit, a replay server when left out")
+    parser.add_argument("--sessions", type = int, default = 200)
+    parser.add_argument("--workers", type = int, default = 2)
+    parser.add_argument("--messages", type = int, default = 60)
+    parser.add_argument("--rounds", type = int, default = 5)
+    parser.add_argument("--rooms", type = int, default = 50)
+    parser.add_argument("--users", type = int, default = 20)
+    parser.add_argument("--timeout", type = float, default = 120.0)
+    parser.add_argument("--connect-rate", type = float, default = None, help = "connections per second per worker")
+    parser.add_argument("--scenario", default = None, help = "module:Class of a Scenario subclass")
+    args = parser.parse_args()
+    report = run(args.sessions, args.workers, args.messages, args.rounds, args.host, args.port,
+                 args.scenario or LobbyScenario, args.rooms, args.users, args.timeout, args.connect_rate)
+    raise SystemExit(1 if report["failed"] or report["workerErrors"] else 0)
@@ -0,0 +1,45 @@
+# -*- coding:utf-8 -*-
+'''
+Created on 2026-10-18
+
+Feed a multi-megabyte rmList frame in 1 KB chunks through the old
+split-and-concatenate framing and through FrameBuffer.
+
+    python bench/framebench.py [rooms] [chunk_size]
+'''
+
+import sys
+import time
+import payloads
+from it.gotoandplay.utils.framebuffer import FrameBuffer
+
+class SplitFraming(object):
+    """
+    The framing SocketClientProtocol.dataReceived used before FrameBuffer.
+    """
+
+    def __init__(self):
+        self.received_data = b""
+
+    def feed(self, data):
+        self.received_data += data
+        datas = self.received_data.split(b"\0")
+        self.received_data = datas[-1]
+        return [data_bytes.decode('utf-8') for data_bytes in datas[:-1]]
+
+def run(rooms = 20000, chunk_size = 1024):
+    stream = (payloads.rm_list(rooms) + "\0" + payloads.u_count(1, 2) + "\0").encode("utf-8")
+    chunks = [stream[i:i + chunk_size] for i in range(0, len(stream), chunk_size)]
+    print("stream %d bytes in %d chunks of %d bytes" % (len(stream), len(chunks), chunk_size))
+    for name, framing in (("split", SplitFraming()), ("framebuffer", FrameBuffer())):
+        frames = []
+        start = time.perf_counter()
+        for chunk in chunks:
+            frames.extend(framing.feed(chunk))
+        elapsed = time.perf_counter() - start
+        print("%-12s %8.1f ms  %d frames" % (name, elapsed * 1000, len(frames)))
+    return
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:]]
+    run(*args)
@@ -0,0 +1,225 @@
+# -*- coding:utf-8 -*-
+'''
+Created on 2026-10-18
+
+Drive many simulated SmartFoxClient sessions against a stand-in server that
+replays canned SmartFoxServer responses.
+
+Every session connects, runs verChk, login, getRmList and joinRoom, does a
+few roundTripBench calls and then a closed loop of sendXtMessage requests
+cycling through the xml, json and str modes. The server only looks at the
+action of each request and writes back pre-encoded frames, so what is being
+measured is the client side parser and dispatcher.
+
+    python bench/loadtest.py --sessions 500 --messages 100
+    python bench/loadtest.py server --port 9339
+    python bench/loadtest.py client --port 9339 --sessions 1000
+'''
+
+import re
+import time
+import asyncio
+import argparse
+import tracemalloc
+import payloads
+from it.gotoandplay.smartfoxclient import SmartFoxClient
+from it.gotoandplay.smartfoxclient.sfsevent import SFSEvent
+
+XT_MODES = (SmartFoxClient.XTMSG_TYPE_XML, SmartFoxClient.XTMSG_TYPE_JSON, SmartFoxClient.XTMSG_TYPE_STR)
+
+class ReplayServer(object):
+    """
+    Stand-in SmartFoxServer answering each request with a canned frame.
+    """
+    action_re = re.compile(r"action='(\w+)'")
+
+    def __init__(self, rooms = 50, users = 20):
+        def frame(xml_str):
+            return xml_str.encode("utf-8") + b"\0"
+        self.responses = {
+            "verChk":frame(payloads.ver_ok()),
+            "login":frame(payloads.log_ok()),
+            "getRmList":frame(payloads.rm_list(rooms)),
+            "joinRoom":frame(payloads.join_ok(1, users)),
+            "roundTrip":frame(payloads.round_trip_res()),
+            "xtReq":frame(payloads.xt_res_xml()),
+        }
+        self.json_response = frame(payloads.xt_res_json())
+        self.str_response = frame(payloads.xt_res_str())
+        self.requests = 0
+
+    def reply(self, request):
+        self.requests += 1
+        if request.startswith(b"{"):
+            return self.json_response
+        if request.startswith(b"%"):
+            return self.str_response
+        match = self.action_re.search(request.decode("utf-8", "replace"))
+        if match:
+            return self.responses.get(match.group(1))
+        return None
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                request = await reader.readuntil(b"\0")
+                response = self.reply(request)
+                if response:
+                    writer.write(response)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        writer.close()
+        return
+
+    async def start(self, host, port):
+        return await asyncio.start_server(self.handle, host, port, limit = 1 << 20)
+
+class Session(object):
+    """
+    Scripted bot: one SmartFoxClient walking through the login flow.
+    """
+
+    def __init__(self, index, messages, rounds):
+        self.index = index
+        self.messages = messages
+        self.rounds = rounds
+        self.sfc = SmartFoxClient()
+        self.joined = asyncio.get_running_loop().create_future()
+        self.done = asyncio.get_running_loop().create_future()
+        self.connect_time = None
+        self.rtts = []
+        self.sent = 0
+        self.received = 0
+        for event_name in (SFSEvent.onConnection, SFSEvent.onLogin, SFSEvent.onRoomListUpdate,
+                           SFSEvent.onJoinRoom, SFSEvent.onRoundTripResponse, SFSEvent.onExtensionResponse):
+            self.sfc.addEventListener(event_name, self)
+
+    async def connect(self, host, port):
+        start = time.perf_counter()
+        await self.sfc.connectAsync(host, port)
+        self.connect_time = time.perf_counter() - start
+        return
+
+    def handleEvent(self, evt):
+        getattr(self, evt.getName())(evt)
+        return
+
+    def onConnection(self, evt):
+        self.sfc.login("bench", "bot%d" % self.index, "")
+        return
+
+    def onLogin(self, evt):
+        self.sfc.getRoomList()
+        return
+
+    def onRoomListUpdate(self, evt):
+        if self.sfc.activeRoomId == -1 and not self.sfc.changingRoom:
+            self.sfc.joinRoom(1)
+        return
+
+    def onJoinRoom(self, evt):
+        self.sfc.roundTripBench()
+        return
+
+    def onRoundTripResponse(self, evt):
+        self.rtts.append(evt.getParams()["elapsed"])
+        if len(self.rtts) < self.rounds:
+            self.sfc.roundTripBench()
+        elif not self.joined.done():
+            self.joined.set_result(True)
+        return
+
+    def start_stream(self):
+        self.send_next()
+        return
+
+    def send_next(self):
+        if self.sent >= self.messages:
+            if not self.done.done():
+                self.done.set_result(True)
+            return
+        mode = XT_MODES[self.sent % len(XT_MODES)]
+        if mode == SmartFoxClient.XTMSG_TYPE_STR:
+            params = [self.sent]
+        else:
+            params = {"seq":self.sent}
+        self.sent += 1
+        self.sfc.sendXtMessage("bench", "echo", params, sendType = mode)
+        return
+
+    def onExtensionResponse(self, evt):
+        self.received += 1
+        self.send_next()
+        return
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(pct / 100.0 * (len(values) - 1))))
+    return values[index]
+
+def print_latency(title, values):
+    print("%-14s p50 %8.3f ms  p90 %8.3f ms  p99 %8.3f ms  max %8.3f ms" % (
+        title, percentile(values, 50) * 1000, percentile(values, 90) * 1000,
+        percentile(values, 99) * 1000, max(values or [0]) * 1000))
+    return
+
+async def run_clients(host, port, sessions, messages, rounds, timeout):
+    tracemalloc.start()
+    base_memory = tracemalloc.get_traced_memory()[0]
+    bots = [Session(i, messages, rounds) for i in range(sessions)]
+    start = time.perf_counter()
+    await asyncio.gather(*[bot.connect(host, port) for bot in bots])
+    await asyncio.wait_for(asyncio.gather(*[bot.joined for bot in bots]), timeout)
+    setup_time = time.perf_counter() - start
+    session_memory = float(tracemalloc.get_traced_memory()[0] - base_memory) / sessions
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    for bot in bots:
+        bot.start_stream()
+    await asyncio.wait_for(asyncio.gather(*[bot.done for bot in bots]), timeout)
+    stream_time = time.perf_counter() - start
+    for bot in bots:
+        bot.sfc.disconnect()
+    # let the server side see EOF before the loop goes away
+    await asyncio.sleep(0.1)
+
+    received = sum([bot.received for bot in bots])
+    print("sessions %d, xt messages per session %d, roundtrips per session %d" % (sessions, messages, rounds))
+    print("login flow     %8.3f s for all sessions" % setup_time)
+    print_latency("connect", [bot.connect_time for bot in bots])
+    print_latency("roundTrip RTT", [rtt for bot in bots for rtt in bot.rtts])
+    print("xt throughput  %8.0f msg/s (%d responses in %.3f s)" % (received / stream_time, received, stream_time))
+    print("memory         %8.1f KB per session" % (session_memory / 1024))
+    return
+
+async def main(args):
+    if args.mode in ("both", "server"):
+        server = await ReplayServer(args.rooms, args.users).start(args.host, args.port)
+        port = server.sockets[0].getsockname()[1]
+        if args.mode == "server":
+            print("replay server on %s:%d" % (args.host, port))
+            await server.serve_forever()
+            return
+    else:
+        server = None
+        port = args.port
+    await run_clients(args.host, port, args.sessions, args.messages, args.rounds, args.timeout)
+    if server:
+        server.close()
+    return
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description = "SmartFoxClient load test")
+    parser.add_argument("mode", nargs = "?", default = "both", choices = ("both", "server", "client"))
+    parser.add_argument("--host", default = "127.0.0.1")
+    parser.add_argument("--port", type = int, default = 0)
+    parser.add_argument("--sessions", type = int, default = 200)
+    parser.add_argument("--messages", type = int, default = 60)
+    parser.add_argument("--rounds", type = int, default = 5)
+    parser.add_argument("--rooms", type = int, default = 50)
+    parser.add_argument("--users", type = int, default = 20)
+    parser.add_argument("--timeout", type = float, default = 120.0)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,59 @@
+# -*- coding:utf-8 -*-
+'''
+Created on 2026-10-18
+
+Canned SmartFoxServer frames shaped like the ones recorded from a live lobby.
+'''
+
+import sys, os
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+src_path = os.path.join(project_root, 'src')
+
+# Add 'src' to sys.path
+sys.path.insert(0, src_path)
+
+def room_xml(room_id, users = 0):
+    return ("<rm id='%d' priv='0' temp='0' game='1' ucnt='%d' scnt='0' lmb='0' maxu='6' maxs='0'>"
+            "<n><![CDATA[Table %d]]></n><vars /></rm>") % (room_id, users, room_id)
+
+def rm_list(n_rooms):
+    rooms = "".join([room_xml(i, i % 7) for i in range(1, n_rooms + 1)])
+    return "<msg t='sys'><body action='rmList' r='0'><rmList>" + rooms + "</rmList></body></msg>"
+
+def join_ok(room_id, n_users):
+    users = "".join([
+        ("<u i='%d' m='0' s='0' p='%d'><n><![CDATA[player%d]]></n>"
+         "<vars><var n='chips' t='n'><![CDATA[%d]]></var><var n='seat' t='n'><![CDATA[%d]]></var></vars></u>")
+        % (i, i, i, 1000 + i, i) for i in range(1, n_users + 1)])
+    return ("<msg t='sys'><body action='joinOK' r='%d'><pid id='1'/>"
+            "<vars><var n='blind' t='n'><![CDATA[20]]></var><var n='state' t='s'><![CDATA[wait]]></var></vars>"
+            "<uLs r='%d'>%s</uLs></body></msg>") % (room_id, room_id, users)
+
+def ver_ok():
+    return "<msg t='sys'><body action='apiOK' r='0'></body></msg>"
+
+def rnd_key(key = "a1b2c3"):
+    return "<msg t='sys'><body action='rndK' r='-1'><k>" + key + "</k></body></msg>"
+
+def log_ok(name = "bot", user_id = 1):
+    return "<msg t='sys'><body action='logOK' r='0'><login n='%s' id='%d' mod='0'/></body></msg>" % (name, user_id)
+
+def u_count(room_id, users):
+    return "<msg t='sys'><body action='uCount' r='%d' u='%d' s='0'></body></msg>" % (room_id, users)
+
+def pub_msg(room_id, user_id, text = "hello"):
+    return ("<msg t='sys'><body action='pubMsg' r='%d'><user id='%d' />"
+            "<txt><![CDATA[%s]]></txt></body></msg>") % (room_id, user_id, text)
+
+def round_trip_res():
+    return "<msg t='sys'><body action='roundTripRes' r='-1'></body></msg>"
+
+def xt_res_xml(cmd = "echo"):
+    data = "<dataObj><var n='_cmd' t='s'>%s</var><var n='seq' t='n'>1</var></dataObj>" % cmd
+    return "<msg t='xt'><body action='xtRes' r='-1'><![CDATA[" + data + "]]></body></msg>"
+
+def xt_res_json(cmd = "echo"):
+    return '{"t":"xt","b":{"r":-1,"o":{"_cmd":"%s","seq":1}}}' % cmd
+
+def xt_res_str(cmd = "echo"):
+    return "%xt%" + cmd + "%-1%1%"
@@ -0,0 +1,103 @@
+# -*- coding:utf-8 -*-
+'''
+Created on 2026-10-18
+
+Feed a lobby stream (pubMsg in 8 rooms, uCount for 50 rooms, some xtRes)
+to a client whose onExtensionResponse listener is slow, delivering
+events inline and through a ThreadEventPool under each overflow policy.
+
+"read" is the time handleMessage held the reading thread; with inline
+dispatch it includes every slow listener call. "out of order" counts
+pubMsg events that reached the listener behind a later one of the same
+room and must stay 0.
+
+    python bench/poolbench.py [frames] [slow listener ms]
+'''
+
+import sys
+import time
+import threading
+import payloads
+from it.gotoandplay.smartfoxclient import SmartFoxClient
+from it.gotoandplay.smartfoxclient.sfsevent import SFSEvent
+from it.gotoandplay.smartfoxclient.sfseventpool import ThreadEventPool, OVERFLOW_BLOCK, OVERFLOW_DROP_OLDEST, OVERFLOW_COALESCE
+
+class OrderListener(object):
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.last = {}
+        self.events = 0
+        self.outOfOrder = 0
+
+    def handleEvent(self, evt):
+        seq = int(evt.params["message"])
+        room = evt.params["roomId"]
+        with self.lock:
+            self.events += 1
+            if seq < self.last.get(room, -1):
+                self.outOfOrder += 1
+            self.last[room] = seq
+        return
+
+class SlowListener(object):
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.events = 0
+
+    def handleEvent(self, evt):
+        time.sleep(self.delay)
+        self.events += 1
+        return
+
+def build_stream(count):
+    frames = []
+    for i in range(count):
+        if i % 3 == 0:
+            frames.append(payloads.pub_msg(1 + i % 8, 1, str(i)))
+        elif i % 3 == 1:
+            frames.append(payloads.u_count(1 + i % 50, i % 7))
+        elif i % 12 == 2:
+            frames.append(payloads.xt_res_json())
+        else:
+            frames.append(payloads.u_count(1 + i % 5, i % 7))
+    return frames
+
+def run(count = 20000, slow_ms = 0.2):
+    frames = build_stream(count)
+    print("%-12s %9s %9s %9s %9s %9s %9s %9s %9s" % ("dispatch", "read s", "total s", "delivered", "dropped",
+                                                     "coalesced", "max depth", "wait ms", "out order"))
+    for overflow in (None, OVERFLOW_BLOCK, OVERFLOW_DROP_OLDEST, OVERFLOW_COALESCE):
+        sfc = SmartFoxClient()
+        sfc.handleMessage(payloads.rm_list(50))
+        sfc.handleMessage(payloads.join_ok(1, 20))
+        order = OrderListener()
+        slow = SlowListener(slow_ms / 1000.0)
+        sfc.addEventListener(SFSEvent.onPublicMessage, order)
+        sfc.addEventListener(SFSEvent.onUserCountChange, SlowListener(0))
+        sfc.addEventListener(SFSEvent.onExtensionResponse, slow)
+        if overflow:
+            sfc.setEventPool(ThreadEventPool(workers = 4, maxQueue = 256, overflow = overflow))
+        handle = sfc.handleMessage
+        start = time.perf_counter()
+        for frame in frames:
+            handle(frame)
+        read = time.perf_counter() - start
+        if overflow:
+            sfc.eventPool.drain()
+        total = time.perf_counter() - start
+        stats = sfc.getDispatchStats()
+        if overflow:
+            print("%-12s %9.3f %9.3f %9d %9d %9d %9d %9.2f %9d" % (overflow, read, total, stats["delivered"],
+                                                                   stats["dropped"], stats["coalesced"],
+                                                                   stats["maxQueueDepth"], stats["queueWaitAvgMs"],
+                                                                   order.outOfOrder))
+            sfc.setEventPool(None)
+        else:
+            print("%-12s %9.3f %9.3f %9s %9s %9s %9s %9s %9d" % ("inline", read, total, "-", "-", "-", "-", "-",
+                                                                 order.outOfOrder))
+    return
+
+if __name__ == "__main__":
+    run(*[float(arg) if i else int(arg) for i, arg in enumerate(sys.argv[1:3])])
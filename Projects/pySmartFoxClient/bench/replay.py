@@ -0,0 +1,205 @@
+# -*- coding:utf-8 -*-
+'''
+Created on 2026-10-18
+
+Replay a frame capture (see SmartFoxClient.setFrameCapture) through
+SmartFoxClient.handleMessage without a socket, and report frames/s, time
+spent in each SysHandler handle_* and ExtHandler path, and memory.
+
+A first pass is run bare to measure throughput. A second wraps every
+handler to count calls, time and net allocated blocks per action, and an
+optional third runs under tracemalloc for peak and total allocations.
+With --min-fps the script exits non-zero when throughput drops below it,
+so it can guard against regressions in CI.
+
+    python bench/replay.py --make-sample lobby.cap
+    python bench/replay.py lobby.cap --repeat 5 --tracemalloc
+    python bench/replay.py lobby.cap --min-fps 50000
+'''
+
+import gc
+import sys
+import time
+import argparse
+import tracemalloc
+import payloads
+from it.gotoandplay.smartfoxclient import SmartFoxClient
+from it.gotoandplay.smartfoxclient.sfsevent import SFSEvent
+from it.gotoandplay.utils.xmlparser import PARSER_EXPAT, PARSER_MINIDOM
+from it.gotoandplay.utils.framecapture import FrameCapture, read_capture
+
+class CountingListener(object):
+
+    def __init__(self):
+        self.events = 0
+
+    def handleEvent(self, evt):
+        self.events += 1
+        return
+
+class HandlerStats(object):
+    """
+    Calls, wall time and net allocated blocks of one handler path.
+    """
+    # blocks the timing itself holds while counting, see calibrate()
+    overhead = 0
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.blocks = 0
+
+    def wrap(self, func):
+        perf_counter = time.perf_counter
+        getallocatedblocks = sys.getallocatedblocks
+        def timed(*args):
+            blocks = getallocatedblocks()
+            start = perf_counter()
+            try:
+                return func(*args)
+            finally:
+                self.seconds += perf_counter() - start
+                self.blocks += getallocatedblocks() - blocks - HandlerStats.overhead
+                self.calls += 1
+        return timed
+
+    @staticmethod
+    def calibrate():
+        HandlerStats.overhead = 0
+        stats = HandlerStats()
+        noop = stats.wrap(lambda: None)
+        for _ in range(1000):
+            noop()
+        HandlerStats.overhead = round(float(stats.blocks) / stats.calls)
+        return
+
+def event_names():
+    return [value for name, value in vars(SFSEvent).items()
+            if name.startswith("on") and isinstance(value, str)]
+
+def build_client(parser, selective, listen):
+    sfc = SmartFoxClient(xmlParser = parser)
+    sfc.setSelectiveDecoding(selective)
+    listener = CountingListener()
+    if listen:
+        # with a listener on every event the handlers do their full work
+        for name in event_names():
+            sfc.addEventListener(name, listener)
+    return sfc, listener
+
+def instrument(sfc):
+    """
+    Wrap the SysHandler action table and ExtHandler.handleMessage, and
+    return {"sys:<action>" or "xt:<type>": HandlerStats}.
+    """
+    HandlerStats.calibrate()
+    stats = {}
+    sys_handler = sfc.messageHandlers["sys"]
+    for action, func in list(sys_handler.handlers.items()):
+        stats["sys:" + action] = HandlerStats()
+        sys_handler.handlers[action] = stats["sys:" + action].wrap(func)
+    ext_handler = sfc.messageHandlers["xt"]
+    ext_handle = ext_handler.handleMessage
+    ext_paths = {}
+    for obj_type in (SmartFoxClient.XTMSG_TYPE_XML, SmartFoxClient.XTMSG_TYPE_JSON, SmartFoxClient.XTMSG_TYPE_STR):
+        stats["xt:" + obj_type] = HandlerStats()
+        ext_paths[obj_type] = stats["xt:" + obj_type].wrap(ext_handle)
+    def handleMessage(msg_obj, obj_type = None):
+        return ext_paths[obj_type](msg_obj, obj_type)
+    ext_handler.handleMessage = handleMessage
+    return stats
+
+def replay(sfc, frames, repeat):
+    handle = sfc.handleMessage
+    gc.collect()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for frame in frames:
+            handle(frame)
+    return time.perf_counter() - start
+
+def make_sample(path, rounds = 200, rooms = 50, users = 20):
+    """
+    Write a synthetic lobby session shaped like loadtest.ReplayServer's.
+    """
+    capture = FrameCapture(path)
+    capture.record([payloads.ver_ok(), payloads.rnd_key(), payloads.log_ok(),
+                    payloads.rm_list(rooms), payloads.join_ok(1, users)])
+    for i in range(rounds):
+        frames = [payloads.pub_msg(1, 1 + i % users, "chat line %d" % i),
+                  payloads.u_count(1 + i % rooms, i % 7)]
+        if i % 4 == 0:
+            frames.extend([payloads.xt_res_xml(), payloads.xt_res_json(), payloads.xt_res_str()])
+        if i % 20 == 0:
+            frames.append(payloads.round_trip_res())
+        capture.record(frames)
+    capture.close()
+    print("wrote %d frames, %d bytes to %s" % (capture.frames, capture.bytes, path))
+    return
+
+def run(path, repeat = 3, parser = PARSER_EXPAT, selective = False, listen = True,
+        trace = False, min_fps = 0.0):
+    frames = [frame for timestamp, frame in read_capture(path)]
+    if not frames:
+        print("%s holds no frames" % path)
+        return 1
+    total = len(frames) * repeat
+    print("%s: %d frames, %d chars; parser %s, selective decoding %s, listeners %s" % (
+        path, len(frames), sum(len(frame) for frame in frames), parser,
+        "on" if selective else "off", "on" if listen else "off"))
+
+    sfc, listener = build_client(parser, selective, listen)
+    elapsed = replay(sfc, frames, repeat)
+    fps = total / elapsed
+    print("%d frames in %.3f s, %.0f frames/s, %d events" % (total, elapsed, fps, listener.events))
+
+    sfc, listener = build_client(parser, selective, listen)
+    stats = instrument(sfc)
+    replay(sfc, frames, repeat)
+    rows = sorted([(s.seconds, key, s) for key, s in stats.items() if s.calls], reverse = True)
+    handled = sum(s.seconds for seconds, key, s in rows)
+    print("%-18s %9s %10s %10s %7s %12s" % ("handler", "calls", "total ms", "us/call", "share", "blocks/call"))
+    for seconds, key, s in rows:
+        print("%-18s %9d %10.1f %10.2f %6.1f%% %12.2f" % (key, s.calls, seconds * 1000, seconds / s.calls * 1e6,
+                                                        seconds / handled * 100 if handled else 0.0,
+                                                        float(s.blocks) / s.calls))
+    skipped = sfc.getDecodeStats()["framesSkipped"]
+    if skipped:
+        print("%d frames skipped unparsed" % skipped)
+
+    if trace:
+        sfc, listener = build_client(parser, selective, listen)
+        tracemalloc.start()
+        replay(sfc, frames, repeat)
+        current, peak = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        print("tracemalloc: peak %.1f KiB, retained %.1f KiB" % (peak / 1024.0, current / 1024.0))
+        for stat in snapshot.statistics("lineno")[:5]:
+            print("    %s" % stat)
+
+    if min_fps and fps < min_fps:
+        print("FAIL: %.0f frames/s is below the %.0f frames/s floor" % (fps, min_fps))
+        return 1
+    return 0
+
+def main():
+    parser = argparse.ArgumentParser(description = "Replay a SmartFoxClient frame capture")
+    parser.add_argument("capture")
+    parser.add_argument("--make-sample", action = "store_true",
+                        help = "write a synthetic capture to the given path instead of replaying")
+    parser.add_argument("--repeat", type = int, default = 3)
+    parser.add_argument("--parser", default = PARSER_EXPAT, choices = (PARSER_EXPAT, PARSER_MINIDOM))
+    parser.add_argument("--selective", action = "store_true", help = "turn selective decoding on")
+    parser.add_argument("--no-listeners", action = "store_true", help = "replay with no event listeners")
+    parser.add_argument("--tracemalloc", action = "store_true")
+    parser.add_argument("--min-fps", type = float, default = 0.0)
+    args = parser.parse_args()
+    if args.make_sample:
+        make_sample(args.capture)
+        return 0
+    return run(args.capture, args.repeat, args.parser, args.selective, not args.no_listeners,
+               args.tracemalloc, args.min_fps)
+
+if __name__ == "__main__":
+    sys.exit(main())
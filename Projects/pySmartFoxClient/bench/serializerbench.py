@@ -0,0 +1,100 @@
+# -*- coding:utf-8 -*-
+'''
+Created on 2026-10-18
+
+Compare the one pass SFSObjectSerializer and its decoder with the string
+concatenating serializer it replaced and with the compact json wire mode.
+The old serializer drops ints and lists, so on the table payload it sends
+much less than the message really holds. The profile payloads only use
+types it keeps; profile* is the same shape with 2000 fields, where its
+recursive string building turns quadratic.
+
+    python bench/serializerbench.py [repeat]
+'''
+
+import sys
+import json
+import time
+import payloads
+from it.gotoandplay.utils.xmlparser import get_parser
+from it.gotoandplay.smartfoxclient.util.sfsobjectserializer import SFSObjectSerializer
+
+def legacy_obj2xml(ao, depth, nodeName, xmlData = None):
+    if xmlData is None:
+        xmlData = ""
+    if depth == 0:
+        xmlData += "<dataObj>"
+    else:
+        xmlData += "<obj o='" + nodeName + "' t='a'>"
+    for key, o in ao.items():
+        if not o:
+            xmlData += "<var n='" + str(key) + "' t='x' />"
+        elif isinstance(o, dict):
+            xmlData = legacy_obj2xml(o, depth + 1, key, xmlData)
+            xmlData += "</obj>"
+        elif isinstance(o, float):
+            xmlData += "<var n='" + key + "' t='n'>" + str(o) + "</var>"
+        elif isinstance(o, str):
+            for s in "><&'\\\n\t\r":
+                o = o.replace(s, "")
+            xmlData += "<var n='" + key + "' t='s'>" + o + "</var>"
+        elif isinstance(o, bool):
+            xmlData += "<var n='" + key + "' t='b'>" + ("1" if o else "0") + "</var>"
+    if depth == 0:
+        xmlData += "</dataObj>"
+    return xmlData
+
+def table_state(seats = 9):
+    return {
+        "name":"bench",
+        "cmd":"state",
+        "param":{
+            "table":{"id":12, "blind":20.0, "pot":1530, "stage":"turn", "open":True},
+            "board":["Ah", "Kd", "7c", "2s"],
+            "seats":[{"seat":i, "name":"player%d" % i, "chips":1000 + i * 37, "bet":i * 10,
+                      "folded":i % 3 == 0, "cards":["Xx", "Xx"]} for i in range(seats)],
+            "note":"<raise> & 'call'",
+        },
+    }
+
+def profile_state(fields = 40):
+    # only str/float/bool/dict values, which the old serializer keeps
+    return {
+        "name":"bench",
+        "cmd":"profile",
+        "param":dict(("field%d" % i, {"label":"value %d" % i, "score":i * 1.5, "on":i % 2 == 1})
+                     for i in range(fields)),
+    }
+
+def timeit(func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+def run(repeat = 5000):
+    parse = get_parser()
+    print("%-8s %-12s %8s %12s %12s" % ("payload", "format", "bytes", "encode us", "decode us"))
+    payload_list = [
+        ("profile", profile_state(), repeat),
+        ("profile*", profile_state(2000), max(1, repeat // 200)),
+        ("table", table_state(), repeat),
+    ]
+    for title, obj, count in payload_list:
+        xml_str = SFSObjectSerializer.serialize(obj)
+        legacy_str = legacy_obj2xml(obj, 0, "", None)
+        json_str = json.dumps(obj, separators = (",", ":"))
+        assert SFSObjectSerializer.deserialize(xml_str) == obj
+        assert json.loads(json_str) == obj
+        rows = [
+            ("legacy xml", legacy_str, lambda: legacy_obj2xml(obj, 0, "", None), lambda: parse(legacy_str)),
+            ("xml", xml_str, lambda: SFSObjectSerializer.serialize(obj), lambda: SFSObjectSerializer.deserialize(xml_str)),
+            ("json", json_str, lambda: json.dumps(obj, separators = (",", ":")), lambda: json.loads(json_str)),
+        ]
+        for name, payload, encode, decode in rows:
+            print("%-8s %-12s %8d %12.1f %12.1f" % (title, name, len(payload.encode("utf-8")),
+                                                  timeit(encode, count), timeit(decode, count)))
+    return
+
+if __name__ == "__main__":
+    run(*[int(arg) for arg in sys.argv[1:2]])
@@ -0,0 +1,97 @@
+# -*- coding:utf-8 -*-
+'''
+Created on 2026-10-18
+
+Time the minidom XMLObj backend on a large rmList frame: the eager
+XMLObj that wrapped every descendant up front and searched all
+descendants on attribute access, against the lazy, indexed one.
+
+    python bench/xmlobjbench.py [rooms] [repeat]
+'''
+
+import gc
+import sys
+import time
+import payloads
+from xml.dom import minidom
+from it.gotoandplay.utils.xmllib import XMLBase, XMLObj
+from it.gotoandplay.utils.xmlparser import PARSER_MINIDOM
+from it.gotoandplay.smartfoxclient import SmartFoxClient
+
+class EagerXMLObj(XMLObj):
+    """
+    XMLObj as it used to be: every descendant wrapped at construction,
+    lookups through getElementsByTagName, xml_attr rebuilt on every read.
+    """
+    xml_attr = XMLBase.xml_attr
+
+    def __init__(self, root_element, xml_dom):
+        XMLObj.__init__(self, root_element, xml_dom)
+        self.my_index = {}
+        for child_e in root_element.childNodes:
+            if child_e.nodeType == child_e.ELEMENT_NODE:
+                xml_obj = EagerXMLObj(child_e, xml_dom)
+                if child_e.nodeName in self.__dict__:
+                    self.__dict__[child_e.nodeName].append(xml_obj)
+                else:
+                    setattr(self, child_e.nodeName, xml_obj)
+
+    @classmethod
+    def build_from_str(cls, xml_str):
+        dom = minidom.parseString(xml_str)
+        return cls(dom.documentElement, dom)
+
+    def __getattr__(self, attr):
+        if attr.startswith("__"):
+            raise AttributeError(attr)
+        elements = self.get_elements(attr)
+        if elements:
+            element = EagerXMLObj(elements[0].root_element, self.xml_dom)
+            for em in elements[1:]:
+                element.my_brothers.append(EagerXMLObj(em.root_element, self.xml_dom))
+            return element
+        return None
+
+def read_rooms(xml_obj):
+    # the same walk SysHandler.handle_rmList does
+    count = 0
+    for room in xml_obj.body.rmList.rm:
+        room.xml_attr.get("id")
+        room.n.get_data()
+        if room.vars and room.vars.var:
+            pass
+        count += 1
+    return count
+
+def timeit(func, repeat):
+    # minidom trees are full of reference cycles; keep the collector out
+    # of the timed part so one case does not pay for another's garbage
+    total = 0.0
+    for _ in range(repeat):
+        gc.collect()
+        gc.disable()
+        start = time.perf_counter()
+        func()
+        total += time.perf_counter() - start
+        gc.enable()
+    return total / repeat * 1000
+
+def run(rooms = 10000, repeat = 3):
+    frame = payloads.rm_list(rooms)
+    dom_ms = timeit(lambda: minidom.parseString(frame), repeat)
+    print("rmList with %d rooms, %d bytes; minidom parse alone %.1f ms" % (rooms, len(frame), dom_ms))
+    print("%-8s %12s %12s %12s" % ("XMLObj", "build ms", "walk ms", "handle ms"))
+    for name, cls in (("eager", EagerXMLObj), ("lazy", XMLObj)):
+        build_ms = timeit(lambda: cls.build_from_str(frame), repeat)
+        xml_obj = cls.build_from_str(frame)
+        assert read_rooms(xml_obj) == rooms
+        walk_ms = timeit(lambda: read_rooms(cls.build_from_str(frame)), repeat) - build_ms
+        sfc = SmartFoxClient(xmlParser = PARSER_MINIDOM)
+        sfc.parseXml = cls.build_from_str
+        handle_ms = timeit(lambda: sfc.handleMessage(frame), repeat)
+        assert len(sfc.getAllRooms()) == rooms
+        print("%-8s %12.1f %12.1f %12.1f" % (name, build_ms, walk_ms, handle_ms))
+    return
+
+if __name__ == "__main__":
+    run(*[int(arg) for arg in sys.argv[1:3]])
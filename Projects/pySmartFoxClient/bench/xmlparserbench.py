@@ -0,0 +1,41 @@
+# -*- coding:utf-8 -*-
+'''
+Created on 2026-10-18
+
+Compare the expat XMLNode backend with the minidom XMLObj fallback on
+rmList/joinOK frames, both raw parsing and a full SysHandler pass.
+
+    python bench/xmlparserbench.py [rooms] [users] [repeat]
+'''
+
+import sys
+import time
+import payloads
+from it.gotoandplay.smartfoxclient import SmartFoxClient
+from it.gotoandplay.utils.xmlparser import get_parser, PARSER_EXPAT, PARSER_MINIDOM
+
+def timeit(func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat
+
+def run(rooms = 2000, users = 200, repeat = 20):
+    frames = {
+        "rmList": payloads.rm_list(rooms),
+        "joinOK": payloads.join_ok(1, users),
+    }
+    print("%-8s %-8s %10s %12s %10s" % ("frame", "backend", "bytes", "parse ms", "handle ms"))
+    for frame_name, frame in frames.items():
+        for backend in (PARSER_MINIDOM, PARSER_EXPAT):
+            parse = get_parser(backend)
+            sfc = SmartFoxClient(xmlParser = backend)
+            sfc.handleMessage(frames["rmList"])
+            parse_time = timeit(lambda: parse(frame), repeat)
+            handle_time = timeit(lambda: sfc.handleMessage(frame), repeat)
+            print("%-8s %-8s %10d %12.3f %10.3f" % (frame_name, backend, len(frame), parse_time * 1000, handle_time * 1000))
+    return
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:]]
+    run(*args)
@@ -5,16 +5,26 @@ Created on 2010-11-8
 @author: leenjewel
 '''
 
+import re
 import time
 import json
+from time import perf_counter_ns
 from xml.parsers.expat import ExpatError
-from it.gotoandplay.utils.xmlsocket import XMLSocket
+from it.gotoandplay.utils.xmlsocket import XMLSocket, AsyncXMLSocket
 from it.gotoandplay.utils.xmllib import XMLObj
+from it.gotoandplay.utils.xmlparser import get_parser, PARSER_EXPAT
+from it.gotoandplay.utils.framebuffer import DEFAULT_MAX_FRAME_SIZE
+from it.gotoandplay.utils.sendqueue import SendQueue, DEFAULT_BATCH_BYTES
+from it.gotoandplay.utils.framecapture import FrameCapture
 from it.gotoandplay.smartfoxclient.sfseventdispatcher import SFSEventDispatcher
 from it.gotoandplay.smartfoxclient.handlers.syshandler import SysHandler
 from it.gotoandplay.smartfoxclient.handlers.exthandler import ExtHandler
 from it.gotoandplay.smartfoxclient.sfsevent import SFSEvent
+from it.gotoandplay.smartfoxclient.sfsstats import SFSStats, DEFAULT_RTT_SAMPLES, DEFAULT_SAMPLE_EVERY
+from it.gotoandplay.smartfoxclient.data.roomlist import RoomList
+from it.gotoandplay.smartfoxclient.data.buddylist import BuddyList
 from it.gotoandplay.smartfoxclient.util.sfsobjectserializer import SFSObjectSerializer
+from it.gotoandplay.smartfoxclient.util.variablebatcher import VariableBatcher
 
 class SmartFoxClient(SFSEventDispatcher):
     
@@ -35,11 +45,20 @@ class SmartFoxClient(SFSEventDispatcher):
     XTMSG_TYPE_STR = "str"
     XTMSG_TYPE_JSON = "json"
     
-    def __init__(self, debug = False):
+    # header peek: only the start of a frame is scanned
+    PEEK_SIZE = 256
+    peekXmlHeader = re.compile(r"<msg t=['\"](\w+)['\"]").match
+    peekXmlAction = re.compile(r"action=['\"](\w+)['\"]").search
+    peekJsonHeader = re.compile(r"\{\s*\"t\"\s*:\s*\"(\w+)\"").match
+    
+    msgTypes = {MSG_XML:XTMSG_TYPE_XML, MSG_JSON:XTMSG_TYPE_JSON, MSG_STR:XTMSG_TYPE_STR}
+    
+    def __init__(self, debug = False, xmlParser = PARSER_EXPAT):
         self.debug = debug
+        super(SmartFoxClient, self).__init__()
+        self.setXmlParser(xmlParser)
         self.initialize()
         self.setupMessageHandlers()
-        super(SmartFoxClient, self).__init__()
     
     def initialize(self):
         self.connected = False
@@ -50,10 +69,23 @@ class SmartFoxClient(SFSEventDispatcher):
         self.minVersion = "5"
         self.subVersion = "8"
         self.benchStartTime = None
-        self.buddyList = []
+        self.buddyList = BuddyList()
         self.messageHandlers = {}
-        self.roomList = {}
+        self.roomList = RoomList()
         self.myBuddyVars = {}
+        self.myUserId = -1
+        self.myUserName = ""
+        self.maxFrameSize = DEFAULT_MAX_FRAME_SIZE
+        self.sendBatchWindow = None
+        self.sendBatchBytes = DEFAULT_BATCH_BYTES
+        self.xtSendType = SmartFoxClient.XTMSG_TYPE_XML
+        self.selectiveDecoding = True
+        self.framesReceived = 0
+        self.framesSkipped = 0
+        self.skippedActions = {}
+        self.frameCapture = None
+        self.stats = SFSStats()
+        self.variableBatcher = VariableBatcher(self)
     
     def setupMessageHandlers(self):
         self.messageHandlers["sys"] = SysHandler(self)
@@ -61,11 +93,52 @@ class SmartFoxClient(SFSEventDispatcher):
         return
     
     def connect(self, server_host, server_port):
-        self.socket_client = XMLSocket()
+        self.socket_client = XMLSocket(self.maxFrameSize, self.frameCapture)
+        self.socket_client.setBatching(self.sendBatchWindow, self.sendBatchBytes)
         self.socket_client.addEventListener(self)
         self.socket_client.connect(server_host, server_port)
         return
     
+    async def connectAsync(self, server_host, server_port, loop = None):
+        """
+        Connect over asyncio; many clients can await this on the same loop.
+        """
+        self.socket_client = AsyncXMLSocket(loop, self.maxFrameSize, self.frameCapture)
+        self.socket_client.setBatching(self.sendBatchWindow, self.sendBatchBytes)
+        self.socket_client.addEventListener(self)
+        await self.socket_client.connect(server_host, server_port)
+        if self.eventPool is not None and hasattr(self.eventPool, "setFlowControl"):
+            transport = self.socket_client.socket_client.transport
+            self.eventPool.setFlowControl(transport.pause_reading, transport.resume_reading)
+        return
+    
+    def disconnect(self):
+        self.variableBatcher.discard()
+        client = getattr(self, "socket_client", None)
+        if client is not None:
+            client.close()
+        return
+    
+    def setFrameCapture(self, path):
+        """
+        Record every inbound frame with its receive time to path (appended
+        to when it exists) for bench/replay.py. None stops recording; it
+        takes effect on the next connect.
+        """
+        if self.frameCapture is not None:
+            self.frameCapture.close()
+            self.frameCapture = None
+        if path is not None:
+            self.frameCapture = FrameCapture(path)
+        return
+    
+    def setXmlParser(self, backend):
+        """
+        Select the parser used for inbound xml ("expat" or "minidom").
+        """
+        self.parseXml = get_parser(backend)
+        return
+    
     def setConnected(self, connected):
         self.connected = connected
         return
@@ -75,17 +148,138 @@ class SmartFoxClient(SFSEventDispatcher):
             print(data)
         return
     
+    def setSendBatching(self, window = 0.005, maxBytes = DEFAULT_BATCH_BYTES):
+        """
+        Coalesce outbound messages sent within window seconds (or until
+        maxBytes are pending) into one socket write. window None disables it.
+        """
+        self.sendBatchWindow = window
+        self.sendBatchBytes = maxBytes
+        if getattr(self, "socket_client", None):
+            self.socket_client.setBatching(window, maxBytes)
+        return
+    
+    def flush(self):
+        self.variableBatcher.flush()
+        if getattr(self, "socket_client", None):
+            self.socket_client.flush()
+        return
+    
+    def setVariableCoalescing(self, window = 0.016):
+        """
+        Merge room, user and buddy variable changes made within window
+        seconds into one message per target. window None sends each
+        call's changes right away (they are always diffed against the
+        variables the client holds).
+        """
+        self.variableBatcher.flush()
+        self.variableBatcher.window = window
+        return
+    
+    def getVariableStats(self):
+        return self.variableBatcher.getStats()
+    
+    def getSendStats(self):
+        if not getattr(self, "socket_client", None):
+            # nothing has been sent before connect()
+            return SendQueue(None, None).get_stats()
+        return self.socket_client.send_queue.get_stats()
+    
     def send(self, header, action, from_room, message = None):
-        xml_msg = self.makeXmlHeader(header)
-        xml_msg["body"] = None
-        xml_msg.body.set_attribute({"action":action, "r":str(from_room)})
-        if message:
-            xml_msg.body += message
-        self.socket_client.sendXMLObj(xml_msg)
-        self.print_debug("[Sending] "+xml_msg.to_string())
+        xml_msg = self.makeXmlMessage(header, action, from_room, message)
+        self.socket_client.sendMessage(xml_msg)
+        if self.stats is not None:
+            self.stats.recordOut(SmartFoxClient.XTMSG_TYPE_XML, xml_msg)
+        if self.debug:
+            self.print_debug("[Sending] "+xml_msg)
+        return
+    
+    def setSelectiveDecoding(self, enabled):
+        """
+        With selective decoding on (the default) frames are peeked at before
+        parsing and dropped when their handler would only dispatch an event
+        nobody listens to.
+        """
+        self.selectiveDecoding = enabled
         return
     
+    def peekFrame(self, data):
+        """
+        Return (header, action) read from the start of a frame without
+        parsing it; either may be None when it cannot be told cheaply.
+        """
+        charT = data[0]
+        if charT == SmartFoxClient.MSG_XML:
+            match = self.peekXmlHeader(data, 0, self.PEEK_SIZE)
+            if match is None:
+                return None, None
+            action = self.peekXmlAction(data, match.end(), self.PEEK_SIZE)
+            return match.group(1), action and action.group(1)
+        elif charT == SmartFoxClient.MSG_JSON:
+            match = self.peekJsonHeader(data, 0, self.PEEK_SIZE)
+            return match and match.group(1), None
+        elif charT == SmartFoxClient.MSG_STR:
+            return data[1:data.find(SmartFoxClient.MSG_STR, 1)], None
+        return None, None
+    
+    def canSkipFrame(self, data):
+        header, action = self.peekFrame(data)
+        handler = self.messageHandlers.get(header)
+        if handler is None:
+            return False
+        if handler.canSkip(action):
+            key = header + ":" + str(action)
+            self.skippedActions[key] = self.skippedActions.get(key, 0) + 1
+            return True
+        return False
+    
+    def getDecodeStats(self):
+        return {
+            "framesReceived":self.framesReceived,
+            "framesSkipped":self.framesSkipped,
+            "framesParsed":self.framesReceived - self.framesSkipped,
+            "skippedActions":dict(self.skippedActions),
+        }
+    
+    def setStatsEnabled(self, enabled, rttSamples = DEFAULT_RTT_SAMPLES, sampleEvery = DEFAULT_SAMPLE_EVERY):
+        """
+        Turn the counters and latency histograms read by getStats on (the
+        default) or off. Turning them on starts from zero; latencies are
+        taken for one frame in sampleEvery (1 times every frame).
+        """
+        if enabled:
+            self.stats = SFSStats(rttSamples, sampleEvery)
+        else:
+            self.stats = None
+        self.sampledStats = None
+        return
+    
+    def getStats(self):
+        """
+        Return frames and bytes in and out per message type, parse and
+        handler latency per action, listener latency per event, the last
+        roundTripBench samples, and the decode, dispatch, variable and
+        send batching stats. Safe to call before connect().
+        """
+        stats = {}
+        if self.stats is not None:
+            stats = self.stats.getStats()
+        stats["decode"] = self.getDecodeStats()
+        stats["dispatch"] = self.getDispatchStats()
+        stats["variables"] = self.getVariableStats()
+        stats["send"] = self.getSendStats()
+        return stats
+    
     def handleMessage(self, data):
+        self.framesReceived += 1
+        stats = self.stats
+        if stats is not None:
+            # sampledStats is what the parse, handler and listener timers
+            # below look at, so unsampled frames skip them entirely
+            self.sampledStats = stats if stats.recordIn(self.msgTypes.get(data[0]), data) else None
+        if self.selectiveDecoding and self.canSkipFrame(data):
+            self.framesSkipped += 1
+            return
         charT = data[0]
         if charT == SmartFoxClient.MSG_XML:
             self.xmlReceived(data)
@@ -96,37 +290,66 @@ class SmartFoxClient(SFSEventDispatcher):
         return
     
     def xmlReceived(self, xml_str):
+        stats = self.sampledStats
+        start = perf_counter_ns()
         try:
-            xml_obj = XMLObj.build_from_str(xml_str)
+            xml_obj = self.parseXml(xml_str)
         except ExpatError:
             self.print_debug("[ERROR] XML Error \n\t" + xml_str)
             return
         header_id = xml_obj.xml_attr.get("t")
-        if header_id and header_id in self.messageHandlers:
-            handler = self.messageHandlers[header_id]
-            handler.handleMessage(xml_obj)
+        handler = self.messageHandlers.get(header_id)
+        if handler is None:
+            return
+        if stats is None:
+            handler.handleMessage(xml_obj, SmartFoxClient.XTMSG_TYPE_XML)
+            return
+        parsed = perf_counter_ns()
+        body = xml_obj.body
+        key = header_id + ":" + str(body and body.xml_attr.get("action"))
+        handler.handleMessage(xml_obj, SmartFoxClient.XTMSG_TYPE_XML)
+        stats.recordMessage(key, parsed - start, perf_counter_ns() - parsed)
         return
     
     def jsonReceived(self, json_str):
+        start = perf_counter_ns()
         try:
             jso = json.loads(json_str)
             handlerId = jso.get("t")
             handler = self.messageHandlers.get(handlerId)
             if handler:
+                parsed = perf_counter_ns()
                 handler.handleMessage(jso.get("b"), SmartFoxClient.XTMSG_TYPE_JSON)
+                if self.sampledStats is not None:
+                    self.sampledStats.recordMessage(handlerId + ":json", parsed - start, perf_counter_ns() - parsed)
         except ValueError:
             self.print_debug("Json Value Error")
         return
     
     def strReceived(self, string):
-        params = string.split(SmartFoxClient.MSG_STR)
+        start = perf_counter_ns()
+        params = string[1:-1].split(SmartFoxClient.MSG_STR)
         handlerId = params[0]
         handler = self.messageHandlers.get(handlerId)
         if handler:
             h_params = [p for p in params[1:]]
+            parsed = perf_counter_ns()
             handler.handleMessage(h_params, SmartFoxClient.XTMSG_TYPE_STR)
+            if self.sampledStats is not None:
+                self.sampledStats.recordMessage(handlerId + ":str", parsed - start, perf_counter_ns() - parsed)
         return
     
+    def makeXmlMessage(self, header, action, from_room, message = None):
+        """
+        Build the <msg t=..><body action=.. r=..> envelope from a template.
+        message may be an XMLObj or an xml string.
+        """
+        if message is None:
+            message = ""
+        elif not isinstance(message, str):
+            message = message.to_string()
+        return "<msg t='" + header + "'><body action='" + action + "' r='" + str(from_room) + "'>" + message + "</body></msg>"
+    
     def makeXmlHeader(self, header):
         xml_head = "<msg></msg>"
         xml_msg = XMLObj.build_from_str(xml_head)
@@ -150,18 +373,15 @@ class SmartFoxClient(SFSEventDispatcher):
     
     def login(self, zone, name, passwd):
         message = "<login z='" + zone + "'><nick><![CDATA[" + name + "]]></nick><pword><![CDATA[" + passwd + "]]></pword></login>"
-        self.send(self.MESSAGE_HEADER_SYSTEM, "login", 0, XMLObj.build_from_str(message))
+        self.send(self.MESSAGE_HEADER_SYSTEM, "login", 0, message)
         return
     
     def checkBuddyDuplicates(self, buddyName):
-        for buddy in self.buddyList:
-            if buddy.name == buddyName:
-                return True
-        return False
+        return self.buddyList.getByName(buddyName) is not None
     
     def addBuddy(self, buddyName):
         if buddyName != self.myUserName and self.checkBuddyDuplicates(buddyName) == False:
-            self.send(self.MESSAGE_HEADER_SYSTEM, "addB", -1, XMLObj.build_from_str("<n>" + buddyName + "</n>"))
+            self.send(self.MESSAGE_HEADER_SYSTEM, "addB", -1, "<n>" + buddyName + "</n>")
         return
     
     def checkRoomList(self):
@@ -175,9 +395,9 @@ class SmartFoxClient(SFSEventDispatcher):
         return
     
     def clearBuddyList(self):
-        buddyList = []
+        self.buddyList.clear()
         self.send(self.MESSAGE_HEADER_SYSTEM, "clearB", -1, None)
-        evt = SFSEvent(SFSEvent.onBuddyList, {"list":buddyList})
+        evt = SFSEvent(SFSEvent.onBuddyList, {"list":self.buddyList})
         self.dispatchEvent(evt)
         return
     
@@ -187,52 +407,11 @@ class SmartFoxClient(SFSEventDispatcher):
         return True
     
     def getXmlRoomVariable(self, vName, rVar):
-        vValue = rVar.get("value")
-        vPrivate = rVar.isPrivate()
-        vPersistent = rVar.isPersistent()
-        vType = rVar.getType()
-        t = None
-        if vType == "boolean":
-            t = "b"
-            if vValue == "true" or vValue == "True":
-                vValue = True
-            else:
-                vValue = False
-        elif vType == "number":
-            t = "n"
-        elif vType == "string":
-            t = "s"
-        elif vType is not None:
-            t = "x"
-            vValue = ""
-        
-        if t:
-            return "<var n='" + vName + "' t='" + t + "' pr='" + vPrivate + "' pe='" + vPersistent + "'><![CDATA[" + vValue + "]]></var>"
-        return ""
+        return VariableBatcher.roomVarXml(vName, *VariableBatcher.encodeValue(rVar))
     
     def getXmlUserVariable(self, uVars):
-        xmlStr = "<vars>"
-        for key, uVal in uVars.items():
-            val = uVal.getValue()
-            uType = uVal.getType()
-            t = None
-            if uType == "boolean":
-                t = "b"
-                if val:
-                    val = "1"
-                else:
-                    val = "0"
-            elif uType == "number":
-                t = "n"
-            elif uType == "string":
-                t = "s"
-            elif val is None:
-                t = "x"
-                val = ""
-            if t:
-                xmlStr += "<var n='" + key + "' t='" + t + "'><![CDATA[" + val + "]]></var>"
-            xmlStr += "</vars>"
-            return xmlStr
+        return "<vars>" + "".join([VariableBatcher.userVarXml(key, *VariableBatcher.encodeValue(uVal))
+                                   for key, uVal in uVars.items()]) + "</vars>"
     
     def createRoom(self, name, maxUsers, roomProperties, roomId = -1):
         if self.checkRoomList() is False or self.checkJoin() is False:
@@ -254,46 +433,34 @@ class SmartFoxClient(SFSEventDispatcher):
                 uCount = "1"
             extensionName = roomProperties.get("extensionName")
             extensionScript = roomProperties.get("extensionScript")
-            xmlMsg = XMLObj.build_from_str("<room></room>")
-            xmlMsg.set_attribute({
-                "tmp":"1",
-                "gam":isGame,
-                "spec":maxSpectators,
-                "exit":exitCurrentRoom,
-                "jas":joinAsSpectator
-            })
+            xmlMsg = "<room tmp='1' gam='" + isGame + "' spec='" + str(maxSpectators) + "' exit='" + exitCurrentRoom + "' jas='" + joinAsSpectator + "'>"
             xmlMsg += "<name><![CDATA[" + name + "]]></name>"
             xmlMsg += "<pwd><![CDATA[" + password + "]]></pwd>"
-            xmlMsg += "<max>" + maxUsers + "</max>"
+            xmlMsg += "<max>" + str(maxUsers) + "</max>"
             xmlMsg += "<uCnt>" + uCount + "</uCnt>"
             if extensionName and extensionScript:
                 xmlMsg += "<xt n='" + extensionName
                 xmlMsg += "' s='" + extensionScript + "' />"
             vars = roomProperties.get("vars")
-            xmlMsg += "<vars></vars>"
+            xmlMsg += "<vars>"
             if vars:
                 for varName, varValue in vars.items():
                     xmlMsg += self.getXmlRoomVariable(varName, varValue)
+            xmlMsg += "</vars></room>"
             self.send(self.MESSAGE_HEADER_SYSTEM, "createRoom", roomId, xmlMsg)
         except:
             self.print_debug("[Error] createRoom error")
         return
     
     def getBuddyByName(self, buddyName):
-        for buddy in self.buddyList:
-            if buddy.getName() == buddyName:
-                return buddy
-        return None
+        return self.buddyList.getByName(buddyName)
     
     def getBuddyById(self, buddyId):
-        for buddy in self.buddyList:
-            if buddy.getId() == buddyId:
-                return buddy
-        return None
+        return self.buddyList.getById(buddyId)
     
     def getBuddyRoom(self, buddy):
         if buddy.getId() != -1:
-            self.send(self.MESSAGE_HEADER_SYSTEM, "roomB", -1, XMLObj.build_from_str("<b id='" + buddy.getId() + "' />"))
+            self.send(self.MESSAGE_HEADER_SYSTEM, "roomB", -1, "<b id='" + str(buddy.getId()) + "' />")
         return
     
     def getRoom(self, roomId):
@@ -304,10 +471,7 @@ class SmartFoxClient(SFSEventDispatcher):
     def getRoomByName(self, roomName):
         if not self.checkRoomList():
             return
-        for room in self.roomList.values():
-            if room.getName() == roomName:
-                return room
-        return
+        return self.roomList.getByName(roomName)
     
     def getRoomList(self):
         self.send(self.MESSAGE_HEADER_SYSTEM, "getRmList", self.activeRoomId, None)
@@ -341,25 +505,18 @@ class SmartFoxClient(SFSEventDispatcher):
             if oldRoom > -1:
                 roomToLeave = oldRoom
             else:
-                self.activeRoomId
+                roomToLeave = self.activeRoomId
             if self.activeRoomId == -1:
                 leaveCurrRoom = "0"
                 roomToLeave = -1
-            roomXML = XMLObj.build_from_str("<room/>")
-            roomXML.set_attribute({
-                "id":newRoom,
-                "pwd":pword,
-                "spec":isSpec,
-                "leave":leaveCurrRoom,
-                "old":roomToLeave,
-            })
+            roomXML = "<room id='" + str(newRoom) + "' pwd='" + pword + "' spec='" + str(isSpec) + "' leave='" + leaveCurrRoom + "' old='" + str(roomToLeave) + "' />"
             self.send(self.MESSAGE_HEADER_SYSTEM, "joinRoom", self.activeRoomId, roomXML)
             self.changingRoom = True
         return
     
     def leaveRoom(self, roomId):
         if self.checkRoomList() and self.checkJoin():
-            self.send(self.MESSAGE_HEADER_SYSTEM, "leaveRoom", roomId, XMLObj.build_from_str("<rm id='" + roomId + "' />"))
+            self.send(self.MESSAGE_HEADER_SYSTEM, "leaveRoom", roomId, "<rm id='" + str(roomId) + "' />")
         return
     
     def loadBuddyList(self):
@@ -371,23 +528,19 @@ class SmartFoxClient(SFSEventDispatcher):
         return
     
     def removeBuddy(self, buddyName):
-        found = False
-        for index, buddy in enumerate(self.buddyList):
-            if buddy.getName() == buddyName:
-                del self.buddyList[index]
-                found = True
-                break
-        if found:
-            self.send(self.MESSAGE_HEADER_SYSTEM, "remB",  -1, XMLObj.build_from_str("<n>" + buddyName + "</n>"))
+        buddy = self.buddyList.getByName(buddyName)
+        if buddy is not None:
+            self.buddyList.remove(buddy)
+            self.send(self.MESSAGE_HEADER_SYSTEM, "remB",  -1, "<n>" + buddyName + "</n>")
             evt = SFSEvent(SFSEvent.onBuddyList, {"list":self.buddyList})
             self.dispatchEvent(evt)
         return
     
     def sendBuddyPermissionResponse(self, allowBuddy, targetBuddy):
         if allowBuddy:
-            msgXML = XMLObj.build_from_str("<n res='g'>" + targetBuddy + "</n>")
+            msgXML = "<n res='g'>" + targetBuddy + "</n>"
         else:
-            msgXML = XMLObj.build_from_str("<n res='r'>" + targetBuddy + "</n>")
+            msgXML = "<n res='r'>" + targetBuddy + "</n>"
         self.send(self.MESSAGE_HEADER_SYSTEM, "bPrm", -1, msgXML)
         return
     
@@ -395,7 +548,7 @@ class SmartFoxClient(SFSEventDispatcher):
         if roomId is None:
             roomId = self.activeRoomId
         if self.checkRoomList() and self.checkJoin():
-            xmlMsg = XMLObj.build_from_str("<txt><![CDATA[" + message + "]]></txt>")
+            xmlMsg = "<txt><![CDATA[" + message + "]]></txt>"
             self.send(self.MESSAGE_HEADER_SYSTEM, "pubMsg", roomId, xmlMsg)
         return
     
@@ -403,19 +556,29 @@ class SmartFoxClient(SFSEventDispatcher):
         if roomId is None:
             roomId = self.activeRoomId
         if self.checkRoomList() and self.checkJoin():
-            xmlMsg = XMLObj.build_from_str("<txt rcp='" + recipientId + "'><![CDATA[" + message + "]]></txt>")
+            xmlMsg = "<txt rcp='" + str(recipientId) + "'><![CDATA[" + message + "]]></txt>"
             self.send(self.MESSAGE_HEADER_SYSTEM, "prvMsg", roomId, xmlMsg)
         return
     
     def sendModeratorMessage(self, message, mtype, id):
         if self.checkRoomList() and self.checkJoin():
-            xmlMsg = XMLObj.build_from_str("<txt t='" + mtype + "' id='" + id + "'><![CDATA[" + message + "]]></txt>")
+            xmlMsg = "<txt t='" + mtype + "' id='" + str(id) + "'><![CDATA[" + message + "]]></txt>"
             self.send(self.MESSAGE_HEADER_SYSTEM, "modMsg", self.activeRoomId, xmlMsg)
         return
     
-    def sendXtMessage(self, xtName, cmd, paramsObj, roomId = None, sendType = "xml"):
+    def setXtSendType(self, sendType):
+        """
+        Default wire format of sendXtMessage: XTMSG_TYPE_XML,
+        XTMSG_TYPE_JSON (compact, no whitespace) or XTMSG_TYPE_STR.
+        """
+        self.xtSendType = sendType
+        return
+    
+    def sendXtMessage(self, xtName, cmd, paramsObj, roomId = None, sendType = None):
         if roomId is None:
             roomId = self.activeRoomId
+        if sendType is None:
+            sendType = self.xtSendType
         if self.checkRoomList() is False:
             return
         if sendType == "xml":
@@ -423,7 +586,7 @@ class SmartFoxClient(SFSEventDispatcher):
             xtReq["name"] = xtName
             xtReq["cmd"] = cmd
             xtReq["param"] = paramsObj
-            xmlmsg = XMLObj.build_from_str("<![CDATA[" + SFSObjectSerializer.serialize(xtReq) + "]]>")
+            xmlmsg = "<![CDATA[" + SFSObjectSerializer.serialize(xtReq) + "]]>"
             self.send(self.MESSAGE_HEADER_EXTENSION, "xtReq", roomId, xmlmsg)
         elif sendType == "json":
             jobj = {}
@@ -431,66 +594,82 @@ class SmartFoxClient(SFSEventDispatcher):
             jobj["c"] = cmd
             jobj["r"] = roomId
             jobj["p"] = paramsObj
-            self.sendJson(json.dumps({"t":"xt","b":jobj}))
+            self.sendJson(json.dumps({"t":"xt","b":jobj}, separators = (",", ":")))
         elif sendType == "str":
-            hdr = self.MSG_STR.join([str(d) for d in ["xt", xtName, cmd, roomId]+paramsObj]) + self.MSG_STR
+            hdr = self.MSG_STR + self.MSG_STR.join([str(d) for d in ["xt", xtName, cmd, roomId]+paramsObj]) + self.MSG_STR
             self.sendString(hdr)
         return
     
     def sendJson(self, jsMessage):
-        self.print_debug("[Sending - JSON]: " + jsMessage)
-        self.socket_client.send(jsMessage)
+        if self.debug:
+            self.print_debug("[Sending - JSON]: " + jsMessage)
+        self.socket_client.sendMessage(jsMessage)
+        if self.stats is not None:
+            self.stats.recordOut(SmartFoxClient.XTMSG_TYPE_JSON, jsMessage)
         return
     
     def sendString(self, strMessage):
-        self.print_debug("[Sending - STR]: " + strMessage)
-        self.socket_client.send(strMessage)
+        if self.debug:
+            self.print_debug("[Sending - STR]: " + strMessage)
+        self.socket_client.sendMessage(strMessage)
+        if self.stats is not None:
+            self.stats.recordOut(SmartFoxClient.XTMSG_TYPE_STR, strMessage)
         return
     
     def setBuddyBlockStatus(self, buddyName, status):
         b = self.getBuddyByName(buddyName)
         if b:
-            if not b.isBlocked == status:
+            if b.isBlocked() != status:
                 b.setBlocked(status)
                 if status:
-                    xmlMsg = XMLObj.build_from_str("<n x='1'>" + buddyName + "</n>")
+                    xmlMsg = "<n x='1'>" + buddyName + "</n>"
                 else:
-                    xmlMsg = XMLObj.build_from_str("<n x='0'>" + buddyName + "</n>")
+                    xmlMsg = "<n x='0'>" + buddyName + "</n>"
                 self.send(self.MESSAGE_HEADER_SYSTEM, "setB", -1, xmlMsg)
                 evt = SFSEvent(SFSEvent.onBuddyListUpdate, {"buddy":b})
                 self.dispatchEvent(evt)
         return
     
     def setBuddyVariables(self, varList):
-        xmlMsg = XMLObj.build_from_str("<vars></vars>")
-        for vName, vValue in varList.items():
-            self.myBuddyVars[vName] = vValue
-            xmlMsg += "<var n='" + vName + "'><![CDATA[" + vValue + "]]></var>"
-        self.send(self.MESSAGE_HEADER_SYSTEM, "setBvars", -1, xmlMsg)
+        """
+        Send the buddy variables in varList that differ from myBuddyVars.
+        """
+        self.variableBatcher.update("setBvars", -1, "<vars>", self.myBuddyVars, varList,
+                                    VariableBatcher.buddyVarXml)
         return
     
     def setRoomVariables(self, vars, roomId = None, setOwnership = True):
+        """
+        Send the variables in vars (name -> RoomVariableRequest or plain
+        value, None to delete) that differ from the room's.
+        """
         if roomId is None:
             roomId = self.activeRoomId
         if self.checkRoomList() and self.checkJoin():
+            room = self.getRoom(roomId)
+            if room is None:
+                return
             if setOwnership:
-                xmlMsg = XMLObj.build_from_str("<vars></vars>")
+                varsTag = "<vars>"
             else:
-                xmlMsg = XMLObj.build_from_str("<vars so='0'></vars>")
-            for varName, varValue in vars.items():
-                xmlMsg += self.getXmlRoomVariable(varName, varValue)
-            self.send(self.MESSAGE_HEADER_SYSTEM, "setRvars", roomId, xmlMsg)
+                varsTag = "<vars so='0'>"
+            self.variableBatcher.update("setRvars", roomId, varsTag, room.getVariables(), vars,
+                                        VariableBatcher.roomVarXml)
         return
     
     def setUserVariables(self, vars, roomId = None):
+        """
+        Send the variables in vars that differ from the ones the client
+        holds for its own user.
+        """
         if roomId is None:
             roomId = self.activeRoomId
         if self.checkRoomList() and self.checkJoin():
-            currRoom = self.getActiveRoom()
-            user = currRoom.getUser(self.myUserId)
-            user.setVariables(vars)
-            xmlMsg = self.getXmlUserVariable(vars)
-            self.send(self.MESSAGE_HEADER_SYSTEM, "setUvars", roomId, xmlMsg)
+            user = self.getActiveRoom().getUser(self.myUserId)
+            if user is None:
+                return
+            self.variableBatcher.update("setUvars", roomId, "<vars>", user.getVariables(), vars,
+                                        VariableBatcher.userVarXml)
         return
     
     def switchSpectator(self, roomId = None):
@@ -508,11 +687,17 @@ class SmartFoxClient(SFSEventDispatcher):
     
     def onConnection(self):
         self.print_debug("onConnection")
-        xml_msg = XMLObj.build_from_str("<ver v='"+self.VER+"'/>")
+        xml_msg = "<ver v='"+self.VER+"'/>"
         self.send(self.MESSAGE_HEADER_SYSTEM, "verChk", -1, xml_msg)
         return
     
+    def onConnectionLost(self, exc):
+        self.print_debug("onConnectionLost")
+        self.setConnected(False)
+        return
+    
     def onDataReceived(self, data):
-        self.print_debug("[Received] "+str(data))
+        if self.debug:
+            self.print_debug("[Received] "+str(data))
         self.handleMessage(data)
         return
\ No newline at end of file
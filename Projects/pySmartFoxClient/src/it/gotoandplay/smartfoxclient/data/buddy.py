@@ -6,18 +6,22 @@ Created on 2010-11-15
 '''
 
 class Buddy(object):
-    id = None
-    name = None
-    online = None
-    blocked = None
-    variables = None
+    __slots__ = ("id", "name", "online", "blocked", "variables")
     
     def __init__(self):
+        self.id = None
+        self.name = None
+        self.online = None
+        self.blocked = None
         self.variables = {}
         
     def getName(self):
         return self.name
     
+    def setName(self, name):
+        self.name = name
+        return
+    
     def getId(self):
         return self.id
     
@@ -42,6 +46,8 @@ class Buddy(object):
     def getVariables(self):
         return self.variables
     
-    def setgetVariables(self, variables):
+    def setVariables(self, variables):
         self.variables = variables
-        return
\ No newline at end of file
+        return
+    
+    setgetVariables = setVariables
\ No newline at end of file
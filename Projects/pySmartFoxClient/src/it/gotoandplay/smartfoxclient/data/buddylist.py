@@ -0,0 +1,99 @@
+# -*- coding:utf-8 -*-
+'''
+Created on 2026-10-18
+'''
+
+class BuddyList(list):
+    """
+    Buddy list that keeps name and id indexes in sync with its contents.
+    Buddy names are unique on the server, so each key maps to one buddy.
+
+    Buddies whose name or id changes while they are in the list must be
+    updated through renameBuddy/setBuddyId so the indexes follow.
+    """
+
+    def __init__(self, buddies = ()):
+        list.__init__(self)
+        self.nameIndex = {}
+        self.idIndex = {}
+        self.extend(buddies)
+
+    def indexBuddy(self, buddy):
+        self.nameIndex.setdefault(buddy.getName(), buddy)
+        if buddy.getId() is not None:
+            self.idIndex.setdefault(buddy.getId(), buddy)
+        return
+
+    def unindexBuddy(self, buddy):
+        for index, key in ((self.nameIndex, buddy.getName()), (self.idIndex, buddy.getId())):
+            if index.get(key) is buddy:
+                del index[key]
+        return
+
+    def getByName(self, name):
+        return self.nameIndex.get(name)
+
+    def getById(self, buddyId):
+        return self.idIndex.get(buddyId)
+
+    def renameBuddy(self, buddy, name):
+        self.unindexBuddy(buddy)
+        buddy.setName(name)
+        self.indexBuddy(buddy)
+        return
+
+    def setBuddyId(self, buddy, buddyId):
+        self.unindexBuddy(buddy)
+        buddy.setId(buddyId)
+        self.indexBuddy(buddy)
+        return
+
+    def append(self, buddy):
+        list.append(self, buddy)
+        self.indexBuddy(buddy)
+        return
+
+    def extend(self, buddies):
+        for buddy in buddies:
+            self.append(buddy)
+        return
+
+    def __iadd__(self, buddies):
+        self.extend(buddies)
+        return self
+
+    def insert(self, position, buddy):
+        list.insert(self, position, buddy)
+        self.indexBuddy(buddy)
+        return
+
+    def remove(self, buddy):
+        list.remove(self, buddy)
+        self.unindexBuddy(buddy)
+        return
+
+    def pop(self, position = -1):
+        buddy = list.pop(self, position)
+        self.unindexBuddy(buddy)
+        return buddy
+
+    def __setitem__(self, position, buddy):
+        if isinstance(position, slice):
+            raise TypeError("BuddyList does not support slice assignment")
+        self.unindexBuddy(self[position])
+        list.__setitem__(self, position, buddy)
+        self.indexBuddy(buddy)
+        return
+
+    def __delitem__(self, position):
+        if isinstance(position, slice):
+            raise TypeError("BuddyList does not support slice deletion")
+        self.unindexBuddy(self[position])
+        list.__delitem__(self, position)
+        return
+
+    def clear(self):
+        list.clear(self)
+        self.nameIndex.clear()
+        self.idIndex.clear()
+        return
@@ -6,22 +6,20 @@ Created on 2010-11-13
 '''
 
 class Room(object):
-    id = None
-    name = None
-    maxUsers = None
-    maxSpectators = None
-    temp = None
-    game = None
-    priv = None
-    limbo = None
-    userCount = None
-    specCount = None
-    myPlayerIndex = None
-    userList = None
-    variables = None
+    __slots__ = ("id", "name", "maxUsers", "maxSpectators", "temp", "game", "priv", "limbo",
+                 "userCount", "specCount", "myPlayerIndex", "userList", "variables")
 
     def __init__(self, id, name, maxUsers, maxSpectators, isTemp, isGame, isPrivate, isLimbo, userCount, specCount):
         self.id = int(id)
+        self.myPlayerIndex = None
+        self.userList = {}
+        self.variables = {}
+        self.update(name, maxUsers, maxSpectators, isTemp, isGame, isPrivate, isLimbo, userCount, specCount)
+
+    def update(self, name, maxUsers, maxSpectators, isTemp, isGame, isPrivate, isLimbo, userCount, specCount):
+        """
+        Refresh the room properties in place, keeping users and variables.
+        """
         self.name = name
         self.maxSpectators = int(maxSpectators)
         self.maxUsers = int(maxUsers)
@@ -32,8 +30,7 @@ class Room(object):
 
         self.userCount = int(userCount)
         self.specCount = int(specCount)
-        self.userList = {}
-        self.variables = {}
+        return
 
     def addUser(self, u, id):
         self.userList[id] = u
@@ -61,12 +58,13 @@ class Room(object):
         return
     
     def getUser(self, userName):
-        if userName in self.userList:
-            return self.userList[userName]
-        for userId, user in self.userList.items():
-            if userId == userName:
-                return user
-        return
+        user = self.userList.get(userName)
+        if user is None and isinstance(userName, str):
+            for user in self.userList.values():
+                if user.getName() == userName:
+                    return user
+            return None
+        return user
 
     def clearUserList(self):   
         self.userList = {}
@@ -91,6 +89,10 @@ class Room(object):
     def getName(self):   
         return self.name
 
+    def setName(self, name):
+        self.name = name
+        return
+
     def getId(self):   
         return self.id
 
@@ -0,0 +1,97 @@
+# -*- coding:utf-8 -*-
+'''
+Created on 2026-10-18
+'''
+
+class RoomList(dict):
+    """
+    Room id -> Room mapping that also keeps a room name index.
+
+    Like the linear getRoomByName scan it replaces, the first room added
+    under a name wins; other rooms with the same name only take over when
+    that one goes away.
+    """
+
+    def __init__(self, *args, **kwargs):
+        dict.__init__(self)
+        self.nameIndex = {}
+        self.duplicateNames = set()
+        self.update(*args, **kwargs)
+
+    def indexName(self, room):
+        name = room.getName()
+        if name in self.nameIndex:
+            if self.nameIndex[name] is not room:
+                self.duplicateNames.add(name)
+        else:
+            self.nameIndex[name] = room
+        return
+
+    def unindexName(self, room):
+        name = room.getName()
+        if self.nameIndex.get(name) is not room:
+            return
+        del self.nameIndex[name]
+        if name in self.duplicateNames:
+            self.duplicateNames.discard(name)
+            others = [r for r in self.values() if r is not room and r.getName() == name]
+            if others:
+                self.nameIndex[name] = others[0]
+            if len(others) > 1:
+                self.duplicateNames.add(name)
+        return
+
+    def getByName(self, name):
+        return self.nameIndex.get(name)
+
+    def renameRoom(self, room, name):
+        if room.getName() == name:
+            return
+        self.unindexName(room)
+        room.setName(name)
+        if self.get(room.getId()) is room:
+            self.indexName(room)
+        return
+
+    def __setitem__(self, roomId, room):
+        old_room = self.get(roomId)
+        if old_room is not None and old_room is not room:
+            dict.__delitem__(self, roomId)
+            self.unindexName(old_room)
+        dict.__setitem__(self, roomId, room)
+        self.indexName(room)
+        return
+
+    def __delitem__(self, roomId):
+        room = self[roomId]
+        dict.__delitem__(self, roomId)
+        self.unindexName(room)
+        return
+
+    def pop(self, roomId, *default):
+        if roomId not in self:
+            return dict.pop(self, roomId, *default)
+        room = self[roomId]
+        del self[roomId]
+        return room
+
+    def popitem(self):
+        roomId, room = dict.popitem(self)
+        self.unindexName(room)
+        return roomId, room
+
+    def setdefault(self, roomId, room = None):
+        if roomId not in self:
+            self[roomId] = room
+        return self[roomId]
+
+    def update(self, *args, **kwargs):
+        for roomId, room in dict(*args, **kwargs).items():
+            self[roomId] = room
+        return
+
+    def clear(self):
+        dict.clear(self)
+        self.nameIndex.clear()
+        self.duplicateNames.clear()
+        return
@@ -6,12 +6,7 @@ Created on 2010-11-13
 '''
 
 class User(object):
-    id = None
-    name = None
-    variables = None
-    isSpec = None
-    isMod = None
-    pId = None
+    __slots__ = ("id", "name", "variables", "isSpec", "isMod", "pId")
     
     def __init__(self, id, name):
         self.id = id
@@ -19,6 +14,7 @@ class User(object):
         self.variables = {}
         self.isMod = False
         self.isSpec = False
+        self.pId = None
     
     def getId(self):
         return self.id
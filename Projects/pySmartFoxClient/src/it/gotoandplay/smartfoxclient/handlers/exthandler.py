@@ -5,22 +5,28 @@ Created on 2010-11-15
 @author: leenjewel
 '''
 
-from it.gotoandplay.utils.xmllib import XMLObj
 from it.gotoandplay.smartfoxclient.sfsevent import SFSEvent
+from it.gotoandplay.smartfoxclient.util.sfsobjectserializer import SFSObjectSerializer
 
 class ExtHandler(object):
     
     def __init__(self, sfc):
         self.sfc = sfc
     
+    def canSkip(self, action):
+        # every extension message ends up as onExtensionResponse
+        return not self.sfc.hasEventListener(SFSEvent.onExtensionResponse)
+    
     def handleMessage(self, msg_obj, obj_type = None):
+        if not self.sfc.hasEventListener(SFSEvent.onExtensionResponse):
+            return
         from it.gotoandplay.smartfoxclient import SmartFoxClient
         params = {}
         if obj_type == SmartFoxClient.XTMSG_TYPE_XML:
             body = msg_obj.body
             action = body.xml_attr.get("action")
             if action == "xtRes":            
-                params["dataObj"] = XMLObj.build_from_str(body.get_data())
+                params["dataObj"] = SFSObjectSerializer.deserialize(body.get_data())
                 params["type"] = obj_type
                 evt = SFSEvent(SFSEvent.onExtensionResponse, params)
                 self.sfc.dispatchEvent(evt)
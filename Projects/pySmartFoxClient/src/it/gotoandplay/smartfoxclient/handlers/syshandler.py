@@ -6,16 +6,37 @@ Created on 2010-11-13
 '''
 
 import time
-from it.gotoandplay.utils.xmllib import XMLObj
 from it.gotoandplay.smartfoxclient.sfsevent import SFSEvent
 from it.gotoandplay.smartfoxclient.data.buddy import Buddy
 from it.gotoandplay.smartfoxclient.data.user import User
 from it.gotoandplay.smartfoxclient.data.room import Room
+from it.gotoandplay.smartfoxclient.util.sfsobjectserializer import SFSObjectSerializer
 
 class SysHandler(object):
+    # Actions whose handler does nothing but dispatch this event. Frames
+    # carrying them can be dropped unparsed while nobody listens.
+    eventOnlyActions = {
+        "apiOK":SFSEvent.onConnection,
+        "apiKO":SFSEvent.onConnection,
+        "logKO":SFSEvent.onLogin,
+        "joinKO":SFSEvent.onJoinRoomError,
+        "pubMsg":SFSEvent.onPublicMessage,
+        "prvMsg":SFSEvent.onPrivateMessage,
+        "dmnMsg":SFSEvent.onAdminMessage,
+        "modMsg":SFSEvent.onModeratorMessage,
+        "dataObj":SFSEvent.onObjectReceived,
+        "rndK":SFSEvent.onRandomKey,
+        "createRmKO":SFSEvent.onCreateRoomError,
+        "roomB":SFSEvent.onBuddyRoom,
+        "leaveRoom":SFSEvent.onRoomLeft,
+        "bPrm":SFSEvent.onBuddyPermissionRequest,
+    }
 
     def __init__(self, sfc):
         self.sfc = sfc
+        # action -> bound handle_<action> method, resolved once
+        self.handlers = dict((name[len("handle_"):], getattr(self, name))
+                             for name in dir(self) if name.startswith("handle_"))
     
     def populateVariables(self, variables, xml_obj):
         changed_vars = {}
@@ -30,10 +51,13 @@ class SysHandler(object):
                 changed_vars[v_name] = variables[v_name] = v_value
         return changed_vars
 
+    def canSkip(self, action):
+        event_name = self.eventOnlyActions.get(action)
+        return event_name is not None and not self.sfc.hasEventListener(event_name)
+
     def handleMessage(self, xml_obj, obj_type = None):
-        action = xml_obj.body.xml_attr.get("action")
-        if action and hasattr(self, "handle_"+action):
-            func = getattr(self, "handle_"+action)
+        func = self.handlers.get(xml_obj.body.xml_attr.get("action"))
+        if func:
             return func(xml_obj)
         return
     
@@ -52,7 +76,7 @@ class SysHandler(object):
         mod = xml_obj.body.login.xml_attr.get("mod", "0")
         name = xml_obj.body.xml_attr.get("n")
         self.sfc.amIModerator = (int(mod) == 1)
-        self.sfc.myUserId = uid
+        self.sfc.myUserId = int(uid)
         self.sfc.myUserName = name
         self.sfc.playerId = -1
         evt = SFSEvent.build_evt(SFSEvent.onLogin, True, name = name, error = "")
@@ -76,7 +100,10 @@ class SysHandler(object):
         rooms = xml_obj.body.rmList.rm
         for room in rooms:
             room_id = int(room.xml_attr.get("id",-1))
-            room_name = room.xml_attr.get("n","")
+            if room.n:
+                room_name = room.n.get_data()
+            else:
+                room_name = room.xml_attr.get("n","")
             maxu = room.xml_attr.get("maxu", 0)
             maxs = room.xml_attr.get("maxs",0)
             temp = room.xml_attr.get("temp",0)
@@ -85,28 +112,34 @@ class SysHandler(object):
             lmb = room.xml_attr.get("lmb",0)
             ucnt = room.xml_attr.get("ucnt",0)
             scnt = room.xml_attr.get("scnt",0)
-            roomobj = Room(room_id, room_name, maxu, maxs, temp == 1, game == 1, priv == 1, lmb == 1, ucnt, scnt)
+            props = (maxu, maxs, int(temp) == 1, int(game) == 1, int(priv) == 1, int(lmb) == 1, ucnt, scnt)
+            # Known rooms are refreshed in place so users, variables and
+            # any references held by listeners stay valid.
+            roomobj = room_list.get(room_id)
+            if roomobj:
+                room_list.renameRoom(roomobj, room_name)
+                roomobj.update(room_name, *props)
+            else:
+                roomobj = Room(room_id, room_name, *props)
+                room_list[room_id] = roomobj
             if room.vars and room.vars.var:
-                self.populateVariables(room.getVariables(), room)
-            old_room = room_list.get(roomobj.getId())
-            if old_room:
-                roomobj.setVariables(old_room.getVariables())
-                roomobj.setUserList(old_room.getUserList())
-            room_list[room_id] = roomobj
+                self.populateVariables(roomobj.getVariables(), room)
         evt = SFSEvent(SFSEvent.onRoomListUpdate, {"roomList":room_list})
         self.sfc.dispatchEvent(evt)
         return
 
     def handle_uCount(self, xml_obj):
-        uCount = int(xml_obj.body.xml_attr.get("u", 0))
-        sCount = int(xml_obj.body.xml_attr.get("s", 0))
-        roomId = int(xml_obj.body.xml_attr.get("r", -1))
-        room = self.sfc.getAllRooms().get(roomId)
+        attrs = xml_obj.body.xml_attr
+        uCount = int(attrs.get("u", 0))
+        sCount = int(attrs.get("s", 0))
+        roomId = int(attrs.get("r", -1))
+        room = self.sfc.roomList.get(roomId)
         if room:
             room.setUserCount(uCount)
             room.setSpectatorCount(sCount)
-            evt = SFSEvent(SFSEvent.onUserCountChange, {"room":room})
-            self.sfc.dispatchEvent(evt)
+            if self.sfc.hasEventListener(SFSEvent.onUserCountChange):
+                evt = SFSEvent(SFSEvent.onUserCountChange, {"room":room})
+                self.sfc.dispatchEvent(evt)
         return
 
     def handle_joinOK(self, xml_obj):
@@ -120,7 +153,7 @@ class SysHandler(object):
         currRoom.setMyPlayerIndex(playerId)
         if xml_obj.body.vars and xml_obj.body.vars.var:
             currRoom.clearVariables()
-            self.populateVariables(currRoom.getVariables(), xml_obj)
+            self.populateVariables(currRoom.getVariables(), xml_obj.body)
         if xml_obj.body.uLs.u:
             for usr in xml_obj.body.uLs.u:
                 name = usr.n.get_data()
@@ -167,6 +200,8 @@ class SysHandler(object):
         if user.vars and user.vars.var:
             self.populateVariables(newUser.getVariables(), user)
         currRoom.addUser(newUser, userId)
+        if not self.sfc.hasEventListener(SFSEvent.onUserEnterRoom):
+            return
         evt = SFSEvent(SFSEvent.onUserEnterRoom, {"roomId":roomId, "user":newUser})
         self.sfc.dispatchEvent(evt)
         return
@@ -178,6 +213,8 @@ class SysHandler(object):
         theRoom = self.sfc.getRoom(roomId)
         uName = theRoom.getUser(userId).getName()
         theRoom.removeUser(userId)
+        if not self.sfc.hasEventListener(SFSEvent.onUserLeaveRoom):
+            return
         params = {}
         params["roomId"] = roomId
         params["userId"] = userId
@@ -187,6 +224,8 @@ class SysHandler(object):
         return
 
     def handle_pubMsg(self, xml_obj):
+        if not self.sfc.hasEventListener(SFSEvent.onPublicMessage):
+            return
         body = xml_obj.body
         roomId = int(xml_obj.body.xml_attr.get("r", -1))
         message = body.txt.get_data()
@@ -202,6 +241,8 @@ class SysHandler(object):
         return
 
     def handle_prvMsg(self, xml_obj):
+        if not self.sfc.hasEventListener(SFSEvent.onPrivateMessage):
+            return
         body = xml_obj.body
         roomId = int(xml_obj.body.xml_attr.get("r", -1))
         message = body.txt.get_data()
@@ -217,6 +258,8 @@ class SysHandler(object):
         return
 
     def handle_dmnMsg(self, xml_obj):
+        if not self.sfc.hasEventListener(SFSEvent.onAdminMessage):
+            return
         body = xml_obj.body
         message = body.txt.get_data()
         evt = SFSEvent(SFSEvent.onAdminMessage, {"message":message})
@@ -224,6 +267,8 @@ class SysHandler(object):
         return
 
     def handle_modMsg(self, xml_obj):
+        if not self.sfc.hasEventListener(SFSEvent.onModeratorMessage):
+            return
         body = xml_obj.body
         roomId = int(body.xml_attr.get("r", -1))
         message = body.txt.get_data()
@@ -241,16 +286,17 @@ class SysHandler(object):
         return
 
     def handle_dataObj(self, xml_obj):
+        if not self.sfc.hasEventListener(SFSEvent.onObjectReceived):
+            return
         body = xml_obj.body
         roomId = int(body.xml_attr.get("r", -1))
         xmlStr = body.dataObj.get_cdata()
         user = body.user
         userId = int(user.xml_attr.get("id", -1))
         sender = self.sfc.getRoom(roomId).getUser(userId)
-        xmlObj = XMLObj.build_from_str(xmlStr)
         params = {}
         params["sender"] = sender
-        params["obj"] = xmlObj
+        params["obj"] = SFSObjectSerializer.deserialize(xmlStr)
         evt = SFSEvent(SFSEvent.onObjectReceived, params)
         self.sfc.dispatchEvent(evt)
         return
@@ -259,8 +305,11 @@ class SysHandler(object):
         body = xml_obj.body
         roomId = int(body.xml_attr.get("r", -1))
         currRoom = self.sfc.getRoom(roomId)
+        changedVars = {}
         if body.vars and body.vars.var:
             changedVars = self.populateVariables(currRoom.getVariables(), body)
+        if not self.sfc.hasEventListener(SFSEvent.onRoomVariablesUpdate):
+            return
         params = {}
         params["room"] = currRoom
         params["changedVars"] = changedVars
@@ -307,6 +356,8 @@ class SysHandler(object):
         return
 
     def handle_rndK(self, xml_obj):
+        if not self.sfc.hasEventListener(SFSEvent.onRandomKey):
+            return
         body = xml_obj.body
         key = body.k.get_data()
         params = {}
@@ -316,8 +367,15 @@ class SysHandler(object):
         return
 
     def handle_roundTripRes(self, xml_obj):
-        now = time.time()
-        res = now - self.sfc.getBenchStartTime()
+        start = self.sfc.getBenchStartTime()
+        if start is None:
+            # an answer to a roundTripBench this client never sent
+            return
+        res = time.time() - start
+        if self.sfc.stats is not None:
+            self.sfc.stats.recordRoundTrip(res)
+        if not self.sfc.hasEventListener(SFSEvent.onRoundTripResponse):
+            return
         params = {}
         params["elapsed"] = res
         evt = SFSEvent(SFSEvent.onRoundTripResponse, params)
@@ -337,6 +395,8 @@ class SysHandler(object):
                     if not returnUser:
                         returnUser = varOwner
                     changedVars = self.populateVariables(varOwner.getVariables(), body)
+        if not self.sfc.hasEventListener(SFSEvent.onUserVariablesUpdate):
+            return
         params = {}
         params["user"] = returnUser
         params["changedVars"] = changedVars
@@ -397,32 +457,24 @@ class SysHandler(object):
         b = body.b
         params = {}
         if b:
-            buddy = Buddy()
+            buddy = self.sfc.buddyList.getByName(b.n.get_data())
+            if buddy is None:
+                return
+            # The blocked flag is kept client side, so it is not taken
+            # from the update.
             online = int(b.xml_attr.get("s", 0))
             buddy.setOnline(online == 1)
-            name = b.n.get_data()
-            buddy.setName(name)
             id = int(b.xml_attr.get("i", -1))
-            buddy.setId(id)
-            blocked = int(b.xml_attr.get("x", 0))
-            buddy.setBlocked(blocked == 1)
+            if id != buddy.getId():
+                self.sfc.buddyList.setBuddyId(buddy, id)
             bVars = b.vs
-            found = False
-            for index, tempB in enumerate(self.sfc.buddyList):
-                if tempB.getName() == buddy.getName():
-                    buddy.setBlocked(tempB.isBlocked())
-                    buddy.setVariables(tempB.getVariables())
-                    if bVars and bVars.v:
-                        for bVar in bVars.v:
-                            bVarName = bVar.xml_attr.get("n")
-                            buddy.variables[bVarName] = bVar.get_data()
-                    
-                    self.sfc.buddyList[index] = buddy
-                    found = True
-                    break
-            if found:
-                params["buddy"] = buddy
-                evt = SFSEvent(SFSEvent.onBuddyListUpdate, params)
+            if bVars and bVars.v:
+                variables = buddy.getVariables()
+                for bVar in bVars.v:
+                    bVarName = bVar.xml_attr.get("n")
+                    variables[bVarName] = bVar.get_data()
+            params["buddy"] = buddy
+            evt = SFSEvent(SFSEvent.onBuddyListUpdate, params)
         else:
             err = body.err
             params["error"] = err.get_data()
@@ -529,12 +581,11 @@ class SysHandler(object):
     def handle_remB(self, xml_obj):
         body = xml_obj.body
         buddyName = body.n.get_data()
-        for buddy in self.sfc.buddyList:
-            if buddy.getName() == buddyName:
-                self.sfc.buddyList.remove(buddy)
-                params = {"list":self.sfc.buddyList}
-                evt = SFSEvent(SFSEvent.onBuddyList, params)
-                self.sfc.dispatchEvent(evt)
-                break
+        buddy = self.sfc.buddyList.getByName(buddyName)
+        if buddy is not None:
+            self.sfc.buddyList.remove(buddy)
+            params = {"list":self.sfc.buddyList}
+            evt = SFSEvent(SFSEvent.onBuddyList, params)
+            self.sfc.dispatchEvent(evt)
         return
         return
\ No newline at end of file
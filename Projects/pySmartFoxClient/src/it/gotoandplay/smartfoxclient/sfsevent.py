@@ -6,6 +6,7 @@ Created on 2010-11-13
 '''
 
 class SFSEvent(object):
+    __slots__ = ("event_name", "params")
     
     onConnection = "onConnection"
     onLogin = "onLogin"
@@ -38,8 +39,10 @@ class SFSEvent(object):
     onBuddyPermissionRequest = "onBuddyPermissionRequest"
     onExtensionResponse = "onExtensionResponse"
     
-    def __init__(self, event_name, params = {}):
+    def __init__(self, event_name, params = None):
         self.event_name = event_name
+        if params is None:
+            params = {}
         self.params = params
     
     @classmethod
@@ -53,4 +56,4 @@ class SFSEvent(object):
         return self.event_name
     
     def getParams(self):
-        return self.params
\ No newline at end of file
+        return self.params
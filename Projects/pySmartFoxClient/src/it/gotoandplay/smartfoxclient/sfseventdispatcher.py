@@ -5,9 +5,21 @@ Created on 2010-11-13
 @author: leenjewel
 '''
 
+from time import perf_counter_ns
+
 class SFSEventDispatcher(object):
+    """
+    Keeps one listener list per event name. An event name only has an entry
+    while somebody listens to it, so hasEventListener is a single dict
+    lookup and handlers use it to skip building events nobody will see.
+    
+    While sampledStats is set (anything with recordListener(eventName,
+    nanos)) the time listeners take on inline dispatch is recorded there.
+    """
     def __init__(self):
         self.listeners = {}
+        self.eventPool = None
+        self.sampledStats = None
     
     def addEventListener(self, event_name, event_obj):
         if event_name not in self.listeners:
@@ -20,10 +32,43 @@ class SFSEventDispatcher(object):
             del self.listeners[event_name]
         return
     
+    def hasEventListener(self, event_name):
+        return event_name in self.listeners
+    
+    def setEventPool(self, event_pool):
+        """
+        Deliver events through event_pool (a ThreadEventPool or an
+        AsyncioEventPool from sfseventpool) instead of calling listeners
+        inline. None closes the current pool and goes back to inline.
+        """
+        if self.eventPool is not None:
+            self.eventPool.close()
+        self.eventPool = event_pool
+        if event_pool is not None:
+            # listener errors go to the debug output, like the rest of the client
+            if event_pool.errorHandler is None and hasattr(self, "print_debug"):
+                event_pool.errorHandler = self.print_debug
+            event_pool.start()
+        return
+    
+    def getDispatchStats(self):
+        if self.eventPool is None:
+            return {}
+        return self.eventPool.getStats()
+    
     def dispatchEvent(self, event_obj):
-        event_name = event_obj.getName()
-        if event_name in self.listeners:
-            listeners = self.listeners[event_name]
+        listeners = self.listeners.get(event_obj.event_name)
+        if listeners:
+            if self.eventPool is not None:
+                self.eventPool.put(event_obj, listeners)
+                return
+            stats = self.sampledStats
+            if stats is None:
+                for listener in listeners:
+                    listener.handleEvent(event_obj)
+                return
+            start = perf_counter_ns()
             for listener in listeners:
                 listener.handleEvent(event_obj)
-        return
\ No newline at end of file
+            stats.recordListener(event_obj.event_name, perf_counter_ns() - start)
+        return
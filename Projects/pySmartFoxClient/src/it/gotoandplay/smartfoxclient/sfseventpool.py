@@ -0,0 +1,399 @@
+# -*- coding:utf-8 -*-
+'''
+Created on 2026-10-18
+'''
+
+import time
+import asyncio
+import inspect
+import threading
+import traceback
+from abc import ABC, abstractmethod
+from collections import deque
+from it.gotoandplay.smartfoxclient.sfsevent import SFSEvent
+
+OVERFLOW_BLOCK = "block"
+OVERFLOW_DROP_OLDEST = "dropOldest"
+OVERFLOW_COALESCE = "coalesce"
+OVERFLOW_POLICIES = (OVERFLOW_BLOCK, OVERFLOW_DROP_OLDEST, OVERFLOW_COALESCE)
+
+class EventLane(object):
+    """
+    One worker's queue. All events of a room land in the same lane, so they
+    reach listeners in the order they were received.
+    """
+
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.queue = deque()
+        # coalesce key -> queued entry, for OVERFLOW_COALESCE
+        self.pending = {}
+        self.busy = False
+        self.maxDepth = 0
+        self.enqueued = 0
+        self.delivered = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.blocked = 0
+        self.errors = 0
+        self.handlerCalls = 0
+        self.handlerTime = 0.0
+        self.handlerMax = 0.0
+        self.waitTime = 0.0
+        self.waitMax = 0.0
+
+    def take(self):
+        entry = self.queue.popleft()
+        if entry[3] is not None and self.pending.get(entry[3]) is entry:
+            del self.pending[entry[3]]
+        return entry
+
+class SFSEventPool(ABC):
+    """
+    Delivers events to listeners from workers instead of the thread that
+    read them off the socket, so a slow listener no longer holds up
+    reading for every room.
+
+    Events are routed to a lane by room id (events without a room share
+    lane 0) and each lane is drained by one worker, which keeps per room
+    ordering. A lane holds at most maxQueue events; when it is full the
+    overflow policy decides:
+
+    - OVERFLOW_BLOCK: the producer waits for room (backpressure)
+    - OVERFLOW_DROP_OLDEST: the oldest queued event of the lane is dropped
+    - OVERFLOW_COALESCE: an event in coalesceEvents replaces the queued
+      one for the same room, whether or not the lane is full; anything
+      else blocks
+
+    A listener that raises is counted in the errors stat and reported,
+    with its traceback, to errorHandler (setEventPool points it at the
+    client's print_debug).
+    """
+    # events that only carry the latest state of a room
+    coalesceEvents = frozenset([SFSEvent.onUserCountChange])
+
+    def __init__(self, workers = 4, maxQueue = 1024, overflow = OVERFLOW_BLOCK):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError("overflow must be one of %s" % ", ".join(OVERFLOW_POLICIES))
+        if workers < 1 or maxQueue < 1:
+            raise ValueError("workers and maxQueue must be at least 1")
+        self.maxQueue = maxQueue
+        self.overflow = overflow
+        self.lanes = [EventLane() for _ in range(workers)]
+        self.running = False
+        self.errorHandler = None
+
+    @staticmethod
+    def roomKey(event_obj):
+        params = event_obj.params
+        room = params.get("room")
+        if room is not None:
+            return room.getId()
+        return params.get("roomId")
+
+    def laneFor(self, key):
+        if key is None:
+            return self.lanes[0]
+        return self.lanes[hash(key) % len(self.lanes)]
+
+    def put(self, event_obj, listeners):
+        key = self.roomKey(event_obj)
+        lane = self.laneFor(key)
+        coalesce_key = None
+        with lane.cond:
+            if self.overflow == OVERFLOW_COALESCE and event_obj.event_name in self.coalesceEvents:
+                coalesce_key = (event_obj.event_name, key)
+                entry = lane.pending.get(coalesce_key)
+                if entry is not None:
+                    entry[0] = event_obj
+                    entry[1] = listeners
+                    lane.coalesced += 1
+                    return
+            if len(lane.queue) >= self.maxQueue:
+                if self.overflow == OVERFLOW_DROP_OLDEST:
+                    lane.take()
+                    lane.dropped += 1
+                else:
+                    lane.blocked += 1
+                    self.waitForSpace(lane)
+            # [event, listeners, enqueue time, coalesce key]
+            entry = [event_obj, listeners, time.perf_counter(), coalesce_key]
+            lane.queue.append(entry)
+            if coalesce_key is not None:
+                lane.pending[coalesce_key] = entry
+            lane.enqueued += 1
+            if len(lane.queue) > lane.maxDepth:
+                lane.maxDepth = len(lane.queue)
+            self.wake(lane)
+        return
+
+    def started(self, lane, entry):
+        # called with lane.cond held, when a worker picks entry up
+        wait = time.perf_counter() - entry[2]
+        lane.waitTime += wait
+        if wait > lane.waitMax:
+            lane.waitMax = wait
+        lane.busy = True
+        return
+
+    def finished(self, lane, elapsed, calls, errors):
+        # called with lane.cond held, once entry has been delivered
+        lane.busy = False
+        lane.delivered += 1
+        lane.handlerCalls += calls
+        lane.errors += errors
+        lane.handlerTime += elapsed
+        if elapsed > lane.handlerMax:
+            lane.handlerMax = elapsed
+        return
+
+    def handlerFailed(self, listener, event_obj, e):
+        # called from the except block, so format_exc has the listener's traceback
+        if self.errorHandler is not None:
+            self.errorHandler(f"[ERROR] Listener {listener!r} failed on {event_obj.event_name}: {e!r}\n"
+                              + traceback.format_exc())
+        return
+
+    def getStats(self):
+        lanes = self.lanes
+        delivered = sum(lane.delivered for lane in lanes)
+        handlerCalls = sum(lane.handlerCalls for lane in lanes)
+        depths = [len(lane.queue) for lane in lanes]
+        return {
+            "queueDepth":sum(depths),
+            "laneDepths":depths,
+            "maxQueueDepth":max(lane.maxDepth for lane in lanes),
+            "enqueued":sum(lane.enqueued for lane in lanes),
+            "delivered":delivered,
+            "dropped":sum(lane.dropped for lane in lanes),
+            "coalesced":sum(lane.coalesced for lane in lanes),
+            "blocked":sum(lane.blocked for lane in lanes),
+            "errors":sum(lane.errors for lane in lanes),
+            "handlerCalls":handlerCalls,
+            "handlerAvgMs":sum(lane.handlerTime for lane in lanes) / handlerCalls * 1000 if handlerCalls else 0.0,
+            "handlerMaxMs":max(lane.handlerMax for lane in lanes) * 1000,
+            "queueWaitAvgMs":sum(lane.waitTime for lane in lanes) / delivered * 1000 if delivered else 0.0,
+            "queueWaitMaxMs":max(lane.waitMax for lane in lanes) * 1000,
+        }
+
+    @abstractmethod
+    def start(self):
+        """Start the workers; events put before that wait in the lanes."""
+
+    @abstractmethod
+    def close(self):
+        """Stop the workers once they have delivered what is queued."""
+
+    @abstractmethod
+    def wake(self, lane):
+        """Tell lane's worker that an event was queued (lane.cond is held)."""
+
+    @abstractmethod
+    def waitForSpace(self, lane):
+        """Apply backpressure while lane is full (lane.cond is held)."""
+
+class ThreadEventPool(SFSEventPool):
+    """
+    One daemon thread per lane. Listeners run off the reactor thread and
+    must do their own locking around shared state. With OVERFLOW_BLOCK a
+    full lane stalls the reactor until its worker catches up, so a
+    listener must not wait on events that are dispatched after its own.
+    """
+
+    def __init__(self, workers = 4, maxQueue = 1024, overflow = OVERFLOW_BLOCK):
+        super(ThreadEventPool, self).__init__(workers, maxQueue, overflow)
+        self.threads = []
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        for i, lane in enumerate(self.lanes):
+            thread = threading.Thread(target = self.work, args = (lane,), name = "SFSEventPool-%d" % i)
+            thread.daemon = True
+            thread.start()
+            self.threads.append(thread)
+        return
+
+    def wake(self, lane):
+        lane.cond.notify_all()
+        return
+
+    def waitForSpace(self, lane):
+        while len(lane.queue) >= self.maxQueue and self.running:
+            lane.cond.wait()
+        return
+
+    def work(self, lane):
+        perf_counter = time.perf_counter
+        while True:
+            with lane.cond:
+                while not lane.queue and self.running:
+                    lane.cond.wait()
+                if not lane.queue:
+                    return
+                entry = lane.take()
+                self.started(lane, entry)
+            event_obj, listeners = entry[0], entry[1]
+            calls = 0
+            errors = 0
+            start = perf_counter()
+            for listener in listeners:
+                calls += 1
+                try:
+                    listener.handleEvent(event_obj)
+                except Exception as e:
+                    errors += 1
+                    self.handlerFailed(listener, event_obj, e)
+            elapsed = perf_counter() - start
+            with lane.cond:
+                self.finished(lane, elapsed, calls, errors)
+                lane.cond.notify_all()
+
+    def drain(self, timeout = None):
+        """
+        Wait until every queued event has been delivered. Returns False if
+        timeout seconds ran out first.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for lane in self.lanes:
+            with lane.cond:
+                while lane.queue or lane.busy:
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        return False
+                    lane.cond.wait(remaining)
+        return True
+
+    def close(self):
+        """
+        Stop the workers once they have delivered what is queued.
+        """
+        self.running = False
+        for lane in self.lanes:
+            with lane.cond:
+                lane.cond.notify_all()
+        for thread in self.threads:
+            thread.join()
+        self.threads = []
+        return
+
+class AsyncioEventPool(SFSEventPool):
+    """
+    One task per lane on an asyncio loop. Listeners may return an
+    awaitable from handleEvent; the lane waits for it before moving on.
+
+    put is called on the loop itself, so OVERFLOW_BLOCK cannot wait there.
+    Instead a full lane still takes the event and calls pauseReading (see
+    setFlowControl, which connectAsync wires to the transport); reading
+    resumes once every lane is back under half of maxQueue.
+    """
+
+    def __init__(self, workers = 4, maxQueue = 1024, overflow = OVERFLOW_BLOCK, loop = None):
+        super(AsyncioEventPool, self).__init__(workers, maxQueue, overflow)
+        self.loop = loop
+        self.tasks = []
+        self.ready = {}
+        # set each time a lane finishes an event, for drain
+        self.progress = None
+        self.pauseReading = None
+        self.resumeReading = None
+        self.paused = False
+
+    def setFlowControl(self, pauseReading, resumeReading):
+        self.pauseReading = pauseReading
+        self.resumeReading = resumeReading
+        return
+
+    def start(self):
+        # without a loop the tasks are created on the first put, which
+        # runs on the loop the client reads from
+        if self.running:
+            return
+        if self.loop is None:
+            try:
+                self.loop = asyncio.get_running_loop()
+            except RuntimeError:
+                return
+        self.running = True
+        self.progress = asyncio.Event()
+        for lane in self.lanes:
+            self.ready[id(lane)] = asyncio.Event()
+            self.tasks.append(self.loop.create_task(self.work(lane)))
+        return
+
+    def put(self, event_obj, listeners):
+        if not self.running:
+            self.start()
+        super(AsyncioEventPool, self).put(event_obj, listeners)
+        return
+
+    def wake(self, lane):
+        self.ready[id(lane)].set()
+        return
+
+    def waitForSpace(self, lane):
+        if not self.paused and self.pauseReading is not None:
+            self.paused = True
+            self.pauseReading()
+        return
+
+    def maybeResume(self):
+        if self.paused and all(len(lane.queue) <= self.maxQueue // 2 for lane in self.lanes):
+            self.paused = False
+            self.resumeReading()
+        return
+
+    async def work(self, lane):
+        ready = self.ready[id(lane)]
+        perf_counter = time.perf_counter
+        while self.running or lane.queue:
+            if not lane.queue:
+                ready.clear()
+                await ready.wait()
+                continue
+            with lane.cond:
+                entry = lane.take()
+                self.started(lane, entry)
+            event_obj, listeners = entry[0], entry[1]
+            calls = 0
+            errors = 0
+            start = perf_counter()
+            for listener in listeners:
+                calls += 1
+                try:
+                    result = listener.handleEvent(event_obj)
+                    if inspect.isawaitable(result):
+                        await result
+                except Exception as e:
+                    errors += 1
+                    self.handlerFailed(listener, event_obj, e)
+            elapsed = perf_counter() - start
+            with lane.cond:
+                self.finished(lane, elapsed, calls, errors)
+            self.progress.set()
+            self.maybeResume()
+        return
+
+    async def drain(self):
+        """
+        Wait until every queued event has been delivered.
+        """
+        while any(lane.queue or lane.busy for lane in self.lanes):
+            self.progress.clear()
+            await self.progress.wait()
+        return
+
+    def close(self):
+        """
+        Stop the lane tasks once they have delivered what is queued.
+        """
+        self.running = False
+        for event in self.ready.values():
+            event.set()
+        self.tasks = []
+        self.ready = {}
+        if self.paused:
+            self.paused = False
+            self.resumeReading()
+        return
@@ -0,0 +1,294 @@
+# -*- coding:utf-8 -*-
+'''
+Created on 2026-10-18
+'''
+
+import os
+import sys
+import time
+import queue
+import asyncio
+import importlib
+import traceback
+import multiprocessing
+from it.gotoandplay.smartfoxclient import SmartFoxClient
+from it.gotoandplay.smartfoxclient.sfsevent import SFSEvent
+
+class Scenario(object):
+    """
+    Script of one bot session. A fleet worker builds one Scenario per
+    session, connects its client, waits for onConnection and then awaits
+    run(). Whatever getMetrics() returns is shipped back to the parent:
+    numbers are summed and averaged over sessions, lists of numbers are
+    merged and reported as percentiles.
+
+    Subclasses have to be importable by module path, since workers are
+    separate processes that import them by name.
+    """
+
+    def __init__(self, sfc, index, config):
+        self.sfc = sfc
+        self.index = index
+        self.config = config
+        # event name -> futures waiting for it
+        self.waiters = {}
+
+    def expect(self, event_name):
+        """
+        Return a future resolved with the next event_name event. Call it
+        before the request that triggers the event, so the answer cannot
+        slip in first.
+        """
+        if event_name not in self.waiters:
+            self.waiters[event_name] = []
+            self.sfc.addEventListener(event_name, self)
+        future = asyncio.get_running_loop().create_future()
+        self.waiters[event_name].append(future)
+        return future
+
+    async def waitFor(self, event_name, timeout = None):
+        return await asyncio.wait_for(self.expect(event_name), timeout)
+
+    def handleEvent(self, evt):
+        futures = self.waiters.get(evt.getName())
+        if futures:
+            self.waiters[evt.getName()] = []
+            for future in futures:
+                if not future.done():
+                    future.set_result(evt)
+        return
+
+    async def run(self):
+        raise NotImplementedError
+
+    def getMetrics(self):
+        return {}
+
+def scenarioPath(scenario):
+    if isinstance(scenario, str):
+        return scenario
+    return scenario.__module__ + ":" + scenario.__qualname__
+
+def loadScenario(path):
+    module_name, _, attr = path.partition(":")
+    obj = importlib.import_module(module_name)
+    for name in attr.split("."):
+        obj = getattr(obj, name)
+    return obj
+
+def residentBytes():
+    """
+    Resident set size of this process, or None where it cannot be read.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    # peak rather than current, in KB on Linux and bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == "darwin" else rss * 1024
+
+def clientTraffic(sfc):
+    stats = sfc.getStats()
+    return {
+        "framesIn":sum(stats.get("framesIn", {}).values()),
+        "framesOut":sum(stats.get("framesOut", {}).values()),
+        "bytesIn":sum(stats.get("bytesIn", {}).values()),
+        "bytesOut":sum(stats.get("bytesOut", {}).values()),
+    }
+
+async def runSession(scenario_cls, index, host, port, config, timeout):
+    sfc = SmartFoxClient()
+    scenario = scenario_cls(sfc, index, config)
+    result = {"session":index, "ok":False, "error":None}
+    start = time.perf_counter()
+    try:
+        connected = scenario.expect(SFSEvent.onConnection)
+        await asyncio.wait_for(sfc.connectAsync(host, port), timeout)
+        await asyncio.wait_for(connected, timeout)
+        result["connectMs"] = (time.perf_counter() - start) * 1000
+        await asyncio.wait_for(scenario.run(), timeout)
+        result["ok"] = True
+    except Exception as e:
+        result["error"] = "%s: %s" % (e.__class__.__name__, e)
+    result["runMs"] = (time.perf_counter() - start) * 1000
+    try:
+        result.update(scenario.getMetrics())
+    except Exception as e:
+        result["error"] = result["error"] or "getMetrics: %r" % e
+    result.update(clientTraffic(sfc))
+    return sfc, result
+
+async def runShard(workerId, sessionIds, host, port, path, config, timeout, connectRate):
+    scenario_cls = loadScenario(path)
+    tasks = []
+    for n, index in enumerate(sessionIds):
+        if connectRate and n:
+            await asyncio.sleep(1.0 / connectRate)
+        tasks.append(asyncio.ensure_future(runSession(scenario_cls, index, host, port, config, timeout)))
+    done = await asyncio.gather(*tasks)
+    # measured while every client is still alive
+    rss = residentBytes()
+    for sfc, result in done:
+        result["worker"] = workerId
+        sfc.disconnect()
+    await asyncio.sleep(0)
+    return [result for sfc, result in done], rss
+
+def fleetWorker(workerId, sessionIds, host, port, path, config, timeout, connectRate, results):
+    """
+    Entry point of a worker process: run its shard of sessions on one
+    asyncio loop and put a single report on results.
+    """
+    report = {"worker":workerId, "pid":os.getpid(), "sessions":[], "error":None}
+    rssBase = residentBytes()
+    cpuStart = time.process_time()
+    wallStart = time.perf_counter()
+    try:
+        report["sessions"], rss = asyncio.run(runShard(workerId, sessionIds, host, port, path, config,
+                                                       timeout, connectRate))
+        report["rssBase"] = rssBase
+        report["rss"] = rss
+    except Exception:
+        report["error"] = traceback.format_exc()
+    report["cpuSeconds"] = time.process_time() - cpuStart
+    report["wallSeconds"] = time.perf_counter() - wallStart
+    results.put(report)
+    return
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100.0 * (len(values) - 1))))]
+
+class SFSFleet(object):
+    """
+    Shards N SmartFoxClient sessions over a number of worker processes.
+    Workers share nothing: session i goes to worker i % workers, which
+    runs all of its sessions on one asyncio loop with connectAsync, so a
+    host needs one process per core instead of one per bot.
+
+    scenario is a Scenario subclass or its "module:Class" path; config is
+    handed to every session and has to be picklable. Workers are spawned,
+    not forked, so clients never inherit a parent's loop or reactor.
+    """
+
+    def __init__(self, host, port, scenario, sessions, workers = None, config = None,
+                 timeout = 120.0, connectRate = None):
+        if workers is None:
+            workers = os.cpu_count() or 1
+        self.host = host
+        self.port = port
+        self.scenario = scenarioPath(scenario)
+        self.sessions = sessions
+        self.workers = max(1, min(workers, sessions))
+        self.config = config
+        self.timeout = timeout
+        # new connections per second per worker, None for all at once
+        self.connectRate = connectRate
+
+    def shards(self):
+        return [list(range(w, self.sessions, self.workers)) for w in range(self.workers)]
+
+    def run(self):
+        """
+        Run the fleet to completion and return the aggregated report.
+        """
+        context = multiprocessing.get_context("spawn")
+        results = context.Queue()
+        processes = []
+        start = time.perf_counter()
+        for workerId, sessionIds in enumerate(self.shards()):
+            process = context.Process(target = fleetWorker, name = "sfsfleet-%d" % workerId,
+                                      args = (workerId, sessionIds, self.host, self.port, self.scenario,
+                                              self.config, self.timeout, self.connectRate, results))
+            process.start()
+            processes.append(process)
+        reports = []
+        # a worker that dies never reports, so stop waiting once they are all gone
+        while len(reports) < len(processes):
+            try:
+                reports.append(results.get(timeout = 0.5))
+            except queue.Empty:
+                if not any(process.is_alive() for process in processes) and results.empty():
+                    break
+        for process in processes:
+            process.join()
+        wall = time.perf_counter() - start
+        for workerId, process in enumerate(processes):
+            if workerId not in [report["worker"] for report in reports]:
+                reports.append({"worker":workerId, "pid":process.pid, "sessions":[], "cpuSeconds":0.0,
+                                "wallSeconds":wall, "error":"exited with code %s" % process.exitcode})
+        return self.aggregate(reports, wall)
+
+    def aggregate(self, reports, wall):
+        sessions = [session for report in reports for session in report["sessions"]]
+        numbers = {}
+        samples = {}
+        for session in sessions:
+            for key, value in session.items():
+                if key in ("session", "worker", "ok", "error"):
+                    continue
+                if isinstance(value, bool):
+                    continue
+                if isinstance(value, (int, float)):
+                    numbers.setdefault(key, []).append(value)
+                elif isinstance(value, (list, tuple)):
+                    samples.setdefault(key, []).extend(value)
+        metrics = {}
+        for key, values in numbers.items():
+            metrics[key] = {"sum":sum(values), "mean":float(sum(values)) / len(values),
+                            "min":min(values), "max":max(values)}
+        for key, values in samples.items():
+            metrics[key] = {"count":len(values), "p50":percentile(values, 50), "p90":percentile(values, 90),
+                            "p99":percentile(values, 99), "max":max(values) if values else 0.0}
+        messages = sum(numbers.get("framesIn", [])) + sum(numbers.get("framesOut", []))
+        cpu = sum(report.get("cpuSeconds", 0.0) for report in reports)
+        rssGrowth = [report["rss"] - report["rssBase"] for report in reports
+                     if report.get("rss") is not None and report.get("rssBase") is not None]
+        measured = sum(len(report["sessions"]) for report in reports if report.get("rss") is not None)
+        return {
+            "sessions":len(sessions),
+            "succeeded":len([session for session in sessions if session["ok"]]),
+            "failed":len([session for session in sessions if not session["ok"]]),
+            "errors":[(session["session"], session["error"]) for session in sessions if session["error"]],
+            "workerErrors":[(report["worker"], report["error"]) for report in reports if report["error"]],
+            "workers":len(reports),
+            "wallSeconds":wall,
+            "cpuSeconds":cpu,
+            "messages":messages,
+            "messagesPerSecond":messages / wall if wall else 0.0,
+            "cpuMsPer1kMessages":cpu * 1000.0 / messages * 1000 if messages else 0.0,
+            "memoryPerSessionKB":sum(rssGrowth) / 1024.0 / measured if measured else None,
+            "rssTotalMB":sum(report.get("rss") or 0 for report in reports) / 1048576.0,
+            "metrics":metrics,
+            "perSession":sessions,
+        }
+
+def printReport(report):
+    print("sessions %d (%d ok, %d failed) on %d workers in %.2f s" % (
+        report["sessions"], report["succeeded"], report["failed"], report["workers"], report["wallSeconds"]))
+    print("messages %d, %.0f msg/s, CPU %.2f s, %.1f ms CPU per 1k messages" % (
+        report["messages"], report["messagesPerSecond"], report["cpuSeconds"], report["cpuMsPer1kMessages"]))
+    if report["memoryPerSessionKB"] is not None:
+        print("memory %.1f KB per session, %.1f MB resident over all workers" % (
+            report["memoryPerSessionKB"], report["rssTotalMB"]))
+    for key in sorted(report["metrics"]):
+        metric = report["metrics"][key]
+        if "sum" in metric:
+            print("  %-16s sum %12.1f  mean %10.2f  min %10.2f  max %10.2f" % (
+                key, metric["sum"], metric["mean"], metric["min"], metric["max"]))
+        else:
+            print("  %-16s n %8d  p50 %10.3f  p90 %10.3f  p99 %10.3f  max %10.3f" % (
+                key, metric["count"], metric["p50"], metric["p90"], metric["p99"], metric["max"]))
+    for session, error in report["errors"][:10]:
+        print("  session %d: %s" % (session, error))
+    for worker, error in report["workerErrors"]:
+        print("  worker %d: %s" % (worker, error))
+    return
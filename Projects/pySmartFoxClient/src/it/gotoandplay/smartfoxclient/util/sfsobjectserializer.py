@@ -5,32 +5,43 @@ Created on 2010-11-16
 @author: leenjewel
 '''
 
+import re
+from xml.parsers import expat
 from it.gotoandplay.utils.xmllib import XMLObj
 
 class SFSObjectSerializer(object):
-    
+
     asciiTable_e = {
-        ">":"&gt",
-        "<":"&lt",
-        "&":"&amp",
-        "'":"&apos",
-        "\\":"&quot",
-        "\n":"",
-        "\t":"",
-        "\r":"",
+        ">":"&gt;",
+        "<":"&lt;",
+        "&":"&amp;",
+        "'":"&apos;",
+        "\"":"&quot;",
+        "\n":"&#10;",
+        "\t":"&#9;",
+        "\r":"&#13;",
     }
     asciiTable_d = {
-        "&gt":">",
-        "&lt":"<",
-        "&amp":"&",
-        "&apos":"'",
-        "&quot":"\\",
+        "&gt;":">",
+        "&lt;":"<",
+        "&amp;":"&",
+        "&apos;":"'",
+        "&quot;":"\"",
+        "&#10;":"\n",
+        "&#9;":"\t",
+        "&#13;":"\r",
     }
-    
+    # "&" has to go first so the entities added later are left alone
+    entityOrder_e = sorted(asciiTable_e.items(), key = lambda item: item[0] != "&")
+    entitySearch_e = re.compile("[" + re.escape("".join(asciiTable_e)) + "]").search
+
     @staticmethod
     def encodeEntities(in_sb):
-        for s in SFSObjectSerializer.asciiTable_e:
-            in_sb = in_sb.replace(s, "")
+        if not SFSObjectSerializer.entitySearch_e(in_sb):
+            return in_sb
+        for s, entity in SFSObjectSerializer.entityOrder_e:
+            if s in in_sb:
+                in_sb = in_sb.replace(s, entity)
         return in_sb
 
     @staticmethod
@@ -39,30 +50,140 @@ class SFSObjectSerializer(object):
             return XMLObj.build_from_str(SFSObjectSerializer.obj2xml(sfsobj, 0, "", None))
         else:
             return SFSObjectSerializer.obj2xml(sfsobj, 0, "", None)
-    
+
+    @staticmethod
+    def deserialize(xml_str):
+        """
+        Turn a <dataObj> string back into a dict.
+        """
+        return SFSObjectDecoder().parse(xml_str)
+
     @staticmethod
     def obj2xml(ao, depth, nodeName, xmlData = None):
-        if xmlData is None:
-            xmlData = ""
+        """
+        Encode ao in one pass into a list of parts. dicts become t='o'
+        objects, lists and tuples t='a' arrays, None is t='x' and ints,
+        floats, strs and bools keep their SmartFoxServer types.
+        """
+        encode = SFSObjectSerializer.encodeEntities
+        parts = []
+        append = parts.append
+        if xmlData:
+            parts.append(xmlData)
         if depth == 0:
-            xmlData += "<dataObj>"
+            parts.append("<dataObj>")
+            closing = ["</dataObj>"]
         else:
-            xmlData += "<obj o='" + nodeName + "' t='a'>"
-        for key, o in ao.items():
-            if not o:
-                xmlData += "<var n='" + str(key) + "' t='x' />"
-            elif isinstance(o, dict):
-                xmlData = SFSObjectSerializer.obj2xml(o, depth + 1, key, xmlData)
-                xmlData += "</obj>"
-            elif isinstance(o, float):
-                xmlData += "<var n='" + key + "' t='n'>" + str(o) + "</var>"
-            elif isinstance(o, str):
-                xmlData += "<var n='" + key + "' t='s'>" + SFSObjectSerializer.encodeEntities(str(o)) + "</var>"
-            elif isinstance(o, bool):
-                if o:
-                    xmlData += "<var n='" + key + "' t='b'>1</var>"
+            parts.append("<obj o='" + encode(str(nodeName)) + "' t='" + SFSObjectSerializer.objType(ao) + "'>")
+            closing = ["</obj>"]
+        stack = [SFSObjectSerializer.objItems(ao)]
+        while stack:
+            for key, o in stack[-1]:
+                if isinstance(key, str):
+                    key = encode(key)
                 else:
-                    xmlData += "<var n='" + key + "' t='b'>0</var>"
-        if depth == 0:
-            xmlData += "</dataObj>"
-        return xmlData
\ No newline at end of file
+                    key = str(key)
+                if isinstance(o, str):
+                    append("<var n='" + key + "' t='s'>" + encode(o) + "</var>")
+                elif o is None:
+                    append("<var n='" + key + "' t='x' />")
+                elif o is True:
+                    append("<var n='" + key + "' t='b'>1</var>")
+                elif o is False:
+                    append("<var n='" + key + "' t='b'>0</var>")
+                elif isinstance(o, (int, float)):
+                    append("<var n='" + key + "' t='n'>" + str(o) + "</var>")
+                elif isinstance(o, dict):
+                    append("<obj o='" + key + "' t='o'>")
+                    closing.append("</obj>")
+                    stack.append(iter(o.items()))
+                    break
+                elif isinstance(o, (list, tuple)):
+                    append("<obj o='" + key + "' t='a'>")
+                    closing.append("</obj>")
+                    stack.append(enumerate(o))
+                    break
+            else:
+                stack.pop()
+                append(closing.pop())
+        return "".join(parts)
+
+    @staticmethod
+    def objType(o):
+        if isinstance(o, dict):
+            return "o"
+        return "a"
+
+    @staticmethod
+    def objItems(o):
+        if isinstance(o, dict):
+            return iter(o.items())
+        return enumerate(o)
+
+class SFSObjectDecoder(object):
+    """
+    Streaming expat decoder for the <dataObj> format written by
+    SFSObjectSerializer.obj2xml.
+    """
+
+    def __init__(self):
+        self.root = None
+        self.stack = []
+        self.var = None
+        self.chunks = []
+
+    def parse(self, xml_str):
+        parser = expat.ParserCreate()
+        parser.buffer_text = True
+        parser.StartElementHandler = self.start_element
+        parser.EndElementHandler = self.end_element
+        parser.CharacterDataHandler = self.chunks.append
+        parser.Parse(xml_str, True)
+        return self.root
+
+    def start_element(self, name, attrs):
+        if name == "var":
+            self.var = (attrs.get("n"), attrs.get("t"))
+            del self.chunks[:]
+        elif name == "obj":
+            self.stack.append((attrs.get("o"), attrs.get("t"), {}))
+        elif name == "dataObj":
+            self.stack.append((None, "o", {}))
+        return
+
+    def end_element(self, name):
+        if name == "var":
+            key, var_type = self.var
+            self.var = None
+            self.stack[-1][2][key] = self.decodeValue(var_type, "".join(self.chunks))
+        elif name in ("obj", "dataObj"):
+            key, obj_type, items = self.stack.pop()
+            value = items
+            if obj_type == "a":
+                value = self.toList(items)
+            if self.stack:
+                self.stack[-1][2][key] = value
+            else:
+                self.root = value
+        return
+
+    @staticmethod
+    def decodeValue(var_type, data):
+        if var_type == "n":
+            try:
+                return int(data)
+            except ValueError:
+                return float(data)
+        if var_type == "b":
+            return data == "1"
+        if var_type == "x":
+            return None
+        return data
+
+    @staticmethod
+    def toList(items):
+        try:
+            indexes = sorted([(int(key), key) for key in items])
+        except ValueError:
+            return items
+        return [items[key] for index, key in indexes]
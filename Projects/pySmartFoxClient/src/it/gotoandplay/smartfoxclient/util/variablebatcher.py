@@ -0,0 +1,190 @@
+# -*- coding:utf-8 -*-
+'''
+Created on 2026-10-18
+'''
+
+from it.gotoandplay.smartfoxclient.data.roomvariablerequest import RoomVariableRequest
+
+class VariableBatcher(object):
+    """
+    Turns setRoomVariables, setUserVariables and setBuddyVariables calls
+    into messages carrying only the variables that changed.
+
+    Each variable is compared with what the client already holds (the
+    room's or own user's variables, myBuddyVars) and with what is still
+    waiting to go out, and dropped when the value is the same. With a
+    window (seconds) the changes made within it are merged per target
+    and sent as one message when it expires; with window None they go
+    out right away. The cache is updated when a message is sent, so the
+    next call diffs against it without waiting for the server's echo.
+
+    The server does not echo the private/persistent flags of room
+    variables, so the flags last sent are kept here and a change of flag
+    alone is sent like a change of value. Before connect() changes stay
+    pending and go out with the first flush once there is a socket.
+
+    bytesNaive counts what sending every variable of every call would
+    have cost, bytesSent what was really sent.
+    """
+
+    DEFAULT_FLAGS = ("0", "0")
+
+    def __init__(self, sfc, window = None):
+        self.sfc = sfc
+        self.window = window
+        # (action, room id, vars tag) -> (cache, {name: (type, value, flags, xml)})
+        self.pending = {}
+        # (action, room id, name) -> (private, persistent) last sent, when not ("0", "0")
+        self.sentFlags = {}
+        self.flushCall = None
+        self.calls = 0
+        self.messages = 0
+        self.varsSent = 0
+        self.varsSkipped = 0
+        self.bytesSent = 0
+        self.bytesNaive = 0
+
+    @staticmethod
+    def encodeValue(value):
+        """
+        Return (type, value string, private, persistent) in the form
+        SmartFoxServer sends them back. value is a RoomVariableRequest or
+        a plain value; None deletes the variable.
+        """
+        private = persistent = "0"
+        if isinstance(value, RoomVariableRequest):
+            private = value.isPrivate()
+            persistent = value.isPersistent()
+            vType = value.get("type")
+            value = value.getValue()
+            if vType == "boolean":
+                value = value is True or value in ("true", "True", "1", 1)
+            elif vType == "number":
+                return "n", str(value), private, persistent
+            elif vType == "string":
+                return "s", str(value), private, persistent
+            elif vType is not None:
+                value = None
+        if value is None:
+            return "x", "", private, persistent
+        if value is True:
+            return "b", "1", private, persistent
+        if value is False:
+            return "b", "0", private, persistent
+        if isinstance(value, (int, float)):
+            return "n", str(value), private, persistent
+        return "s", str(value), private, persistent
+
+    @staticmethod
+    def roomVarXml(name, vType, value, private, persistent):
+        return ("<var n='" + name + "' t='" + vType + "' pr='" + private + "' pe='" + persistent +
+                "'><![CDATA[" + value + "]]></var>")
+
+    @staticmethod
+    def userVarXml(name, vType, value, private, persistent):
+        return "<var n='" + name + "' t='" + vType + "'><![CDATA[" + value + "]]></var>"
+
+    @staticmethod
+    def buddyVarXml(name, vType, value, private, persistent):
+        return "<var n='" + name + "'><![CDATA[" + value + "]]></var>"
+
+    def isCached(self, cache, key, name, vType, value, flags):
+        if vType == "x":
+            return name not in cache
+        return (cache.get(name) == value and
+                self.sentFlags.get((key[0], key[1], name), self.DEFAULT_FLAGS) == flags)
+
+    def canSend(self):
+        # no socket before connect(): keep the changes pending
+        return getattr(self.sfc, "socket_client", None) is not None
+
+    def envelopeSize(self, action, roomId, varsTag):
+        # the message around the variables, NUL delimiter included
+        empty = self.sfc.makeXmlMessage(self.sfc.MESSAGE_HEADER_SYSTEM, action, roomId, varsTag + "</vars>")
+        return len(empty.encode("utf-8")) + 1
+
+    def update(self, action, roomId, varsTag, cache, variables, toXml):
+        self.calls += 1
+        key = (action, roomId, varsTag)
+        entry = self.pending.get(key)
+        if entry is None:
+            entry = (cache, {})
+        queued = entry[1]
+        naive = self.envelopeSize(action, roomId, varsTag)
+        for name, value in variables.items():
+            vType, value, private, persistent = self.encodeValue(value)
+            flags = (private, persistent)
+            xml = toXml(name, vType, value, private, persistent)
+            naive += len(xml.encode("utf-8"))
+            current = queued.get(name)
+            if current is not None and current[:3] == (vType, value, flags):
+                self.varsSkipped += 1
+            elif self.isCached(cache, key, name, vType, value, flags):
+                # back to what the client holds: nothing left to send
+                if current is not None:
+                    del queued[name]
+                self.varsSkipped += 1
+            else:
+                queued[name] = (vType, value, flags, xml)
+        self.bytesNaive += naive
+        if queued:
+            self.pending[key] = entry
+        elif key in self.pending:
+            del self.pending[key]
+        if self.canSend():
+            if self.window is None:
+                self.flush()
+            elif self.pending and self.flushCall is None:
+                self.flushCall = self.sfc.socket_client.callLater(self.window, self.onWindow)
+        return
+
+    def onWindow(self):
+        self.flushCall = None
+        self.flush()
+        return
+
+    def flush(self):
+        if self.flushCall is not None:
+            self.flushCall.cancel()
+            self.flushCall = None
+        if not self.canSend():
+            return
+        pending = self.pending
+        self.pending = {}
+        for (action, roomId, varsTag), (cache, queued) in pending.items():
+            body = "".join([xml for vType, value, flags, xml in queued.values()])
+            self.sfc.send(self.sfc.MESSAGE_HEADER_SYSTEM, action, roomId, varsTag + body + "</vars>")
+            for name, (vType, value, flags, xml) in queued.items():
+                flagKey = (action, roomId, name)
+                if vType == "x":
+                    cache.pop(name, None)
+                else:
+                    cache[name] = value
+                if vType == "x" or flags == self.DEFAULT_FLAGS:
+                    self.sentFlags.pop(flagKey, None)
+                else:
+                    self.sentFlags[flagKey] = flags
+            self.messages += 1
+            self.varsSent += len(queued)
+            self.bytesSent += self.envelopeSize(action, roomId, varsTag) + len(body.encode("utf-8"))
+        return
+
+    def discard(self):
+        if self.flushCall is not None:
+            self.flushCall.cancel()
+            self.flushCall = None
+        self.pending = {}
+        self.sentFlags = {}
+        return
+
+    def getStats(self):
+        return {
+            "calls":self.calls,
+            "messages":self.messages,
+            "varsSent":self.varsSent,
+            "varsSkipped":self.varsSkipped,
+            "varsPending":sum(len(queued) for cache, queued in self.pending.values()),
+            "bytesSent":self.bytesSent,
+            "bytesNaive":self.bytesNaive,
+            "bytesSaved":self.bytesNaive - self.bytesSent,
+        }
@@ -0,0 +1,76 @@
+# -*- coding:utf-8 -*-
+'''
+Created on 2026-10-18
+'''
+
+import asyncio
+from it.gotoandplay.utils.framebuffer import FrameBuffer, FrameTooLargeError, DEFAULT_MAX_FRAME_SIZE
+
+class SocketClientProtocol(asyncio.Protocol):
+    """
+    asyncio counterpart of twistedsocket.SocketClientProtocol.
+    """
+
+    def __init__(self, factory):
+        self.factory = factory
+        self.transport = None
+        self.frame_buffer = FrameBuffer(factory.max_frame_size)
+
+    def connection_made(self, transport):
+        """
+        Called when a connection is made.
+        """
+        self.transport = transport
+        self.factory.handleEvent("onConnection", self)
+        return
+
+    def data_received(self, data):
+        try:
+            frames = self.frame_buffer.feed(data)
+        except FrameTooLargeError as e:
+            self.factory.handleEvent("printDebug", f"[ERROR] Dropping connection: {e}")
+            self.transport.close()
+            return
+        if frames:
+            if self.factory.capture is not None:
+                self.factory.capture.record(frames)
+            self.factory.handleEvent("onFramesReceived", frames)
+        return
+
+    def connection_lost(self, exc):
+        self.factory.handleEvent("onConnectionLost", exc)
+        return
+
+class SocketClientFactory(object):
+    protocol = SocketClientProtocol
+
+    def __init__(self, max_frame_size = DEFAULT_MAX_FRAME_SIZE, capture = None):
+        self.event_obj = None
+        self.max_frame_size = max_frame_size
+        self.capture = capture
+
+    def buildProtocol(self):
+        return self.protocol(self)
+
+    def addEventListener(self, event_obj):
+        self.event_obj = event_obj
+        return
+
+    def handleEvent(self, func_name, *args, **kwargs):
+        if self.event_obj and hasattr(self.event_obj, func_name):
+            func = getattr(self.event_obj, func_name)
+            func(*args, **kwargs)
+        return
+
+async def build_connect(event_obj, server_host, server_port, loop = None, max_frame_size = DEFAULT_MAX_FRAME_SIZE, capture = None):
+    """
+    Open a connection on loop (the running loop by default) and return the
+    protocol. Unlike twistedsocket.build_connect this never blocks the loop,
+    so any number of clients can share it.
+    """
+    if loop is None:
+        loop = asyncio.get_running_loop()
+    socket_client_factory = SocketClientFactory(max_frame_size, capture)
+    socket_client_factory.addEventListener(event_obj)
+    transport, protocol = await loop.create_connection(socket_client_factory.buildProtocol, server_host, server_port)
+    return protocol
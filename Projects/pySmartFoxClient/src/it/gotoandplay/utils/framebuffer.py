@@ -0,0 +1,62 @@
+# -*- coding:utf-8 -*-
+'''
+Created on 2026-10-18
+'''
+
+DEFAULT_MAX_FRAME_SIZE = 16 * 1024 * 1024
+
+class FrameTooLargeError(Exception):
+    pass
+
+class FrameBuffer(object):
+    """
+    Reassembles NUL-delimited frames from a byte stream.
+
+    Only the bytes that arrived since the last feed() are scanned for the
+    delimiter, and the pending partial frame stays in one bytearray, so a
+    frame split over many segments costs O(n) instead of O(n^2).
+    """
+
+    def __init__(self, max_frame_size = DEFAULT_MAX_FRAME_SIZE):
+        self.buffer = bytearray()
+        self.scan_pos = 0
+        self.max_frame_size = max_frame_size
+
+    def __len__(self):
+        return len(self.buffer)
+
+    def clear(self):
+        del self.buffer[:]
+        self.scan_pos = 0
+        return
+
+    def feed(self, data):
+        """
+        Append data and return the list of completed frames as str.
+        """
+        buf = self.buffer
+        buf += data
+        frames = []
+        pos = buf.find(b"\0", self.scan_pos)
+        if pos >= 0:
+            start = 0
+            view = memoryview(buf)
+            try:
+                while pos >= 0:
+                    if self.max_frame_size and pos - start > self.max_frame_size:
+                        break
+                    if pos > start:
+                        frames.append(str(view[start:pos], "utf-8"))
+                    start = pos + 1
+                    pos = buf.find(b"\0", start)
+            finally:
+                view.release()
+            if pos >= 0:
+                self.clear()
+                raise FrameTooLargeError("frame over %d bytes" % self.max_frame_size)
+            del buf[:start]
+        self.scan_pos = len(buf)
+        if self.max_frame_size and self.scan_pos > self.max_frame_size:
+            self.clear()
+            raise FrameTooLargeError("partial frame over %d bytes" % self.max_frame_size)
+        return frames
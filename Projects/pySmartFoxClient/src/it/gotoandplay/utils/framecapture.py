@@ -0,0 +1,70 @@
+# -*- coding:utf-8 -*-
+'''
+Created on 2026-10-18
+'''
+
+import time
+import struct
+
+CAPTURE_MAGIC = b"SFSCAP1\n"
+# receive time (epoch seconds, double) and frame length in bytes
+RECORD_HEADER = struct.Struct("<dI")
+
+class CaptureFormatError(Exception):
+    pass
+
+class FrameCapture(object):
+    """
+    Append-only recorder of inbound frames.
+
+    The file starts with CAPTURE_MAGIC followed by one record per frame:
+    a RECORD_HEADER and the utf-8 frame without its NUL delimiter. Each
+    batch is flushed as it is written, so a capture survives the client
+    dying mid session, and several sessions may append to one file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "ab")
+        if self.file.tell() == 0:
+            self.file.write(CAPTURE_MAGIC)
+        self.frames = 0
+        self.bytes = 0
+
+    def record(self, frames, timestamp = None):
+        if timestamp is None:
+            timestamp = time.time()
+        chunks = []
+        for frame in frames:
+            data = frame.encode("utf-8")
+            chunks.append(RECORD_HEADER.pack(timestamp, len(data)))
+            chunks.append(data)
+            self.bytes += len(data)
+        self.frames += len(frames)
+        self.file.write(b"".join(chunks))
+        self.file.flush()
+        return
+
+    def close(self):
+        if not self.file.closed:
+            self.file.close()
+        return
+
+def read_capture(path):
+    """
+    Yield (timestamp, frame) for every record in a capture file. A record
+    cut short by a crash ends the capture instead of raising.
+    """
+    with open(path, "rb") as f:
+        if f.read(len(CAPTURE_MAGIC)) != CAPTURE_MAGIC:
+            raise CaptureFormatError("%s is not a frame capture" % path)
+        header_size = RECORD_HEADER.size
+        while True:
+            header = f.read(header_size)
+            if len(header) < header_size:
+                return
+            timestamp, length = RECORD_HEADER.unpack(header)
+            data = f.read(length)
+            if len(data) < length:
+                return
+            yield timestamp, data.decode("utf-8")
@@ -0,0 +1,91 @@
+# -*- coding:utf-8 -*-
+'''
+Created on 2026-10-18
+'''
+
+DEFAULT_BATCH_BYTES = 16 * 1024
+
+class SendQueue(object):
+    """
+    Coalesces outbound frames into as few transport writes as possible.
+
+    With window set to None every frame is written straight through. With a
+    window (seconds) frames are held until the window expires or
+    max_bytes are pending, then written with a single call.
+    """
+
+    def __init__(self, write, call_later, window = None, max_bytes = DEFAULT_BATCH_BYTES):
+        self.write = write
+        self.call_later = call_later
+        self.window = window
+        self.max_bytes = max_bytes
+        self.pending = []
+        self.pending_bytes = 0
+        self.flush_call = None
+        self.flushes = 0
+        self.messages = 0
+        self.bytes = 0
+        self.last_flush_messages = 0
+        self.last_flush_bytes = 0
+
+    def put(self, data):
+        if self.window is None:
+            self.write(data)
+            self.count_flush(1, len(data))
+            return
+        self.pending.append(data)
+        self.pending_bytes += len(data)
+        if self.pending_bytes >= self.max_bytes:
+            self.flush()
+        elif self.flush_call is None:
+            self.flush_call = self.call_later(self.window, self.on_window)
+        return
+
+    def on_window(self):
+        self.flush_call = None
+        self.flush()
+        return
+
+    def flush(self):
+        if self.flush_call is not None:
+            self.flush_call.cancel()
+            self.flush_call = None
+        if not self.pending:
+            return
+        pending = self.pending
+        self.pending = []
+        self.pending_bytes = 0
+        data = b"".join(pending)
+        self.write(data)
+        self.count_flush(len(pending), len(data))
+        return
+
+    def discard(self):
+        if self.flush_call is not None:
+            self.flush_call.cancel()
+            self.flush_call = None
+        self.pending = []
+        self.pending_bytes = 0
+        return
+
+    def count_flush(self, messages, nbytes):
+        self.flushes += 1
+        self.messages += messages
+        self.bytes += nbytes
+        self.last_flush_messages = messages
+        self.last_flush_bytes = nbytes
+        return
+
+    def get_stats(self):
+        flushes = self.flushes or 1
+        return {
+            "flushes":self.flushes,
+            "messages":self.messages,
+            "bytes":self.bytes,
+            "messagesPerFlush":float(self.messages) / flushes,
+            "bytesPerFlush":float(self.bytes) / flushes,
+            "lastFlushMessages":self.last_flush_messages,
+            "lastFlushBytes":self.last_flush_bytes,
+            "pendingMessages":len(self.pending),
+            "pendingBytes":self.pending_bytes,
+        }
@@ -7,31 +7,38 @@ Created on 2010-11-12
 
 from twisted.internet import protocol
 from twisted.internet import reactor
+from it.gotoandplay.utils.framebuffer import FrameBuffer, FrameTooLargeError, DEFAULT_MAX_FRAME_SIZE
 
 class SocketClientProtocol(protocol.Protocol):
 
-    received_data = b""
+    frame_buffer = None
 
     def connectionMade(self):
         """
         Called when a connection is made.
         """
+        self.frame_buffer = FrameBuffer(self.factory.max_frame_size)
         self.factory.handleEvent("onConnection", self)
         return
 
     def dataReceived(self, data):
-        self.received_data += data
-        
-        datas = self.received_data.split(b"\0")
-        
-        self.received_data = datas[-1]
-        
-        for data_bytes in datas[:-1]:
-            self.factory.handleEvent("onDataReceived", data_bytes.decode('utf-8'))
+        try:
+            frames = self.frame_buffer.feed(data)
+        except FrameTooLargeError as e:
+            self.factory.handleEvent("printDebug", f"[ERROR] Dropping connection: {e}")
+            self.transport.loseConnection()
+            return
+        if frames:
+            if self.factory.capture is not None:
+                self.factory.capture.record(frames)
+            self.factory.handleEvent("onFramesReceived", frames)
         return
 
 class SocketClientFactory(protocol.ClientFactory):
     protocol = SocketClientProtocol
+    max_frame_size = DEFAULT_MAX_FRAME_SIZE
+    # a framecapture.FrameCapture recording every inbound frame, or None
+    capture = None
     
     def addEventListener(self, event_obj):
         self.event_obj = event_obj
@@ -43,10 +50,14 @@ class SocketClientFactory(protocol.ClientFactory):
             func(*args, **kwargs)
         return
 
-def build_connect(event_obj, server_host, server_port):
+def build_connect(event_obj, server_host, server_port, max_frame_size = DEFAULT_MAX_FRAME_SIZE, capture = None):
     socket_client_factory = SocketClientFactory()
+    socket_client_factory.max_frame_size = max_frame_size
+    socket_client_factory.capture = capture
     socket_client_factory.addEventListener(event_obj)
     reactor.connectTCP(server_host, server_port, socket_client_factory)
     reactor.run()
     return
 
+def call_later(delay, func):
+    return reactor.callLater(delay, func)
@@ -121,24 +121,51 @@ class XMLBase(object):
         return self
 
 class XMLObj(XMLBase):
+    """
+    Attribute style access to direct children: xml_obj.body.rmList.rm.
+
+    Children are wrapped on first touch only. The first lookup on a node
+    indexes its direct child elements by name and caches them as plain
+    attributes; same named children hang off the first one as
+    my_brothers. Deeper descendants are only reached through their
+    parents (or get_elements).
+    """
     def __init__(self, root_element, xml_dom):
         self.xml_dom = xml_dom
+        self.root_element = root_element
         self.my_name = root_element.nodeName
-        self.my_childs = []
         self.my_brothers = [self]
         self.node_index = 0
-        for child_e in root_element.childNodes:
-            if child_e.nodeType == child_e.ELEMENT_NODE:
-                node_name = child_e.nodeName
-                self.add_xml_obj(node_name, child_e, self.xml_dom)
-        if len(self.my_brothers)<=1:
-            self.root_element = root_element
+        self.my_index = None
+        self.my_attr = None
 
     @classmethod
     def build_from_str(cls, xml_str):
         xml_base = XMLBase.build_from_str(xml_str)
         return cls(xml_base.root_element, xml_base.xml_dom)
     
+    def index_children(self):
+        if self.my_index is None:
+            self.my_index = {}
+            for child_e in self.root_element.childNodes:
+                if child_e.nodeType == child_e.ELEMENT_NODE:
+                    self.add_xml_obj(child_e.nodeName, child_e, self.xml_dom)
+        return self.my_index
+    
+    def get_attribute(self):
+        if self.my_attr is None:
+            self.my_attr = XMLBase.get_attribute(self)
+        return self.my_attr
+    xml_attr = property(get_attribute)
+    
+    def set_attribute(self, e_dict):
+        self.my_attr = None
+        return XMLBase.set_attribute(self, e_dict)
+    
+    @property
+    def my_childs(self):
+        return list(self.index_children().keys())
+    
     def append(self, xml_obj):
         if xml_obj.root_element.nodeName == self.my_name:
             self.my_brothers.append(xml_obj)
@@ -165,18 +192,14 @@ class XMLObj(XMLBase):
         return self.__next__()
     
     def __getattr__(self, attr):
-        elements = self.get_elements(attr)
-        if elements:
-            element = XMLObj(elements[0].root_element, self.xml_dom)
-            for em in elements[1:]:
-                element.my_brothers.append(XMLObj(em.root_element, self.xml_dom))
-            return element
-        else:
-            return None
+        if attr.startswith("__") or attr in ("my_index", "my_attr"):
+            raise AttributeError(attr)
+        return self.index_children().get(attr)
     
     def __setitem__(self, item_key, item_value):
         new_element = self.add_element(item_key, e_text = item_value)
-        self.add_xml_obj(item_key, new_element, self.xml_dom)
+        if self.my_index is not None:
+            self.add_xml_obj(item_key, new_element, self.xml_dom)
         return None
     
     def add_xml_obj(self, node_name, xml_o, xml_dom):
@@ -184,12 +207,18 @@ class XMLObj(XMLBase):
             xml_obj = XMLObj(xml_o, self.xml_dom)
         else:
             xml_obj = XMLObj(xml_o.root_element, self.xml_dom)
-        if hasattr(self, node_name):
-            getattr(self, node_name).append(xml_obj)
+        first = self.my_index.get(node_name)
+        if first is None:
+            self.my_index[node_name] = xml_obj
+            # cache as a plain attribute so later reads skip __getattr__
+            if node_name not in XMLObj.reserved_names:
+                self.__dict__[node_name] = xml_obj
         else:
-            setattr(self, node_name, xml_obj)
-            self.my_childs.append(node_name)
+            first.append(xml_obj)
         return None
     
     def get(self, key, default_value):
-        return self.__dict__.get(key, default_value)
\ No newline at end of file
+        return self.index_children().get(key, default_value)
+
+XMLObj.reserved_names = frozenset(dir(XMLObj)) | frozenset(
+    ["xml_dom", "root_element", "my_name", "my_brothers", "node_index", "my_index", "my_attr"])
@@ -0,0 +1,211 @@
+# -*- coding:utf-8 -*-
+'''
+Created on 2026-10-18
+'''
+
+from xml.parsers import expat
+from xml.sax.saxutils import escape, quoteattr
+from it.gotoandplay.utils.xmllib import XMLObj
+
+PARSER_EXPAT = "expat"
+PARSER_MINIDOM = "minidom"
+
+class XMLNode(object):
+    """
+    Read-only element built straight from expat events.
+
+    Offers the read side of XMLObj (attribute style child access, xml_attr,
+    get_text/get_cdata/get_data and iteration over same named brothers)
+    without building a DOM or wrapping nodes on every access.
+    """
+    __slots__ = ("my_name", "xml_attr", "my_nodes", "my_index", "my_brothers", "my_text", "my_cdata")
+
+    def __init__(self, name, attrs):
+        self.my_name = name
+        self.xml_attr = attrs
+        self.my_nodes = None
+        self.my_index = None
+        self.my_brothers = None
+        self.my_text = None
+        self.my_cdata = None
+
+    @classmethod
+    def build_from_str(cls, xml_str):
+        return XMLNodeBuilder().parse(xml_str)
+
+    def add_node(self, node):
+        if self.my_nodes is None:
+            self.my_nodes = [node]
+            self.my_index = {node.my_name:node}
+            return
+        self.my_nodes.append(node)
+        first = self.my_index.get(node.my_name)
+        if first is None:
+            self.my_index[node.my_name] = node
+        elif first.my_brothers is None:
+            first.my_brothers = [first, node]
+        else:
+            first.my_brothers.append(node)
+        return
+
+    def iter_descendants(self, e_name):
+        stack = list(reversed(self.my_nodes or ()))
+        while stack:
+            node = stack.pop()
+            if node.my_name == e_name:
+                yield node
+            if node.my_nodes:
+                stack.extend(reversed(node.my_nodes))
+
+    def __getattr__(self, attr):
+        # Like XMLObj, only direct children are reachable as attributes
+        if attr.startswith("__"):
+            raise AttributeError(attr)
+        if self.my_index is None:
+            return None
+        return self.my_index.get(attr)
+
+    def __len__(self):
+        if self.my_brothers is None:
+            return 1
+        return len(self.my_brothers)
+
+    def __iter__(self):
+        if self.my_brothers is None:
+            return iter((self,))
+        return iter(self.my_brothers)
+
+    def __getitem__(self, index):
+        if self.my_brothers is None:
+            return (self,)[index]
+        return self.my_brothers[index]
+
+    def get(self, key, default_value):
+        if self.my_index is None:
+            return default_value
+        return self.my_index.get(key, default_value)
+
+    def get_elements(self, e_name, e_dict = None):
+        result = []
+        for node in self.iter_descendants(e_name):
+            if e_dict:
+                attrs = node.xml_attr
+                if any(attrs.get(key) != value for key, value in e_dict.items()):
+                    continue
+            result.append(node)
+        return result
+
+    def get_element(self, e_name, e_dict = None):
+        result = self.get_elements(e_name, e_dict)
+        if result:
+            return result[0]
+        return None
+
+    def get_text(self):
+        return self.my_text
+
+    def get_cdata(self):
+        return self.my_cdata
+
+    def get_data(self):
+        return self.get_cdata() or self.get_text()
+
+    def get_attribute(self):
+        return self.xml_attr
+
+    def to_string(self):
+        xml_str = "<" + self.my_name
+        for key, value in self.xml_attr.items():
+            xml_str += " " + key + "=" + quoteattr(value)
+        if self.my_nodes is None and self.my_text is None and self.my_cdata is None:
+            return xml_str + "/>"
+        xml_str += ">"
+        if self.my_cdata is not None:
+            xml_str += "<![CDATA[" + self.my_cdata + "]]>"
+        if self.my_text is not None:
+            xml_str += escape(self.my_text)
+        for node in self.my_nodes or ():
+            xml_str += node.to_string()
+        return xml_str + "</" + self.my_name + ">"
+
+    def __repr__(self):
+        return self.to_string()
+
+    def __str__(self):
+        return self.get_text() or self.to_string()
+
+class XMLNodeBuilder(object):
+    """
+    SAX style builder that turns one message into a tree of XMLNode.
+    """
+
+    def __init__(self):
+        self.root = None
+        self.stack = []
+        self.chunks = []
+        self.in_cdata = False
+
+    def parse(self, xml_str):
+        parser = expat.ParserCreate()
+        parser.buffer_text = True
+        parser.StartElementHandler = self.start_element
+        parser.EndElementHandler = self.end_element
+        parser.CharacterDataHandler = self.chunks.append
+        parser.StartCdataSectionHandler = self.start_cdata
+        parser.EndCdataSectionHandler = self.end_cdata
+        parser.Parse(xml_str, True)
+        return self.root
+
+    def flush(self):
+        # Mirrors minidom: the first non blank text node and the first
+        # non blank CDATA section are the only ones XMLObj ever reads.
+        chunks = self.chunks
+        if not chunks and not self.in_cdata:
+            return
+        data = "".join(chunks)
+        del chunks[:]
+        if not self.stack or data.isspace():
+            return
+        node = self.stack[-1]
+        if self.in_cdata:
+            if node.my_cdata is None:
+                node.my_cdata = data
+        elif node.my_text is None:
+            node.my_text = data.strip()
+        return
+
+    def start_element(self, name, attrs):
+        self.flush()
+        node = XMLNode(name, attrs)
+        if self.stack:
+            self.stack[-1].add_node(node)
+        else:
+            self.root = node
+        self.stack.append(node)
+        return
+
+    def end_element(self, name):
+        self.flush()
+        self.stack.pop()
+        return
+
+    def start_cdata(self):
+        self.flush()
+        self.in_cdata = True
+        return
+
+    def end_cdata(self):
+        self.flush()
+        self.in_cdata = False
+        return
+
+XML_PARSERS = {
+    PARSER_EXPAT:XMLNode.build_from_str,
+    PARSER_MINIDOM:XMLObj.build_from_str,
+}
+
+def get_parser(backend = PARSER_EXPAT):
+    """
+    Return the build_from_str function for backend, falling back to minidom.
+    """
+    return XML_PARSERS.get(backend, XMLObj.build_from_str)
@@ -5,26 +5,62 @@ Created on 2010-11-12
 @author: leenjewel
 '''
 
-from it.gotoandplay.utils.twistedsocket import build_connect
+import asyncio
+from it.gotoandplay.utils.twistedsocket import build_connect, call_later
+from it.gotoandplay.utils import asynciosocket
+from it.gotoandplay.utils.framebuffer import DEFAULT_MAX_FRAME_SIZE
+from it.gotoandplay.utils.sendqueue import SendQueue
 
 class XMLSocket(object):
     
-    def __init__(self):
+    def __init__(self, max_frame_size = DEFAULT_MAX_FRAME_SIZE, capture = None):
         self.event_obj = None
         self.socket_client = None
+        self.max_frame_size = max_frame_size
+        self.capture = capture
+        self.send_queue = SendQueue(self.send, self.callLater)
     
     def connect(self, server_host, server_port):
-        build_connect(self, server_host, server_port)
+        build_connect(self, server_host, server_port, self.max_frame_size, self.capture)
+        return
+    
+    def callLater(self, delay, func):
+        return call_later(delay, func)
+    
+    def setBatching(self, window, max_bytes):
+        """
+        Hold outbound frames for up to window seconds or max_bytes and write
+        them together. window None turns batching off.
+        """
+        self.send_queue.flush()
+        self.send_queue.window = window
+        self.send_queue.max_bytes = max_bytes
+        return
+    
+    def flush(self):
+        self.send_queue.flush()
+        return
+    
+    def close(self):
+        """
+        Write what is still queued, then drop the connection.
+        """
+        if self.socket_client and self.socket_client.transport:
+            self.send_queue.flush()
+            self.socket_client.transport.loseConnection()
         return
     
     def send(self, data):
         self.socket_client.transport.write(data)
         return
     
+    def sendMessage(self, message):
+        self.send_queue.put((message + "\0").encode('utf-8'))
+        return
+    
     def sendXMLObj(self, xml_obj):
         try:
-            xml_string = xml_obj.decode('utf-8')
-            self.send((xml_string + "\0").encode('utf-8'))
+            self.sendMessage(xml_obj.to_string())
         except Exception as e:
             print(f"Error sending XML object: {e}")
         return
@@ -38,6 +74,50 @@ class XMLSocket(object):
         self.event_obj.onDataReceived(data)
         return
     
+    def printDebug(self, message):
+        # transport diagnostics go through the client's debug output
+        if hasattr(self.event_obj, "print_debug"):
+            self.event_obj.print_debug(message)
+        return
+    
+    def onFramesReceived(self, frames):
+        onDataReceived = self.event_obj.onDataReceived
+        for data in frames:
+            onDataReceived(data)
+        return
+    
     def addEventListener(self, event_obj):
         self.event_obj = event_obj
         return
+
+class AsyncXMLSocket(XMLSocket):
+    """
+    Drop-in XMLSocket that runs on an asyncio loop instead of the reactor.
+    connect() is a coroutine and returns once the connection is open.
+    """
+    
+    def __init__(self, loop = None, max_frame_size = DEFAULT_MAX_FRAME_SIZE, capture = None):
+        super(AsyncXMLSocket, self).__init__(max_frame_size, capture)
+        self.loop = loop
+    
+    async def connect(self, server_host, server_port):
+        if self.loop is None:
+            self.loop = asyncio.get_running_loop()
+        await asynciosocket.build_connect(self, server_host, server_port, self.loop, self.max_frame_size, self.capture)
+        return
+    
+    def callLater(self, delay, func):
+        return self.loop.call_later(delay, func)
+    
+    def close(self):
+        if self.socket_client and self.socket_client.transport:
+            self.send_queue.flush()
+            self.socket_client.transport.close()
+        return
+    
+    def onConnectionLost(self, exc):
+        self.send_queue.discard()
+        self.socket_client = None
+        if hasattr(self.event_obj, "onConnectionLost"):
+            self.event_obj.onConnectionLost(exc)
+        return
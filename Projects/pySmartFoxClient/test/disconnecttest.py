@@ -0,0 +1,76 @@
+# -*- coding:utf-8 -*-
+'''
+SmartFoxClient.disconnect on both transports.
+'''
+
+import sys, os
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+src_path = os.path.join(project_root, 'src')
+
+# Add 'src' to sys.path
+sys.path.insert(0, src_path)
+
+
+import asyncio
+import unittest
+from twisted.internet.testing import StringTransport
+from it.gotoandplay.smartfoxclient import SmartFoxClient
+from it.gotoandplay.utils.xmlsocket import XMLSocket
+from it.gotoandplay.utils.twistedsocket import SocketClientFactory
+
+class DisconnectTest(unittest.TestCase):
+
+    def testBeforeConnect(self):
+        sfc = SmartFoxClient(False)
+        sfc.disconnect()
+        sfc.flush()
+        self.assertEqual(sfc.getSendStats()["messages"], 0)
+
+    def testTwisted(self):
+        # wire the client up the way twistedsocket.build_connect does, minus
+        # reactor.run(), and connect the protocol to an in-memory transport
+        sfc = SmartFoxClient(False)
+        sfc.setSendBatching(10.0)
+        sfc.socket_client = XMLSocket(sfc.maxFrameSize)
+        sfc.socket_client.setBatching(sfc.sendBatchWindow, sfc.sendBatchBytes)
+        sfc.socket_client.addEventListener(sfc)
+        factory = SocketClientFactory()
+        factory.addEventListener(sfc.socket_client)
+        protocol = factory.buildProtocol(None)
+        transport = StringTransport()
+        protocol.makeConnection(transport)
+        # verChk is held by the 10 s batching window until disconnect flushes it
+        self.assertEqual(transport.value(), b"")
+        sfc.disconnect()
+        self.assertIn(b"verChk", transport.value())
+        self.assertTrue(transport.value().endswith(b"\0"))
+        self.assertTrue(transport.disconnecting)
+
+    def testAsyncio(self):
+        async def run():
+            received = []
+            closed = asyncio.Event()
+
+            async def serve(reader, writer):
+                received.append(await reader.read())
+                writer.close()
+                closed.set()
+
+            server = await asyncio.start_server(serve, "127.0.0.1", 0)
+            port = server.sockets[0].getsockname()[1]
+            sfc = SmartFoxClient(False)
+            sfc.setSendBatching(10.0)
+            await sfc.connectAsync("127.0.0.1", port)
+            sfc.disconnect()
+            # read() only returns once the client has closed its end
+            await asyncio.wait_for(closed.wait(), 5)
+            server.close()
+            await server.wait_closed()
+            return received[0]
+
+        data = asyncio.run(run())
+        self.assertIn(b"verChk", data)
+        self.assertTrue(data.endswith(b"\0"))
+
+if __name__ == '__main__':
+    unittest.main()
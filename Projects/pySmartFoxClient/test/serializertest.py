@@ -0,0 +1,47 @@
+# -*- coding:utf-8 -*-
+'''
+Round-trip tests for SFSObjectSerializer / SFSObjectDecoder.
+'''
+
+import sys, os
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+src_path = os.path.join(project_root, 'src')
+
+# Add 'src' to sys.path
+sys.path.insert(0, src_path)
+
+
+import unittest
+from it.gotoandplay.smartfoxclient.util.sfsobjectserializer import SFSObjectSerializer
+
+class SerializerRoundTripTest(unittest.TestCase):
+
+    def roundTrip(self, obj):
+        return SFSObjectSerializer.deserialize(SFSObjectSerializer.serialize(obj))
+
+    def testWhitespaceAndControlCharacters(self):
+        obj = {'t': 'a\nb\tc', 'crlf': 'line1\r\nline2', 'edges': '\n\t \r',
+               'xml': '<a href="x">&amp; \'q\'</a>', 'empty': ''}
+        self.assertEqual(self.roundTrip(obj), obj)
+
+    def testWhitespaceInKeys(self):
+        obj = {'multi\nline key': 1, 'tab\tkey': 'v'}
+        self.assertEqual(self.roundTrip(obj), obj)
+
+    def testScalars(self):
+        obj = {'zero': 0, 'int': 42, 'neg': -7, 'big': 2 ** 40, 'float': 1.5,
+               'true': True, 'false': False, 'none': None}
+        self.assertEqual(self.roundTrip(obj), obj)
+
+    def testNestedLists(self):
+        obj = {'list': [1, 'two\nlines', [3, [4, None]], {'k': [True, 0.25]}],
+               'nested': {'inner': {'deep': ['x', 'y\tz']}}, 'empty': []}
+        self.assertEqual(self.roundTrip(obj), obj)
+
+    def testLongList(self):
+        # indexes past 9 must keep their numeric order
+        obj = {'items': list(range(25))}
+        self.assertEqual(self.roundTrip(obj), obj)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -100,7 +100,7 @@ class TexasClient(SFSClient):
     def onJoinRoom(self, evt):
         if "success" in evt.getParams():
             room = evt.getParams()["success"].get("room")
-            print("\n\n\n\n",room.__dict__.items())
+            print("\n\n\n\n",[(slot, getattr(room, slot)) for slot in room.__slots__])
         return
     
     def __getattr__(self, attr):